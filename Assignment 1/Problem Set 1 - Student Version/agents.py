@@ -1,6 +1,9 @@
 from abc import ABC, abstractmethod
-from typing import Callable, Dict, Generic, List
+from typing import Callable, Dict, Generic, Iterable, List
 from problem import HeuristicFunction, Problem, S, A, Solution
+from bidirectional import ReverseHeuristicFunction, zero_reverse_heuristic
+from incremental import DStarLite
+from search_stats import SearchStats
 
 # This is an abstract class for all goal based agents
 class GoalBasedAgent(ABC, Generic[S, A]):
@@ -66,4 +69,33 @@ class InformedSearchAgent(GoalBasedAgent[S, A]):
             for action in solution:
                 self.policy[current] = action
                 current = problem.get_successor(current, action)
-        return self.policy.get(state)
\ No newline at end of file
+        return self.policy.get(state)
+
+# This agent uses an incremental search (D* Lite, see incremental.py) which it keeps between the calls to act.
+# Instead of searching again from scratch, it repairs the search when it moved to another state or when the problem
+# changed (the changes must be reported by calling notify_changes). The problem must have a single goal state
+# and implement get_predecessors.
+class IncrementalSearchAgent(GoalBasedAgent[S, A]):
+    def __init__(self, reverse_heuristic: ReverseHeuristicFunction = zero_reverse_heuristic, stats: SearchStats = None) -> None:
+        super().__init__()
+        self.reverse_heuristic = reverse_heuristic
+        self.stats = stats
+        self.planner: DStarLite[S, A] = None
+
+    def act(self, problem: Problem[S, A], state: S) -> A:
+        # Start a new search for a new problem, otherwise move the start of the current search to the state
+        if self.planner is None or self.planner.problem is not problem:
+            # Like the search agents, return None if no solution can be found (the problem has no goal state)
+            if problem.get_goal_state() is None:
+                self.planner = None
+                return None
+            self.planner = DStarLite(problem, state, self.reverse_heuristic, self.stats)
+        else:
+            self.planner.move_to(state)
+        self.planner.compute_shortest_path()
+        return self.planner.next_action()
+
+    # Report that the outgoing edges of the given states changed (they were added, removed or their costs changed)
+    def notify_changes(self, states: Iterable[S]) -> None:
+        if self.planner is not None:
+            self.planner.update_edges(states)
@@ -0,0 +1,300 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+import argparse, glob, json, os, signal, sys, time
+
+try:
+    import resource # Only available on Unix (it is used for the memory limit)
+except ImportError:
+    resource = None
+
+from problem import HeuristicFunction, Problem, Solution
+from search_stats import SearchStats
+
+# This file solves all the instances in a directory (sokoban levels, parking lots or graphs) in parallel.
+# Every instance is solved by a worker process of a ProcessPoolExecutor with a time limit and a memory limit,
+# and a JSON line is written for each instance as soon as it completes (so the results are in completion order):
+#   instance, problem, agent, heuristic: what was solved and how
+#   status: "solved", "unsolvable" (the search finished without a solution), "timeout", "memory" or "error"
+#   solution: the list of actions (as strings), cost: the path cost, length: the number of actions
+#   expanded: the number of expanded nodes (see search_stats.py), time: the time spent on the instance in seconds
+#   error: the error message (if the status is "error")
+# Example: python batch_solve.py levels -a astar -hf strong -j 4 -t 60 -m 2048 -o results.jsonl
+
+# The heuristics that can be selected for each problem type (the first one is the default)
+HEURISTICS = {
+    "sokoban": ["strong", "weak", "matching", "pdb", "zero"],
+    "parking": ["parking", "zero"],
+    "graph": ["euclidean", "landmarks", "zero"],
+}
+
+# The agents that need a heuristic
+INFORMED_AGENTS = ("astar", "gbfs", "idastar", "smastar", "bastar")
+AGENTS = ("bfs", "ebfs", "dfs", "ucs", "bucs", "ch") + INFORMED_AGENTS
+
+# An instance to solve with the options of the batch (it is sent to a worker process, so it must be picklable)
+@dataclass(frozen=True)
+class BatchTask:
+    path: str
+    problem: str
+    agent: str
+    heuristic: Optional[str]
+    pushes: bool
+    time_limit: Optional[float]
+
+# Raised in a worker when the time limit of an instance is reached
+class TimeLimitExceeded(Exception):
+    pass
+
+# Return the problem type of a file: graphs are json files, and sokoban levels are the text files with a player
+def detect_problem(path: str) -> str:
+    if path.endswith(".json"):
+        return "graph"
+    with open(path, 'r') as file:
+        text = file.read()
+    return "sokoban" if '@' in text or '+' in text else "parking"
+
+# Return the instance files of a directory. If it contains json files, they are the graphs
+# (the text files next to them are the figures of the graphs), otherwise the instances are the text files.
+def find_instances(directory: str) -> List[str]:
+    graphs = sorted(glob.glob(os.path.join(directory, "*.json")))
+    return graphs or sorted(glob.glob(os.path.join(directory, "*.txt")))
+
+def load_problem(kind: str, path: str) -> Problem:
+    if kind == "sokoban":
+        from sokoban import SokobanProblem
+        return SokobanProblem.from_file(path)
+    if kind == "parking":
+        from parking import ParkingProblem
+        return ParkingProblem.from_file(path)
+    from graph import GraphRoutingProblem
+    return GraphRoutingProblem.from_file(path)
+
+def get_heuristic(kind: str, name: str) -> HeuristicFunction:
+    if name == "zero":
+        return lambda *_: 0
+    if kind == "sokoban":
+        if name == "weak":
+            from sokoban_heuristic import weak_heuristic
+            return weak_heuristic
+        if name == "strong":
+            from sokoban_heuristic import strong_heuristic
+            return strong_heuristic
+        if name == "matching":
+            from sokoban_matching import matching_heuristic
+            return matching_heuristic
+        if name == "pdb":
+            from sokoban_pdb import pdb_heuristic
+            return pdb_heuristic
+    if kind == "parking" and name == "parking":
+        from parking import parking_heuristic
+        return parking_heuristic
+    if kind == "graph":
+        if name == "euclidean":
+            from graph import graphrouting_heuristic
+            return graphrouting_heuristic
+        if name == "landmarks":
+            from landmarks import landmark_heuristic
+            return landmark_heuristic
+    raise ValueError(f"Unknown heuristic '{name}' for the {kind} problems, expected one of {HEURISTICS[kind]}")
+
+# Return a function (problem, state, stats) -> solution which runs the selected search on the instance
+def create_search(task: BatchTask) -> Callable[[Problem, Any, SearchStats], Solution]:
+    import search, bidirectional, external_search
+    agent = task.agent
+    if agent == "ch":
+        if task.problem != "graph":
+            raise ValueError("Contraction hierarchies only work on graphs")
+        from contraction import ContractionHierarchySearch
+        return lambda problem, state, stats: ContractionHierarchySearch(problem, state, stats=stats)
+    uninformed = {
+        "bfs": search.BreadthFirstSearch,
+        "ebfs": external_search.ExternalBreadthFirstSearch,
+        "dfs": search.DepthFirstSearch,
+        "ucs": search.UniformCostSearch,
+        "bucs": bidirectional.BidirectionalUniformCostSearch,
+    }
+    if agent in uninformed:
+        search_fn = uninformed[agent]
+        heuristic = None
+    else:
+        heuristic = get_heuristic(task.problem, task.heuristic)
+        if agent == "bastar":
+            reverse_heuristic = bidirectional.zero_reverse_heuristic
+            if task.problem == "graph":
+                from graph import graphrouting_reverse_heuristic
+                reverse_heuristic = graphrouting_reverse_heuristic
+            search_fn = lambda problem, state, heuristic, stats: bidirectional.BidirectionalAStarSearch(
+                problem, state, heuristic, reverse_heuristic, stats=stats)
+        else:
+            search_fn = {
+                "astar": search.AStarSearch,
+                "gbfs": search.BestFirstSearch,
+                "idastar": search.IDAStarSearch,
+                "smastar": search.SMAStarSearch,
+            }[agent]
+    if task.pushes and task.problem == "sokoban":
+        from sokoban_push import push_level
+        search_fn = push_level(search_fn)
+    if heuristic is None:
+        return lambda problem, state, stats: search_fn(problem, state, stats=stats)
+    return lambda problem, state, stats: search_fn(problem, state, heuristic, stats=stats)
+
+# Return the string of an action (the parking actions are printed as the car letter followed by the direction)
+def format_action(kind: str, action: Any) -> str:
+    if kind == "parking":
+        from parking import CAR_TILES
+        car, direction = action
+        return f"{CAR_TILES[car]}{direction}"
+    return str(action)
+
+# Set the memory limit (in megabytes) of the worker process. Since a worker solves one instance at a time,
+# this is also the memory limit of each instance (the memory of an instance is freed before the next one starts).
+def initialize_worker(memory_limit: Optional[int]) -> None:
+    signal.signal(signal.SIGINT, signal.SIG_IGN) # Let the main process handle Ctrl+C
+    if memory_limit is not None and resource is not None:
+        limit = memory_limit * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+def _raise_time_limit(signum, frame):
+    raise TimeLimitExceeded()
+
+# Solve an instance in a worker process and return its result (see the top of the file)
+def solve_instance(task: BatchTask) -> Dict[str, Any]:
+    result = {
+        "instance": task.path, "problem": task.problem, "agent": task.agent, "heuristic": task.heuristic,
+        "status": None, "solution": None, "cost": None, "length": None, "expanded": None, "time": None, "error": None,
+    }
+    timer = task.time_limit is not None and hasattr(signal, "setitimer")
+    if timer:
+        signal.signal(signal.SIGALRM, _raise_time_limit)
+        signal.setitimer(signal.ITIMER_REAL, task.time_limit)
+    stats = SearchStats()
+    start = time.perf_counter()
+    try:
+        problem = load_problem(task.problem, task.path)
+        search_fn = create_search(task)
+        state = problem.get_initial_state()
+        solution = search_fn(problem, state, stats)
+        if timer: signal.setitimer(signal.ITIMER_REAL, 0)
+        if solution is None:
+            result["status"] = "unsolvable"
+        else:
+            # Replay the solution to compute its cost
+            cost = 0
+            for action in solution:
+                cost += problem.get_cost(state, action)
+                state = problem.get_successor(state, action)
+            result.update(status="solved", solution=[format_action(task.problem, action) for action in solution],
+                          cost=cost, length=len(solution))
+    except TimeLimitExceeded:
+        result["status"] = "timeout"
+    except MemoryError:
+        result["status"] = "memory"
+    except Exception as error:
+        result.update(status="error", error=f"{type(error).__name__}: {error}")
+    finally:
+        if timer: signal.setitimer(signal.ITIMER_REAL, 0)
+    result["expanded"] = stats.expanded
+    result["time"] = time.perf_counter() - start
+    return result
+
+# Solve all the tasks with the given number of workers and write each result to the output as soon as it is ready.
+# If a worker dies (e.g. it is killed by the operating system when it runs out of memory), the pool is broken and all
+# its unfinished tasks fail, so they are submitted again to a new pool. The pool sends the tasks to the workers in order,
+# so the task that killed the worker is one of the first "workers + 1" unfinished tasks (the ones that were running or
+# queued). These suspects are run one at a time, so the task that kills the worker again is the only one reported as
+# an error. Returns the number of results of each status.
+def batch_solve(tasks: List[BatchTask], workers: int, memory_limit: Optional[int], output) -> Dict[str, int]:
+    counts: Dict[str, int] = {}
+    done = 0
+
+    def report(task: BatchTask, result: Dict[str, Any]) -> None:
+        nonlocal done
+        done += 1
+        output.write(json.dumps(result) + "\n")
+        output.flush()
+        counts[result["status"]] = counts.get(result["status"], 0) + 1
+        details = f" ({result['length']} actions, cost {result['cost']}, {result['expanded']} expanded)" if result["status"] == "solved" else ""
+        print(f"[{done}/{len(tasks)}] {task.path}: {result['status']}{details}", file=sys.stderr)
+
+    remaining = list(range(len(tasks))) # The indices of the unfinished tasks in submission order
+    suspects = 0 # The number of tasks at the start of "remaining" that are run one at a time
+    while remaining:
+        group = remaining[:suspects] if suspects else remaining
+        finished, broken = set(), False
+        with ProcessPoolExecutor(max_workers=1 if suspects else workers, initializer=initialize_worker, initargs=(memory_limit,)) as executor:
+            futures = {executor.submit(solve_instance, tasks[index]): index for index in group}
+            for future in as_completed(futures):
+                index = futures[future]
+                try:
+                    result = future.result()
+                except BrokenProcessPool:
+                    broken = True
+                    break
+                finished.add(index)
+                report(tasks[index], result)
+        unfinished = [index for index in group if index not in finished]
+        if broken and suspects:
+            # A single worker runs the tasks in order, so the first unfinished task is the one that killed it
+            culprit = unfinished.pop(0)
+            task = tasks[culprit]
+            finished.add(culprit)
+            report(task, {"instance": task.path, "problem": task.problem, "agent": task.agent, "heuristic": task.heuristic,
+                          "status": "error", "error": "The worker process died"})
+            suspects = len(unfinished)
+        elif broken:
+            suspects = min(len(unfinished), workers + 1)
+        else:
+            suspects = 0
+        remaining = [index for index in remaining if index not in finished]
+    return counts
+
+def main(args: argparse.Namespace):
+    paths = find_instances(args.directory)
+    if not paths:
+        print(f"No instances found in '{args.directory}'", file=sys.stderr)
+        exit(-1)
+    tasks = []
+    for path in paths:
+        kind = args.problem if args.problem != "auto" else detect_problem(path)
+        heuristic = None
+        if args.agent in INFORMED_AGENTS:
+            heuristic = args.heuristic or HEURISTICS[kind][0]
+        tasks.append(BatchTask(path, kind, args.agent, heuristic, args.pushes, args.time_limit))
+    start = time.time()
+    output = sys.stdout if args.output == "-" else open(args.output, 'w')
+    try:
+        counts = batch_solve(tasks, args.workers, args.memory_limit, output)
+    finally:
+        if output is not sys.stdout: output.close()
+    summary = ", ".join(f"{status}: {count}" for status, count in sorted(counts.items()))
+    print(f"Solved {counts.get('solved', 0)}/{len(tasks)} instances ({summary}) in {time.time() - start:.2f} seconds", file=sys.stderr)
+
+if __name__ == "__main__":
+    # Read the arguments from the command line
+    parser = argparse.ArgumentParser(description="Solve all the instances of a directory in parallel")
+    parser.add_argument("directory", help="the directory of the instances (e.g. levels, parks or graphs)")
+    parser.add_argument("--problem", "-pb", default="auto", choices=["auto", "sokoban", "parking", "graph"],
+                        help="the problem type of the instances (detected from each file by default)")
+    parser.add_argument("--agent", "-a", default="astar", choices=AGENTS,
+                        help="the search algorithm used to solve the instances")
+    parser.add_argument("--heuristic", "-hf", default=None,
+                        help=f"the heuristic of the informed agents (the default depends on the problem: {HEURISTICS})")
+    parser.add_argument("--pushes", "-p", action="store_true", default=False,
+                        help="Search the sokoban levels over crate pushes instead of single steps")
+    parser.add_argument("--workers", "-j", type=int, default=os.cpu_count(),
+                        help="the number of worker processes (all the cores by default)")
+    parser.add_argument("--time-limit", "-t", type=float, default=None,
+                        help="the time limit of each instance in seconds")
+    parser.add_argument("--memory-limit", "-m", type=int, default=None,
+                        help="the memory limit of each worker process in megabytes")
+    parser.add_argument("--output", "-o", default="-",
+                        help="the JSONL file where the results are written (the standard output by default)")
+
+    args = parser.parse_args()
+    try:
+        main(args)
+    except KeyboardInterrupt:
+        print("Goodbye!!")
@@ -0,0 +1,531 @@
+import argparse, glob, random, time
+from typing import Callable, List
+
+from graph import GraphRoutingProblem, GraphNode, graphrouting_heuristic, graphrouting_reverse_heuristic
+from mathutils import Point
+from helpers.utils import fetch_recorded_calls
+from parking import ParkingProblem
+from sokoban import SokobanProblem
+from sokoban_heuristic import HEURISTIC_CACHE, strong_heuristic
+
+# This file contains benchmarks that compare the variants of the search algorithms on the sample problems.
+# Run "python benchmark.py <name>" to run one of the benchmarks (see the list at the end of the file).
+
+# Print a table where the first row is the header
+def print_table(rows: List[List[str]]):
+    widths = [max(len(str(row[column])) for row in rows) for column in range(len(rows[0]))]
+    for index, row in enumerate(rows):
+        print("  ".join(str(cell).ljust(width) for cell, width in zip(row, widths)))
+        if index == 0:
+            print("  ".join("-" * width for width in widths))
+
+# Run the function and return its output and the elapsed time in seconds
+def timed(fn: Callable, *args, **kwargs):
+    start = time.perf_counter()
+    output = fn(*args, **kwargs)
+    return output, time.perf_counter() - start
+
+# Compare the heapq frontier (which pushes duplicates) against the indexed heap frontier (which uses decrease-key)
+# and the bucket frontier (which keeps a FIFO bucket per integer priority)
+# on the parking lots (using UCS) and the sokoban levels (using UCS and A* with the strong heuristic)
+def benchmark_frontiers(args: argparse.Namespace):
+    from search import UniformCostSearch, AStarSearch
+    from frontier import create_frontier
+    instances = []
+    for path in sorted(glob.glob("parks/*.txt")):
+        instances.append((path, "ucs", ParkingProblem.from_file(path)))
+    for path in sorted(glob.glob("levels/*.txt")):
+        problem = SokobanProblem.from_file(path)
+        instances.append((path, "ucs", problem))
+        instances.append((path, "astar", problem))
+    rows = [["instance", "search", "queue", "solution", "peak frontier", "time (s)"]]
+    for path, search, problem in instances:
+        for kind in ("heapq", "indexed", "bucket"):
+            frontier = create_frontier(kind)
+            if search == "ucs":
+                solution, elapsed = timed(UniformCostSearch, problem, problem.get_initial_state(), priority_queue=frontier)
+            else:
+                problem.cache(HEURISTIC_CACHE).clear()
+                solution, elapsed = timed(AStarSearch, problem, problem.get_initial_state(), strong_heuristic, priority_queue=frontier)
+            length = "None" if solution is None else len(solution)
+            rows.append([path, search, kind, length, frontier.peak, f"{elapsed:.4f}"])
+    print_table(rows)
+
+# Create a graph routing problem on a size x size grid where each node is connected to its 4 neighbors
+# and a few nodes are removed (with a fixed seed) so that the shortest path is not a straight line.
+# The start and the goal are in the middle row, so a unidirectional search grows in all directions around the start.
+def grid_graph(size: int, remove_blocked: bool = True) -> GraphRoutingProblem:
+    import random
+    rng = random.Random(size)
+    start, goal = (size // 4, size // 2), (size - 1 - size // 4, size // 2)
+    blocked = {(x, y) for x in range(size) for y in range(size) if rng.random() < 0.2} - {start, goal}
+    nodes = {(x, y): GraphNode(f"{x},{y}", Point(x, y)) for x in range(size) for y in range(size) if not (remove_blocked and (x, y) in blocked)}
+    adjacency = {}
+    for (x, y), node in nodes.items():
+        adjacent = [(x + dx, y + dy) for dx, dy in ((1, 0), (-1, 0), (0, 1), (0, -1))]
+        adjacency[node] = [nodes[position] for position in adjacent if position in nodes]
+    return GraphRoutingProblem(nodes[start], nodes[goal], adjacency)
+
+# Compare the number of expanded nodes of the unidirectional and the bidirectional searches
+# on the graph routing problems (and a larger grid graph whose size can be set by "--size")
+def benchmark_bidirectional(args: argparse.Namespace):
+    from search import UniformCostSearch, AStarSearch
+    from bidirectional import BidirectionalUniformCostSearch, BidirectionalAStarSearch
+    searches = {
+        "ucs": lambda problem, state: UniformCostSearch(problem, state),
+        "bidirectional ucs": lambda problem, state: BidirectionalUniformCostSearch(problem, state),
+        "astar": lambda problem, state: AStarSearch(problem, state, graphrouting_heuristic),
+        "bidirectional astar": lambda problem, state: BidirectionalAStarSearch(problem, state, graphrouting_heuristic, graphrouting_reverse_heuristic),
+    }
+    instances = [(path, GraphRoutingProblem.from_file(path)) for path in sorted(glob.glob("graphs/*.json"))]
+    instances.append((f"grid {args.size}x{args.size}", grid_graph(args.size)))
+    rows = [["instance", "search", "path cost", "expanded", "time (s)"]]
+    for name, problem in instances:
+        for search, fn in searches.items():
+            fetch_recorded_calls(GraphRoutingProblem.get_actions)
+            fetch_recorded_calls(GraphRoutingProblem.get_predecessors)
+            state = problem.get_initial_state()
+            solution, elapsed = timed(fn, problem, state)
+            expanded = len(fetch_recorded_calls(GraphRoutingProblem.get_actions)) + len(fetch_recorded_calls(GraphRoutingProblem.get_predecessors))
+            cost = "None"
+            if solution is not None:
+                cost = 0
+                for action in solution:
+                    cost += problem.get_cost(state, action)
+                    state = problem.get_successor(state, action)
+                cost = f"{cost:.3f}"
+            rows.append([name, search, cost, expanded, f"{elapsed:.4f}"])
+    print_table(rows)
+
+# Compare the number of expanded nodes of A* with the euclidean heuristic and with the landmark (ALT) heuristic
+# for many random queries on the same grid graph (whose size can be set by "--size").
+# The landmark tables are computed once for the graph, so the preprocessing time is reported separately.
+def benchmark_landmarks(args: argparse.Namespace):
+    import random
+    from search import AStarSearch
+    from landmarks import landmark_heuristic, landmark_table
+    graph = grid_graph(args.size)
+    nodes = sorted(graph.adjacency, key=lambda node: node.name)
+    _, preprocessing = timed(landmark_table, graph)
+    rng = random.Random(0)
+    queries = [(rng.choice(nodes), rng.choice(nodes)) for _ in range(20)]
+    rows = [["heuristic", "queries", "expanded", "time (s)"]]
+    for name, heuristic in (("euclidean", graphrouting_heuristic), ("landmarks", landmark_heuristic)):
+        expanded, elapsed = 0, 0
+        for start, goal in queries:
+            problem = GraphRoutingProblem(start, goal, graph.adjacency, graph.reverse_adjacency)
+            problem.cache()["landmark_table"] = landmark_table(graph)
+            fetch_recorded_calls(GraphRoutingProblem.get_actions)
+            _, query_time = timed(AStarSearch, problem, start, heuristic)
+            expanded += len(fetch_recorded_calls(GraphRoutingProblem.get_actions))
+            elapsed += query_time
+        rows.append([name, len(queries), expanded, f"{elapsed:.4f}"])
+    print_table(rows)
+    print(f"Landmark preprocessing time: {preprocessing:.4f} seconds")
+
+# Compare the query time of the contraction hierarchy against UCS and A* for many random queries on the same grid graph
+# (whose size can be set by "--size"). The hierarchy is built once for the graph, so the build time is reported separately.
+def benchmark_contraction(args: argparse.Namespace):
+    import random
+    from search import UniformCostSearch, AStarSearch
+    from contraction import ContractionHierarchy
+    graph = grid_graph(args.size)
+    nodes = sorted(graph.adjacency, key=lambda node: node.name)
+    hierarchy, build_time = timed(ContractionHierarchy.build, graph)
+    rng = random.Random(0)
+    queries = [(rng.choice(nodes), rng.choice(nodes)) for _ in range(20)]
+    searches = {
+        "ucs": lambda problem, start: UniformCostSearch(problem, start),
+        "astar": lambda problem, start: AStarSearch(problem, start, graphrouting_heuristic),
+        "contraction hierarchy": lambda problem, start: hierarchy.query(start, problem.goal),
+    }
+    rows = [["search", "queries", "total path cost", "time (s)"]]
+    for name, fn in searches.items():
+        total_cost, elapsed = 0, 0
+        for start, goal in queries:
+            problem = GraphRoutingProblem(start, goal, graph.adjacency, graph.reverse_adjacency)
+            solution, query_time = timed(fn, problem, start)
+            elapsed += query_time
+            state = start
+            for action in solution or []:
+                total_cost += problem.get_cost(state, action)
+                state = action
+        rows.append([name, len(queries), f"{total_cost:.3f}", f"{elapsed:.4f}"])
+    print_table(rows)
+    print(f"Contraction time: {build_time:.4f} seconds ({len(hierarchy.middle)} shortcuts)")
+
+# Compare the json graph format against the binary CSR format on a grid graph (whose size can be set by "--size"):
+# the time to load the file, the memory used by the loaded graph and the time of a UCS query
+def benchmark_csr(args: argparse.Namespace):
+    import json, os, tempfile, tracemalloc
+    from search import UniformCostSearch
+    from graph_csr import CSRGraphRoutingProblem, convert
+    graph = grid_graph(args.size)
+    directory = tempfile.mkdtemp()
+    json_path, binary_path = os.path.join(directory, "grid.json"), os.path.join(directory, "grid.bin")
+    with open(json_path, "w") as file:
+        json.dump({
+            "graph": {node.name: {"position": list(node.position), "adjacent": [adjacent.name for adjacent in graph.adjacency[node]]} for node in graph.adjacency},
+            "start": graph.start.name,
+            "goal": graph.goal.name,
+        }, file)
+    convert(json_path, binary_path)
+    loaders = {
+        "json": lambda: GraphRoutingProblem.from_file(json_path),
+        "binary": lambda: CSRGraphRoutingProblem.from_file(binary_path, use_mmap=False),
+        "binary (mmap)": lambda: CSRGraphRoutingProblem.from_file(binary_path),
+    }
+    rows = [["format", "file size (bytes)", "load time (s)", "memory (bytes)", "ucs time (s)"]]
+    for name, loader in loaders.items():
+        tracemalloc.start()
+        problem, load_time = timed(loader)
+        memory, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        _, search_time = timed(UniformCostSearch, problem, problem.get_initial_state())
+        size = os.path.getsize(json_path if name == "json" else binary_path)
+        rows.append([name, size, f"{load_time:.4f}", memory, f"{search_time:.4f}"])
+    print_table(rows)
+
+# Compare the number of expanded nodes of the step-level and the push-level sokoban problems (see sokoban_push.py)
+# using UCS and A* with the strong heuristic. Both return step-level solutions, so the solution lengths are comparable.
+def benchmark_pushes(args: argparse.Namespace):
+    from search import UniformCostSearch, AStarSearch
+    from sokoban_push import PushSokobanProblem, push_level
+    from helpers.utils import fetch_tracked_call_count
+    searches = {
+        "ucs": lambda problem, state: UniformCostSearch(problem, state),
+        "astar": lambda problem, state: AStarSearch(problem, state, strong_heuristic),
+    }
+    rows = [["level", "search", "formulation", "steps", "expanded", "time (s)"]]
+    for path in sorted(glob.glob("levels/*.txt")):
+        problem = SokobanProblem.from_file(path)
+        for search, fn in searches.items():
+            for formulation, tracked, solve in (("steps", SokobanProblem, fn), ("pushes", PushSokobanProblem, push_level(fn))):
+                problem.cache(HEURISTIC_CACHE).clear()
+                fetch_tracked_call_count(tracked.get_actions)
+                solution, elapsed = timed(solve, problem, problem.get_initial_state())
+                length = "None" if solution is None else len(solution)
+                rows.append([path, search, formulation, length, fetch_tracked_call_count(tracked.get_actions), f"{elapsed:.4f}"])
+    print_table(rows)
+
+# Compare the strong heuristic against the matching heuristic (see sokoban_matching.py)
+# and the pattern database heuristics (see sokoban_pdb.py) using A* on the sokoban levels.
+# The time of the pattern database heuristics includes building the databases in the first run
+# and loading them from the disk in the following runs.
+def benchmark_heuristics(args: argparse.Namespace):
+    from search import AStarSearch
+    from sokoban_matching import matching_heuristic
+    from sokoban_pdb import pattern_database_heuristic
+    from helpers.utils import fetch_tracked_call_count
+    heuristics = {
+        "strong": strong_heuristic,
+        "matching": matching_heuristic,
+        "pdb (additive, 2)": pattern_database_heuristic(2, "additive"),
+        "pdb (additive, 3)": pattern_database_heuristic(3, "additive"),
+        "pdb (max, 2)": pattern_database_heuristic(2, "max"),
+    }
+    rows = [["level", "heuristic", "solution", "expanded", "time (s)"]]
+    totals = {}
+    for path in sorted(glob.glob("levels/*.txt")):
+        for name, heuristic in heuristics.items():
+            problem = SokobanProblem.from_file(path)
+            fetch_tracked_call_count(SokobanProblem.get_actions)
+            solution, elapsed = timed(AStarSearch, problem, problem.get_initial_state(), heuristic)
+            expanded = fetch_tracked_call_count(SokobanProblem.get_actions)
+            length = "None" if solution is None else len(solution)
+            rows.append([path, name, length, expanded, f"{elapsed:.4f}"])
+            total_expanded, total_time = totals.get(name, (0, 0))
+            totals[name] = (total_expanded + expanded, total_time + elapsed)
+    for name, (expanded, elapsed) in totals.items():
+        rows.append(["total", name, "", expanded, f"{elapsed:.4f}"])
+    print_table(rows)
+
+# Measure the time of the additive pattern database heuristic (see sokoban_pdb.py) on random sets of 8 to 16 crates
+# in an open room, where the number of ways to split the crates into groups grows exponentially with the number of crates.
+# The databases are built in memory before the measurements, and every set of crates is evaluated once (without the cache).
+def benchmark_pdb_splits(args: argparse.Namespace):
+    from sokoban_pdb import _best_split, pattern_database
+    width, height, goals = 12, 8, 16
+    rows = ["#" * (width + 2)]
+    for y in range(height):
+        row = ["." if y < 2 and x < goals // 2 else " " for x in range(width)]
+        rows.append("#" + "".join(row) + "#")
+    rows.append("#" * (width + 2))
+    rows[-2] = rows[-2][:-2] + "@#"
+    layout = SokobanProblem.from_text("\n".join(rows)).layout
+    live = [cell for cell in range(layout.stride * (layout.height + 2))
+            if layout.walkable_bits >> cell & 1 and not layout.dead_bits >> cell & 1]
+    rng = random.Random(0)
+    table = [["pattern size", "crates", "evaluations", "time per evaluation (ms)"]]
+    for size in (2, 3):
+        databases = [None] + [pattern_database(layout, k, directory=None) for k in range(1, size + 1)]
+        for count in (8, 12, 16):
+            samples = [tuple(sorted(rng.sample(live, count))) for _ in range(10)]
+            _, elapsed = timed(lambda: [_best_split(databases, crates, size) for crates in samples])
+            table.append([size, count, len(samples), f"{1000 * elapsed / len(samples):.3f}"])
+    print_table(table)
+
+# Compare the number of expanded nodes with and without the freeze and corral deadlock detection (see sokoban_deadlock.py)
+# using UCS and A* with the strong heuristic on the sokoban levels
+def benchmark_deadlocks(args: argparse.Namespace):
+    from search import UniformCostSearch, AStarSearch
+    from sokoban_deadlock import DeadlockDetector
+    from helpers.utils import fetch_tracked_call_count
+    searches = {
+        "ucs": lambda problem, state: UniformCostSearch(problem, state),
+        "astar": lambda problem, state: AStarSearch(problem, state, strong_heuristic),
+    }
+    rows = [["level", "search", "deadlocks", "solution", "expanded", "pruned", "time (s)"]]
+    for path in sorted(glob.glob("levels/*.txt")):
+        for search, fn in searches.items():
+            for detection in (False, True):
+                problem = SokobanProblem.from_file(path)
+                if detection:
+                    problem.deadlock_detector = DeadlockDetector(problem.layout)
+                fetch_tracked_call_count(SokobanProblem.get_actions)
+                solution, elapsed = timed(fn, problem, problem.get_initial_state())
+                length = "None" if solution is None else len(solution)
+                pruned = problem.deadlock_detector.total_pruned if detection else 0
+                rows.append([path, search, "on" if detection else "off", length, fetch_tracked_call_count(SokobanProblem.get_actions), pruned, f"{elapsed:.4f}"])
+    print_table(rows)
+
+# The small sokoban levels where the old deadlock checks of the heuristics pruned states that can be solved
+REGRESSION_LEVELS = [
+    "#######\n#.    #\n#$$  .#\n# @   #\n#######",
+    "######\n#.   #\n#.$@ #\n##$$ #\n#.   #\n######",
+]
+
+# Generate a small random sokoban level (it may not be solvable) with the given random generator
+def random_sokoban_level(rng: random.Random) -> str:
+    width, height = rng.randint(5, 7), rng.randint(5, 6)
+    grid = [["#"] * width for _ in range(height)]
+    inner = [(x, y) for y in range(1, height - 1) for x in range(1, width - 1)]
+    for x, y in inner:
+        if rng.random() > 0.15: grid[y][x] = " "
+    free = [(x, y) for x, y in inner if grid[y][x] == " "]
+    crates = min(rng.randint(1, 3), (len(free) - 1) // 2)
+    cells = rng.sample(free, 2 * crates + 1)
+    for x, y in cells[:crates]: grid[y][x] = "."
+    for x, y in cells[crates:2 * crates]: grid[y][x] = "$"
+    x, y = cells[-1]
+    grid[y][x] = "@"
+    return "\n".join("".join(row) for row in grid)
+
+# Check that A* returns optimal solutions with the sokoban heuristics (which must be admissible) by comparing
+# their lengths against BFS on the regression levels and on "size" random small levels.
+# The levels where a heuristic returns a longer solution (or none) are printed.
+def benchmark_admissibility(args: argparse.Namespace):
+    from search import BreadthFirstSearch, AStarSearch
+    from sokoban_matching import matching_heuristic
+    heuristics = {"strong": strong_heuristic, "matching": matching_heuristic}
+    rng = random.Random(0)
+    levels = REGRESSION_LEVELS + [random_sokoban_level(rng) for _ in range(args.size)]
+    counts = {name: [0, 0] for name in heuristics} # name -> [optimal, suboptimal]
+    for text in levels:
+        problem = SokobanProblem.from_text(text)
+        reference = BreadthFirstSearch(problem, problem.get_initial_state())
+        if reference is None: continue
+        for name, heuristic in heuristics.items():
+            problem = SokobanProblem.from_text(text)
+            solution = AStarSearch(problem, problem.get_initial_state(), heuristic)
+            optimal = solution is not None and len(solution) == len(reference)
+            counts[name][0 if optimal else 1] += 1
+            if not optimal:
+                print(f"{name}: {None if solution is None else len(solution)} steps instead of {len(reference)}\n{text}\n")
+    rows = [["heuristic", "optimal", "suboptimal"]]
+    rows.extend([name, optimal, suboptimal] for name, (optimal, suboptimal) in counts.items())
+    print_table(rows)
+
+# Create a parking lot with the given number of cars (at most 26) where every car is two moves below its own slot
+# and there is one empty lane between the cars and the slots
+def parking_lot(cars: int) -> ParkingProblem:
+    from parking import CAR_TILES
+    cars = min(cars, len(CAR_TILES))
+    slots = "".join(tile.lower() for tile in CAR_TILES[:cars])
+    rows = ["#" * (cars + 2), f"#{slots}#", "#" + "." * cars + "#", f"#{CAR_TILES[:cars]}#", "#" * (cars + 2)]
+    return ParkingProblem.from_text("\n".join(rows))
+
+# Compare UCS against bidirectional UCS and A* with the parking heuristic on the parking lots.
+# The expanded nodes are counted by wrapping get_successors and get_predecessors, since ParkingProblem does not track its calls.
+# Then, measure the expansion speed on a generated lot with as many cars as "--size" (at most 26)
+# by expanding the first 10000 states in breadth first order.
+def benchmark_parking(args: argparse.Namespace):
+    from collections import deque
+    from search import UniformCostSearch, AStarSearch
+    from bidirectional import BidirectionalUniformCostSearch
+    from parking import parking_heuristic
+    searches = {
+        "ucs": lambda problem, state: UniformCostSearch(problem, state),
+        "bidirectional ucs": lambda problem, state: BidirectionalUniformCostSearch(problem, state),
+        "astar": lambda problem, state: AStarSearch(problem, state, parking_heuristic),
+    }
+    rows = [["instance", "search", "path cost", "expanded", "time (s)"]]
+    for path in sorted(glob.glob("parks/*.txt")):
+        for search, fn in searches.items():
+            problem = ParkingProblem.from_file(path)
+            expanded = 0
+            def counted(expand):
+                def expand_and_count(state):
+                    nonlocal expanded
+                    expanded += 1
+                    return expand(state)
+                return expand_and_count
+            problem.get_successors = counted(problem.get_successors)
+            problem.get_predecessors = counted(problem.get_predecessors)
+            state = problem.get_initial_state()
+            solution, elapsed = timed(fn, problem, state)
+            cost = "None"
+            if solution is not None:
+                cost = 0
+                for action in solution:
+                    cost += problem.get_cost(state, action)
+                    state = problem.get_successor(state, action)
+            rows.append([path, search, cost, expanded, f"{elapsed:.4f}"])
+    print_table(rows)
+
+    problem = parking_lot(args.size)
+    def expand(limit: int) -> int:
+        initial_state = problem.get_initial_state()
+        queue, explored, generated = deque([initial_state]), {initial_state}, 0
+        for _ in range(limit):
+            if not queue: break
+            for _, next_state, _ in problem.get_successors(queue.popleft()):
+                generated += 1
+                if next_state not in explored:
+                    explored.add(next_state)
+                    queue.append(next_state)
+        return generated
+    generated, elapsed = timed(expand, 10000)
+    print(f"Generated lot with {len(problem.cars)} cars: expanded 10000 states ({generated} successors) in {elapsed:.4f} seconds")
+
+# Measure the speedup of the hash-distributed parallel A* (see parallel_search.py) with 1, 2, 4 and 8 workers
+# against AStarSearch using the strong heuristic on the sokoban levels. The heuristic cache is cleared before each run,
+# since the problem (with its caches) is sent to the workers and they would otherwise start with the values computed by the previous run.
+# The speedup can only show on a machine with at least as many cores as workers.
+def benchmark_parallel(args: argparse.Namespace):
+    import os
+    from search import AStarSearch
+    from parallel_search import HDAStarSearch
+    from search_stats import SearchStats
+    print(f"Available cores: {os.cpu_count()}")
+    rows = [["level", "search", "workers", "steps", "expanded", "time (s)", "speedup"]]
+    for path in sorted(glob.glob("levels/*.txt")):
+        problem = SokobanProblem.from_file(path)
+        problem.cache(HEURISTIC_CACHE).clear()
+        stats = SearchStats()
+        solution, baseline = timed(AStarSearch, problem, problem.get_initial_state(), strong_heuristic, stats=stats)
+        rows.append([path, "astar", 1, "None" if solution is None else len(solution), stats.expanded, f"{baseline:.4f}", "1.00"])
+        for workers in (1, 2, 4, 8):
+            problem.cache(HEURISTIC_CACHE).clear()
+            stats = SearchStats()
+            solution, elapsed = timed(HDAStarSearch, problem, problem.get_initial_state(), strong_heuristic, workers, stats=stats)
+            rows.append([path, "hda*", workers, "None" if solution is None else len(solution), stats.expanded,
+                         f"{elapsed:.4f}", f"{baseline / elapsed:.2f}"])
+    print_table(rows)
+
+# Compare the memory use and the time of BreadthFirstSearch against the external-memory BFS (see external_search.py)
+# on the parking lots and the sokoban levels. The memory is the peak of the Python allocations (measured by tracemalloc,
+# which slows down both searches), so it does not include the layer files written to the disk by the external search.
+def benchmark_external(args: argparse.Namespace):
+    import tracemalloc
+    from search import BreadthFirstSearch
+    from external_search import ExternalBreadthFirstSearch
+    rows = [["instance", "search", "steps", "peak memory (KB)", "time (s)"]]
+    instances = [(path, ParkingProblem) for path in sorted(glob.glob("parks/*.txt"))]
+    instances += [(path, SokobanProblem) for path in sorted(glob.glob("levels/*.txt"))]
+    for path, problem_type in instances:
+        for name, search in (("bfs", BreadthFirstSearch), ("external bfs", ExternalBreadthFirstSearch)):
+            problem = problem_type.from_file(path)
+            tracemalloc.start()
+            solution, elapsed = timed(search, problem, problem.get_initial_state())
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            rows.append([path, name, "None" if solution is None else len(solution), peak // 1024, f"{elapsed:.4f}"])
+    print_table(rows)
+
+# Compare the closed sets (see closed_sets.py) using BFS on the parking lots and the sokoban levels:
+# the memory of the closed set (measured by the search stats), the number of expanded nodes and the time.
+# The bitstate filter can report unexplored states as explored, so it may expand fewer nodes and miss the solution.
+def benchmark_closed_sets(args: argparse.Namespace):
+    from search import BreadthFirstSearch
+    from closed_sets import ClosedSets
+    from search_stats import SearchStats
+    rows = [["instance", "closed set", "steps", "expanded", "memory (KB)", "bytes/state", "time (s)"]]
+    instances = [(path, ParkingProblem) for path in sorted(glob.glob("parks/*.txt"))]
+    instances += [(path, SokobanProblem) for path in sorted(glob.glob("levels/*.txt"))]
+    for path, problem_type in instances:
+        for kind in ClosedSets:
+            problem = problem_type.from_file(path)
+            stats = SearchStats()
+            solution, elapsed = timed(BreadthFirstSearch, problem, problem.get_initial_state(), closed_set=kind, stats=stats)
+            rows.append([path, kind, "None" if solution is None else len(solution), stats.expanded, stats.closed_memory // 1024,
+                         stats.closed_memory // max(stats.peak_closed, 1), f"{elapsed:.4f}"])
+    print_table(rows)
+
+# Compare the incremental agent (D* Lite, see incremental.py) against replanning with A* from scratch on a grid graph
+# (whose size can be set by "--size") that the agent does not know in advance: it starts with a map of the full grid and
+# discovers the blocked nodes when it is next to them (they are then removed from its map). The A* agent searches again
+# whenever a discovered node is on its planned path, while the incremental agent repairs its search after every discovery.
+def benchmark_incremental(args: argparse.Namespace):
+    from search import AStarSearch
+    from agents import IncrementalSearchAgent
+    from search_stats import SearchStats
+    world = grid_graph(args.size)
+    rows = [["agent", "steps", "path cost", "searches", "expanded", "time (s)"]]
+    for name in ("astar", "dstar"):
+        problem = grid_graph(args.size, remove_blocked=False) # The map of the agent
+        blocked = [node for node in problem.adjacency if node not in world.adjacency]
+        stats = SearchStats()
+        agent = IncrementalSearchAgent(graphrouting_reverse_heuristic, stats)
+        state, plan, steps, cost = problem.get_initial_state(), None, 0, 0
+        start = time.perf_counter()
+        while not problem.is_goal(state):
+            # Remove the blocked nodes next to the agent from its map
+            discovered = [node for node in blocked if abs(node.position.x - state.position.x) + abs(node.position.y - state.position.y) <= 1
+                          and problem.adjacency[node]]
+            changed = set()
+            for node in discovered:
+                for neighbor in list(problem.adjacency[node]):
+                    problem.remove_edge(node, neighbor)
+                    problem.remove_edge(neighbor, node)
+                    changed.update((node, neighbor))
+            if name == "astar":
+                if plan is None or any(node in plan for node in discovered):
+                    plan = AStarSearch(problem, state, graphrouting_heuristic, stats=stats)
+                    if plan is None: break
+                action = plan.pop(0)
+            else:
+                agent.notify_changes(changed)
+                action = agent.act(problem, state)
+                if action is None: break
+            cost += problem.get_cost(state, action)
+            state = problem.get_successor(state, action)
+            steps += 1
+        elapsed = time.perf_counter() - start
+        rows.append([name, steps, f"{cost:.2f}", stats.searches, stats.expanded, f"{elapsed:.4f}"])
+    print_table(rows)
+
+Benchmarks = {
+    "frontiers": benchmark_frontiers,
+    "bidirectional": benchmark_bidirectional,
+    "landmarks": benchmark_landmarks,
+    "contraction": benchmark_contraction,
+    "csr": benchmark_csr,
+    "pushes": benchmark_pushes,
+    "heuristics": benchmark_heuristics,
+    "pdb-splits": benchmark_pdb_splits,
+    "deadlocks": benchmark_deadlocks,
+    "admissibility": benchmark_admissibility,
+    "parking": benchmark_parking,
+    "parallel": benchmark_parallel,
+    "external": benchmark_external,
+    "closed": benchmark_closed_sets,
+    "incremental": benchmark_incremental,
+}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the search algorithms on the sample problems")
+    parser.add_argument("benchmark", choices=list(Benchmarks), help="the benchmark to run")
+    parser.add_argument("--size", type=int, default=60, help="the size of the generated problems (if the benchmark uses any)")
+    args = parser.parse_args()
+    Benchmarks[args.benchmark](args)
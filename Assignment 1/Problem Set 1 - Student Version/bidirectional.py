@@ -0,0 +1,167 @@
+from typing import Callable, Dict, Set, Tuple, Union
+
+from problem import HeuristicFunction, Problem, S, A, Solution
+from nodes import NodeStore
+from frontier import Frontier, create_frontier
+from search_stats import SearchStats, instrumented
+
+# This file contains the bidirectional searches which run a forward search from the initial state
+# and a backward search from the goal state at the same time until the two searches meet.
+# They can only be used with problems that implement "get_goal_state" and "get_predecessors".
+# If "get_goal_state" returns None, the problem has no goal state, so there is no solution.
+
+# A reverse heuristic estimates the path cost from the initial state (the second argument) to the given state (the third argument).
+# It guides the backward search in the same way the heuristic guides the forward search.
+ReverseHeuristicFunction = Callable[[Problem[S, A], S, S], float]
+
+def zero_heuristic(problem: Problem[S, A], state: S) -> float:
+    return 0
+
+def zero_reverse_heuristic(problem: Problem[S, A], initial_state: S, state: S) -> float:
+    return 0
+
+# The function that computes a lower bound on the cost of any path that was not found yet
+# from the lowest priorities of the forward and the backward frontiers
+LowerBoundFunction = Callable[[float, float], float]
+
+# The state of the search in one direction
+class _Direction:
+    __slots__ = ("nodes", "best", "expanded", "frontier")
+
+    def __init__(self, frontier: Frontier) -> None:
+        self.nodes = NodeStore() # The nodes of the search tree in this direction
+        self.best: Dict = {} # The lowest g(n) found so far for each state and the index of its node
+        self.expanded: Set = set() # The states that were expanded in this direction
+        self.frontier = frontier
+
+    def add(self, state, parent: int, action, g_cost: float, priority: float) -> int:
+        node = self.nodes.add(parent, action, g_cost)
+        self.best[state] = (g_cost, node)
+        self.frontier.push(priority, state, node)
+        return node
+
+def _bidirectional_search(problem: Problem[S, A], initial_state: S, heuristic: HeuristicFunction,
+                          reverse_heuristic: ReverseHeuristicFunction, priority_queue: Union[str, Frontier],
+                          lower_bound: LowerBoundFunction, stats: SearchStats = None) -> Solution:
+    if problem.is_goal(initial_state):
+        return []
+    goal_state = problem.get_goal_state()
+    if goal_state is None:
+        return None  # The problem has no goal state
+
+    forward = _Direction(create_frontier(priority_queue, problem))
+    backward = _Direction(create_frontier(priority_queue, problem))
+    forward.add(initial_state, -1, None, 0, heuristic(problem, initial_state))
+    backward.add(goal_state, -1, None, 0, reverse_heuristic(problem, initial_state, goal_state))
+
+    best_cost = float('inf') # The cost of the best path found so far
+    meeting: Tuple[int, int] = None # The forward and backward nodes where the best path meets
+
+    # If one of the frontiers is empty, every state reachable in that direction was expanded, so the best path is final
+    while forward.frontier and backward.frontier:
+        # Stop when no path that was not found yet can be cheaper than the best path
+        if lower_bound(forward.frontier.peek(), backward.frontier.peek()) >= best_cost:
+            break
+
+        # Expand the direction with the smaller frontier
+        is_forward = len(forward.frontier) <= len(backward.frontier)
+        current, other = (forward, backward) if is_forward else (backward, forward)
+        _, state, node = current.frontier.pop()
+        g_cost = current.nodes.cost(node)
+        # Skip the entries of the states that were reached again with a lower g(n)
+        if g_cost > current.best[state][0]:
+            if stats is not None: stats.duplicates += 1
+            continue
+        # If the other direction already expanded this state, the best path through it is already a candidate,
+        # and the paths that continue from it were already generated by the other direction
+        if state in other.expanded:
+            if stats is not None: stats.duplicates += 1
+            continue
+        current.expanded.add(state)
+
+        if is_forward:
+            neighbors = problem.get_successors(state)
+        else:
+            neighbors = problem.get_predecessors(state)
+        if stats is not None:
+            stats.expand(len(neighbors), len(forward.frontier) + len(backward.frontier), len(forward.expanded) + len(backward.expanded))
+        for action, next_state, cost in neighbors:
+            next_g_cost = g_cost + cost
+            best = current.best.get(next_state)
+            if best is not None and best[0] <= next_g_cost:
+                if stats is not None: stats.duplicates += 1
+                continue
+            if is_forward:
+                priority = next_g_cost + heuristic(problem, next_state)
+            else:
+                priority = next_g_cost + reverse_heuristic(problem, initial_state, next_state)
+            # A state whose f(n) is not lower than the best candidate cannot lead to a better path
+            if priority >= best_cost:
+                continue
+            next_node = current.add(next_state, node, action, next_g_cost, priority)
+            # If the other direction already reached this state, we found a path through it
+            other_best = other.best.get(next_state)
+            if other_best is not None and next_g_cost + other_best[0] < best_cost:
+                best_cost = next_g_cost + other_best[0]
+                meeting = (next_node, other_best[1]) if is_forward else (other_best[1], next_node)
+
+    if meeting is None:
+        return None  # If no solution is found
+    # The backward nodes store the forward actions, so the backward path is reversed to go from the meeting state to the goal
+    forward_node, backward_node = meeting
+    return forward.nodes.path(forward_node) + backward.nodes.path(backward_node)[::-1]
+
+@instrumented
+def BidirectionalUniformCostSearch(problem: Problem[S, A], initial_state: S, priority_queue: Union[str, Frontier] = "auto",
+                                   stats: SearchStats = None) -> Solution:
+    """
+    Perform a bidirectional Uniform Cost Search to find the lowest cost path from the initial state to the goal state.
+
+    Args:
+        problem (Problem[S, A]): The problem to be solved. It must have a single goal state and implement the
+                                 "get_goal_state" and "get_predecessors" functions.
+        initial_state (S): The initial state from which to start the search.
+        priority_queue (Union[str, Frontier]): The priority queue used by each direction (see UniformCostSearch).
+        stats (SearchStats): If given, it is filled with the statistics of both directions (see search_stats.py).
+
+    Returns:
+        Solution: A list of actions that define the lowest cost path from the initial state to the goal state.
+                  Returns None if no solution is found.
+
+    A forward UCS starts from the initial state and a backward UCS starts from the goal state, and the direction with
+    the smaller frontier is expanded at each step. Whenever a state is reached by both searches, the cost of the path
+    through it is a candidate solution. The search stops when the sum of the lowest path costs in the two frontiers is
+    not lower than the best candidate, since any path that was not found yet has to cross both frontiers.
+    Each search only has to go about half of the way, so it usually expands fewer nodes than a single UCS.
+    """
+    return _bidirectional_search(problem, initial_state, zero_heuristic, zero_reverse_heuristic, priority_queue,
+                                 lambda forward_cost, backward_cost: forward_cost + backward_cost, stats)
+
+@instrumented
+def BidirectionalAStarSearch(problem: Problem[S, A], initial_state: S, heuristic: HeuristicFunction,
+                             reverse_heuristic: ReverseHeuristicFunction = zero_reverse_heuristic,
+                             priority_queue: Union[str, Frontier] = "auto", stats: SearchStats = None) -> Solution:
+    """
+    Perform a bidirectional (front-to-end) A* search to find the lowest cost path from the initial state to the goal state.
+
+    Args:
+        problem (Problem[S, A]): The problem to be solved. It must have a single goal state and implement the
+                                 "get_goal_state" and "get_predecessors" functions.
+        initial_state (S): The initial state from which to start the search.
+        heuristic (HeuristicFunction): An admissible heuristic that estimates the cost from a state to the goal.
+        reverse_heuristic (ReverseHeuristicFunction): An admissible heuristic that estimates the cost from the initial
+                                                      state to a state. It is zero by default.
+        priority_queue (Union[str, Frontier]): The priority queue used by each direction (see AStarSearch).
+        stats (SearchStats): If given, it is filled with the statistics of both directions (see search_stats.py).
+
+    Returns:
+        Solution: A list of actions that define the lowest cost path from the initial state to the goal state.
+                  Returns None if no solution is found.
+
+    Each direction runs A* towards the opposite end (front-to-end), so the forward search is guided by the heuristic and
+    the backward search is guided by the reverse heuristic. The lowest f(n) in each frontier is a lower bound on the
+    cost of any path that was not found yet, so the search stops when the larger of the two is not lower than the best
+    candidate. Like AStarSearch, a state that is reached again with a lower g(n) is expanded again, so the solution is
+    optimal with admissible heuristics.
+    """
+    return _bidirectional_search(problem, initial_state, heuristic, reverse_heuristic, priority_queue, max, stats)
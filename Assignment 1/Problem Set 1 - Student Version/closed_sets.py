@@ -0,0 +1,166 @@
+from array import array
+from typing import Any, Hashable, List, Optional, Set, Union
+import math, sys
+
+from problem import Problem, S
+from search_stats import SearchStats
+
+# This file contains the closed sets (the sets of explored states) that the search functions can use instead of a Python set.
+# A Python set stores a reference to every state, and every state is a full object (e.g. a SokobanState with its ints),
+# which costs well over 100 bytes per explored state. The compact closed sets only store a few bytes per state:
+#   "set": a plain Python set (the default, it is the fastest)
+#   "packed": an exact open addressing hash table of the states as fixed-width byte strings (see Problem.state_bytes).
+#             It stores the bytes of each state and a 32 bit tag (part of the hash) per slot, so the bytes are only
+#             compared when the tags match. It is slower than a set since every lookup encodes the state.
+#   "bitstate": an approximate set (a Bloom filter) which only sets a few bits per state (bitstate hashing).
+#               A state that was never added can be reported as explored (a false positive), so the search can miss
+#               some states and fail to find a solution (or return a longer one), but every solution it finds is valid.
+#               It is meant for quick solvability checks on state spaces that do not fit in memory.
+# A closed set supports "add", "in" and "len".
+
+# The number of slots of a new packed table (it doubles when it is half full)
+PACKED_INITIAL_CAPACITY = 1024
+# The default size of the bitstate filter in bits (1 MB) and its default number of hash functions
+BITSTATE_SIZE = 2**23
+BITSTATE_HASHES = 3
+
+# PackedClosedSet is an exact set of states stored as fixed-width byte strings in an open addressing table with
+# linear probing. The keys of all the slots are stored in a single bytearray and their tags in an array of uint32
+# (the tag 0 marks an empty slot, so the tags of the states always have their lowest bit set).
+class PackedClosedSet:
+    def __init__(self, problem: Problem, capacity: int = PACKED_INITIAL_CAPACITY) -> None:
+        self.encode = problem.state_bytes
+        self.width: Optional[int] = None # The number of bytes of every state (known once the first state is added)
+        self.capacity = 1 << max(capacity - 1, 1).bit_length() # A power of two
+        self.count = 0
+        self.keys = bytearray()
+        self.tags = array('I', [0]) * self.capacity
+
+    def __len__(self) -> int:
+        return self.count
+
+    # Return the slot of the key if it is in the table, otherwise the empty slot where it would be added
+    def _find(self, key: bytes, hash_value: int) -> int:
+        tags, keys, width, mask = self.tags, self.keys, self.width, self.capacity - 1
+        tag = (hash_value >> 32) & 0xFFFFFFFF | 1
+        slot = hash_value & mask
+        while True:
+            current = tags[slot]
+            if current == 0 or (current == tag and keys[slot * width:(slot + 1) * width] == key):
+                return slot
+            slot = (slot + 1) & mask
+
+    def __contains__(self, state: S) -> bool:
+        if self.width is None: return False
+        key = self.encode(state)
+        return self.tags[self._find(key, hash(key))] != 0
+
+    def add(self, state: S) -> None:
+        key = self.encode(state)
+        if self.width is None:
+            self.width = len(key)
+            self.keys = bytearray(self.width * self.capacity)
+        elif len(key) != self.width:
+            raise ValueError(f"The packed states must have the same size, got {len(key)} bytes instead of {self.width}")
+        hash_value = hash(key)
+        slot = self._find(key, hash_value)
+        if self.tags[slot] != 0: return
+        self.tags[slot] = (hash_value >> 32) & 0xFFFFFFFF | 1
+        self.keys[slot * self.width:(slot + 1) * self.width] = key
+        self.count += 1
+        if 2 * self.count > self.capacity: self._grow()
+
+    # Double the capacity of the table and insert the keys again
+    def _grow(self) -> None:
+        width, old_keys, old_tags = self.width, self.keys, self.tags
+        self.capacity *= 2
+        self.keys = bytearray(width * self.capacity)
+        self.tags = array('I', [0]) * self.capacity
+        for old_slot, tag in enumerate(old_tags):
+            if tag == 0: continue
+            key = bytes(old_keys[old_slot * width:(old_slot + 1) * width])
+            slot = self._find(key, hash(key))
+            self.tags[slot] = tag
+            self.keys[slot * width:(slot + 1) * width] = key
+
+    # Return the memory used by the table in bytes
+    def memory(self) -> int:
+        return sys.getsizeof(self.keys) + sys.getsizeof(self.tags)
+
+# BitstateClosedSet is a Bloom filter over the hashes of the states: a state sets "hashes" bits of the filter
+# (chosen by double hashing from the 64 bit hash of the state) and it is considered explored if all its bits are set.
+# Its length is the number of added states which did not look explored (so it may be lower than the real number).
+class BitstateClosedSet:
+    def __init__(self, size: int = BITSTATE_SIZE, hashes: int = BITSTATE_HASHES) -> None:
+        if size < 8 or hashes < 1:
+            raise ValueError(f"The bitstate filter needs at least 8 bits and 1 hash function, got {size} bits and {hashes}")
+        self.size = size
+        self.hashes = hashes
+        self.bits = bytearray((size + 7) // 8)
+        self.count = 0
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _positions(self, state: Hashable) -> List[int]:
+        hash_value = hash(state)
+        first, step = hash_value & 0xFFFFFFFF, (hash_value >> 32) & 0xFFFFFFFF | 1
+        return [(first + index * step) % self.size for index in range(self.hashes)]
+
+    def __contains__(self, state: Hashable) -> bool:
+        bits = self.bits
+        return all(bits[position >> 3] >> (position & 7) & 1 for position in self._positions(state))
+
+    def add(self, state: Hashable) -> None:
+        bits, new = self.bits, False
+        for position in self._positions(state):
+            byte, mask = position >> 3, 1 << (position & 7)
+            if not bits[byte] & mask:
+                bits[byte] |= mask
+                new = True
+        if new: self.count += 1
+
+    # Return the probability that a state which was never added is reported as explored
+    def false_positive_rate(self) -> float:
+        return (1 - math.exp(-self.hashes * self.count / self.size)) ** self.hashes
+
+    # Return the memory used by the filter in bytes
+    def memory(self) -> int:
+        return sys.getsizeof(self.bits)
+
+ClosedSet = Union[Set[Any], PackedClosedSet, BitstateClosedSet]
+
+ClosedSets = {
+    "set": lambda problem: set(),
+    "packed": PackedClosedSet,
+    "bitstate": lambda problem: BitstateClosedSet(),
+}
+
+# Return a closed set given its name (see the top of the file) or the closed set itself if it is already an object.
+# If a SearchStats object is given, the memory of the closed set is recorded when the search ends (see search_stats.py).
+def create_closed_set(kind: Union[str, ClosedSet], problem: Problem = None, stats: SearchStats = None) -> ClosedSet:
+    if isinstance(kind, str):
+        if kind not in ClosedSets:
+            raise ValueError(f"Unknown closed set '{kind}', expected one of {list(ClosedSets)}")
+        kind = ClosedSets[kind](problem)
+    if stats is not None:
+        stats.track_closed_set(lambda: closed_set_memory(kind))
+    return kind
+
+# Return the memory used by a closed set in bytes. For a Python set, it includes the states themselves
+# (and their int, tuple and frozenset fields, but not the objects that they share such as the sokoban layout).
+def closed_set_memory(closed: ClosedSet) -> int:
+    if not isinstance(closed, (set, frozenset)):
+        return closed.memory()
+    return sys.getsizeof(closed) + sum(_state_memory(state) for state in closed)
+
+def _state_memory(state: Any) -> int:
+    size = sys.getsizeof(state)
+    fields = getattr(state, "__slots__", None)
+    values = [getattr(state, name, None) for name in fields] if fields is not None else list(getattr(state, "__dict__", {}).values())
+    for value in values:
+        if isinstance(value, int):
+            size += sys.getsizeof(value)
+        elif isinstance(value, (tuple, frozenset)):
+            size += sys.getsizeof(value) + sum(sys.getsizeof(item) for item in value if isinstance(item, int))
+    return size
@@ -0,0 +1,219 @@
+from typing import Dict, List, Tuple
+import heapq
+
+from graph import GraphRoutingProblem, GraphNode
+from mathutils import euclidean_distance
+from problem import Solution
+from search_stats import SearchStats, instrumented, timed_phase
+
+# This file implements a contraction hierarchy (CH) for the graph routing problem.
+# The preprocessing step contracts the nodes one by one (from the least important to the most important).
+# Contracting a node removes it from the graph, and for every pair of neighbors (u, w) where the shortest path
+# from u to w goes through the contracted node, a shortcut edge u->w is added with the cost of that path.
+# The rank of a node is the order in which it was contracted.
+# A query runs a bidirectional Dijkstra where both searches only follow the edges that go to higher ranked nodes,
+# so each search only visits a small part of the graph. Then the shortcuts on the found path are unpacked
+# back into the original edges.
+
+# The maximum number of nodes settled by a witness search before giving up (and adding the shortcut anyway).
+# Adding an unnecessary shortcut never breaks the queries, it only makes them slightly slower.
+WITNESS_SETTLE_LIMIT = 64
+
+class ContractionHierarchy:
+    def __init__(self, nodes: List[GraphNode]) -> None:
+        self.nodes = nodes # The nodes sorted by name (a node is referred to by its index in this list)
+        self.index: Dict[GraphNode, int] = {node: index for index, node in enumerate(nodes)}
+        self.rank: List[int] = [0] * len(nodes) # The order in which each node was contracted
+        # upward[u] is the list of (w, cost) for the edges u->w where w has a higher rank than u (used by the forward search)
+        self.upward: List[List[Tuple[int, float]]] = [[] for _ in nodes]
+        # downward[u] is the list of (w, cost) for the edges w->u where w has a higher rank than u (used by the backward search)
+        self.downward: List[List[Tuple[int, float]]] = [[] for _ in nodes]
+        # The middle node of each shortcut edge (u, w). The original edges are not in this dictionary.
+        self.middle: Dict[Tuple[int, int], int] = {}
+
+    # Contract the graph of the given problem and return its contraction hierarchy.
+    # The nodes are contracted in the order of their edge difference (the number of shortcuts that would be added minus
+    # the number of edges that would be removed) plus the number of neighbors that were already contracted
+    # (which spreads the contraction uniformly over the graph). The priorities are updated lazily:
+    # when a node is popped, its priority is recomputed and if it is no longer the lowest, it is pushed back.
+    @staticmethod
+    def build(problem: GraphRoutingProblem) -> 'ContractionHierarchy':
+        nodes = sorted(set(problem.adjacency) | set(problem.reverse_adjacency), key=lambda node: node.name)
+        hierarchy = ContractionHierarchy(nodes)
+        index = hierarchy.index
+        # The edges of the remaining graph: outgoing[u][w] and incoming[w][u] are the cost of the edge u->w
+        outgoing: List[Dict[int, float]] = [{} for _ in nodes]
+        incoming: List[Dict[int, float]] = [{} for _ in nodes]
+        for node, adjacent in problem.adjacency.items():
+            u = index[node]
+            for next_node in adjacent:
+                w = index[next_node]
+                if u == w: continue # A self loop is never on a shortest path
+                outgoing[u][w] = incoming[w][u] = euclidean_distance(node.position, next_node.position)
+        contracted_neighbors = [0] * len(nodes)
+
+        # Return the shortcuts (u, w, cost) that are needed if the node v is contracted
+        def shortcuts(v: int) -> List[Tuple[int, int, float]]:
+            needed = []
+            for u, in_cost in incoming[v].items():
+                targets = {w: in_cost + out_cost for w, out_cost in outgoing[v].items() if w != u}
+                if not targets: continue
+                distances = witness_search(u, v, targets, max(targets.values()))
+                for w, cost in targets.items():
+                    if distances.get(w, float('inf')) > cost:
+                        needed.append((u, w, cost))
+            return needed
+
+        # Run a Dijkstra search from u that avoids v until every target is settled, the cost limit is exceeded,
+        # or the settle limit is reached. Return the distances that were found.
+        def witness_search(u: int, v: int, targets: Dict[int, float], limit: float) -> Dict[int, float]:
+            distances = {u: 0}
+            queue = [(0, u)]
+            settled, remaining = 0, len(targets)
+            while queue and settled < WITNESS_SETTLE_LIMIT:
+                distance, x = heapq.heappop(queue)
+                if distance > distances[x]: continue
+                if distance > limit: break
+                settled += 1
+                if x in targets:
+                    remaining -= 1
+                    if remaining == 0: break
+                for y, cost in outgoing[x].items():
+                    if y == v: continue
+                    next_distance = distance + cost
+                    if next_distance < distances.get(y, float('inf')):
+                        distances[y] = next_distance
+                        heapq.heappush(queue, (next_distance, y))
+            return distances
+
+        def priority(v: int) -> int:
+            return len(shortcuts(v)) - len(incoming[v]) - len(outgoing[v]) + contracted_neighbors[v]
+
+        queue = [(priority(v), v) for v in range(len(nodes))]
+        heapq.heapify(queue)
+        rank = 0
+        while queue:
+            _, v = heapq.heappop(queue)
+            # Lazy update: if the priority increased and the node is no longer the lowest, it goes back into the queue
+            current = priority(v)
+            if queue and current > queue[0][0]:
+                heapq.heappush(queue, (current, v))
+                continue
+            for u, w, cost in shortcuts(v):
+                if cost < outgoing[u].get(w, float('inf')):
+                    outgoing[u][w] = incoming[w][u] = cost
+                    hierarchy.middle[(u, w)] = v
+            # The remaining neighbors have a higher rank than v, so the edges of v are stored in the upward graphs
+            hierarchy.rank[v] = rank
+            rank += 1
+            hierarchy.upward[v] = list(outgoing[v].items())
+            hierarchy.downward[v] = list(incoming[v].items())
+            for w in outgoing[v]:
+                del incoming[w][v]
+                contracted_neighbors[w] += 1
+            for u in incoming[v]:
+                del outgoing[u][v]
+                contracted_neighbors[u] += 1
+            outgoing[v], incoming[v] = {}, {}
+        return hierarchy
+
+    # Find the shortest path from start to goal and return the list of nodes after the start (like UniformCostSearch).
+    # Returns None if the goal cannot be reached.
+    def query(self, start: GraphNode, goal: GraphNode, stats: SearchStats = None) -> Solution:
+        if start == goal:
+            return []
+        if start not in self.index or goal not in self.index:
+            return None
+        source, target = self.index[start], self.index[goal]
+        infinity = float('inf')
+        # For each direction: the distances, the parent of each node and the queue
+        distances = ({source: 0}, {target: 0})
+        parents = ({source: None}, {target: None})
+        queues = ([(0, source)], [(0, target)])
+        graphs = (self.upward, self.downward)
+        best_cost, meeting = infinity, None
+        # Both searches continue until the lowest distance in their queue is not lower than the best cost.
+        # The searches cannot stop when they meet, since the shortest path goes through the highest ranked node on it
+        # which is not necessarily the first node reached by both searches.
+        while any(queue and queue[0][0] < best_cost for queue in queues):
+            direction = 0 if queues[0] and (not queues[1] or queues[0][0] <= queues[1][0]) else 1
+            distance, x = heapq.heappop(queues[direction])
+            if distance > distances[direction][x] or distance >= best_cost:
+                if stats is not None: stats.duplicates += 1
+                continue
+            other_distance = distances[1 - direction].get(x)
+            if other_distance is not None and distance + other_distance < best_cost:
+                best_cost, meeting = distance + other_distance, x
+            edges = graphs[direction][x]
+            if stats is not None:
+                stats.expand(len(edges), len(queues[0]) + len(queues[1]), len(distances[0]) + len(distances[1]))
+            for y, cost in edges:
+                next_distance = distance + cost
+                if next_distance < distances[direction].get(y, infinity):
+                    distances[direction][y] = next_distance
+                    parents[direction][y] = x
+                    heapq.heappush(queues[direction], (next_distance, y))
+                elif stats is not None: stats.duplicates += 1
+        if meeting is None:
+            return None
+
+        # Collect the nodes of the path in the hierarchy (which may contain shortcuts) then unpack the shortcuts
+        forward_path, x = [], meeting
+        while x is not None:
+            forward_path.append(x)
+            x = parents[0][x]
+        forward_path.reverse()
+        x = parents[1][meeting]
+        while x is not None:
+            forward_path.append(x)
+            x = parents[1][x]
+        path = [source]
+        for u, w in zip(forward_path, forward_path[1:]):
+            self._unpack(u, w, path)
+        return [self.nodes[x] for x in path[1:]]
+
+    # Append the original nodes after u on the edge u->w to the path (the middle nodes of the shortcuts then w)
+    def _unpack(self, u: int, w: int, path: List[int]) -> None:
+        stack = [(u, w)]
+        while stack:
+            u, w = stack.pop()
+            v = self.middle.get((u, w))
+            if v is None:
+                path.append(w)
+            else:
+                # Unpack u->v first, so it is pushed last
+                stack.append((v, w))
+                stack.append((u, v))
+
+# Return the contraction hierarchy of the problem's graph (and build it if it was not built before).
+# The hierarchy is stored in the graph cache, so it is only built once for each graph file.
+def contraction_hierarchy(problem: GraphRoutingProblem) -> ContractionHierarchy:
+    cache = problem.graph_cache()
+    hierarchy = cache.get("contraction_hierarchy")
+    if hierarchy is None:
+        hierarchy = cache["contraction_hierarchy"] = ContractionHierarchy.build(problem)
+    return hierarchy
+
+@instrumented
+def ContractionHierarchySearch(problem: GraphRoutingProblem, initial_state: GraphNode, stats: SearchStats = None) -> Solution:
+    """
+    Find the lowest cost path from the initial state to the goal using a contraction hierarchy of the graph.
+
+    Args:
+        problem (GraphRoutingProblem): The graph routing problem to be solved.
+        initial_state (GraphNode): The initial state from which to start the search.
+        stats (SearchStats): If given, it is filled with the statistics of the query (see search_stats.py)
+                             and the time spent building the hierarchy is recorded as the "preprocessing" phase.
+
+    Returns:
+        Solution: A list of actions (nodes) that define the lowest cost path from the initial state to the goal,
+                  in the same format as UniformCostSearch. Returns None if no solution is found.
+
+    The first query on a graph builds the hierarchy (which is slow) and stores it in the graph cache.
+    The following queries on the same graph only run the bidirectional upward search, which visits a tiny part of
+    the graph compared to UniformCostSearch. The nodes are not expanded through "problem.get_actions", so the
+    traversal order is not recorded for this search.
+    """
+    with timed_phase(stats, "preprocessing"):
+        hierarchy = contraction_hierarchy(problem)
+    return hierarchy.query(initial_state, problem.goal, stats)
@@ -0,0 +1,200 @@
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+import heapq, os, pickle, struct, tempfile
+
+from problem import Problem, S, A, Solution
+from search_stats import SearchStats, instrumented
+
+# This file implements an external-memory breadth first search with delayed duplicate detection.
+# The search keeps almost nothing in memory: every layer of the search (the states at the same depth) is stored on the
+# disk, and the duplicates are only removed once the whole next layer was generated:
+#   1. The states of the current layer are expanded in BFS order, and the generated states are collected in a buffer
+#      which is sorted and written to a "run" file whenever it is full.
+#   2. The runs are merged (they are sorted, so this is a single pass), which brings the copies of each state together.
+#      Only the first copy is kept, and the states that are in the sorted file of all the visited states are dropped.
+#      The remaining states are the new layer, and they are merged into the visited file at the same time.
+#   3. The new layer is sorted back into BFS order (in the same way, with runs) so it can be expanded next.
+# Every record stores the state (packed with problem.pack_state then pickled, so equal states have equal bytes),
+# the rank of its parent in the previous layer, the index of the successor that generated it and the (pickled) action
+# that generated it.
+# In BreadthFirstSearch, the position of a state in its layer is the order in which it was first generated, which is
+# the order of (parent rank, successor index) of its first copy. So the layers have exactly the same order, and since
+# BreadthFirstSearch returns the first goal it generates, this search returns exactly the same solution.
+# The solution is rebuilt by reading the action and the parent of each state from the layer files, from the goal back to
+# the initial state, so no state is expanded again.
+
+# The layout of a record: the length of the state bytes (uint32), the parent rank (int64), the successor index (int32)
+# and the length of the action bytes (uint32), followed by the state bytes and the action bytes
+_RECORD = struct.Struct("<IqiI")
+# The size of the file buffers in bytes
+FILE_BUFFER_SIZE = 1 << 20
+# The maximum number of run files that are merged at once (merging more runs would open too many files),
+# so larger numbers of runs are merged in several passes
+MAX_MERGED_RUNS = 64
+
+Record = Tuple[bytes, int, int, bytes] # (state bytes, parent rank, successor index, action bytes)
+
+def _write_records(path: str, records: Iterable[Record]) -> int:
+    count = 0
+    with open(path, "wb", buffering=FILE_BUFFER_SIZE) as file:
+        for key, parent, index, action in records:
+            file.write(_RECORD.pack(len(key), parent, index, len(action)))
+            file.write(key)
+            file.write(action)
+            count += 1
+    return count
+
+def _read_records(path: str) -> Iterator[Record]:
+    with open(path, "rb", buffering=FILE_BUFFER_SIZE) as file:
+        while True:
+            header = file.read(_RECORD.size)
+            if not header:
+                return
+            length, parent, index, action_length = _RECORD.unpack(header)
+            yield file.read(length), parent, index, file.read(action_length)
+
+# The temporary files of a search. The buffers of records are sorted and written to run files
+# which can then be merged into a single sorted stream.
+class _Workspace:
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        self.counter = 0
+
+    def path(self, name: str) -> str:
+        self.counter += 1
+        return os.path.join(self.directory, f"{name}-{self.counter}.bin")
+
+    # Sort the records (in memory) and write them to a new run file
+    def spill(self, records: List[Record], order: Optional[Callable[[Record], object]], runs: List[str]) -> None:
+        records.sort(key=order)
+        path = self.path("run")
+        _write_records(path, records)
+        runs.append(path)
+        records.clear()
+
+    # Return the records of the sorted runs as a single sorted stream. The runs are removed by the caller
+    # once the stream was read, but the intermediate runs of a multi-pass merge are removed here.
+    def merge(self, runs: List[str], order: Optional[Callable[[Record], object]]) -> Iterator[Record]:
+        merged: List[str] = []
+        while len(runs) > MAX_MERGED_RUNS:
+            group, runs = runs[:MAX_MERGED_RUNS], runs[MAX_MERGED_RUNS:]
+            path = self.path("run")
+            _write_records(path, heapq.merge(*(_read_records(run) for run in group), key=order))
+            self.remove(set(group).intersection(merged))
+            merged.append(path)
+            runs.append(path)
+        yield from heapq.merge(*(_read_records(path) for path in runs), key=order)
+        self.remove(set(runs).intersection(merged))
+
+    @staticmethod
+    def remove(paths: Iterable[str]) -> None:
+        for path in paths:
+            os.remove(path)
+
+# The order of the records in BFS order (by parent rank then successor index)
+def _bfs_order(record: Record) -> Tuple[int, int]:
+    return record[1], record[2]
+
+@instrumented
+def ExternalBreadthFirstSearch(problem: Problem[S, A], initial_state: S, directory: Optional[str] = None,
+                               buffer_size: int = 2**16, stats: SearchStats = None) -> Solution:
+    """
+    Perform a breadth first search that stores its layers on the disk to find the shortest path to a goal state.
+
+    Args:
+        problem (Problem[S, A]): The problem to be solved, containing state transitions and goal tests.
+                                 Its states are written to the disk using "pack_state" and "unpack_state".
+        initial_state (S): The initial state from which to start the search.
+        directory (str): The directory where the temporary files are created (the system default if None).
+                         They are deleted when the search ends.
+        buffer_size (int): The maximum number of generated states kept in memory before they are written to the disk.
+        stats (SearchStats): If given, it is filled with the statistics of the search (see search_stats.py).
+                             The frontier size is the size of the expanded layer and the closed set is the visited file.
+
+    Returns:
+        Solution: A list of actions that define a path from the initial state to a goal state (the same one as
+                  BreadthFirstSearch). Returns None if no solution is found.
+
+    The layers are expanded one by one and the duplicates are removed by sorting and merging the files of the generated
+    states (see the top of the file), so the memory use is bounded by the buffer size instead of the number of states,
+    and the disk is only read and written sequentially. Like BreadthFirstSearch, the goal test is applied when a state
+    is generated, and the search stops at the first goal that was not visited before. Since the layers before it do
+    not contain any goal (the search would have stopped there), only the initial state has to be checked for that.
+    The actions are stored with the states, so rebuilding the solution only reads the layer files.
+    """
+    with tempfile.TemporaryDirectory(prefix="external-bfs-", dir=directory) as workspace_directory:
+        workspace = _Workspace(workspace_directory)
+        encode = lambda state: pickle.dumps(problem.pack_state(state), pickle.HIGHEST_PROTOCOL)
+        decode = lambda key: problem.unpack_state(pickle.loads(key))
+        initial_key = encode(initial_state)
+        layers = [workspace.path("layer")] # The files of the layers in BFS order
+        _write_records(layers[0], [(initial_key, -1, -1, b"")])
+        visited = workspace.path("visited") # The sorted file of all the visited states
+        _write_records(visited, [(initial_key, -1, -1, b"")])
+        visited_count = layer_size = 1
+
+        while True:
+            # 1. Expand the current layer and write the generated states to sorted runs
+            runs: List[str] = []
+            buffer: List[Record] = []
+            for rank, (key, _, _, _) in enumerate(_read_records(layers[-1])):
+                successors = list(problem.get_successors(decode(key)))
+                if stats is not None: stats.expand(len(successors), layer_size, visited_count)
+                for index, (action, next_state, _) in enumerate(successors):
+                    if next_state is None: continue
+                    next_key = encode(next_state)
+                    if next_key != initial_key and problem.is_goal(next_state):
+                        _Workspace.remove(runs)
+                        return _rebuild_path(layers, rank, action)
+                    buffer.append((next_key, rank, index, pickle.dumps(action, pickle.HIGHEST_PROTOCOL)))
+                    if len(buffer) >= buffer_size: workspace.spill(buffer, None, runs)
+            if buffer: workspace.spill(buffer, None, runs)
+
+            # 2. Keep the first copy of every new state and merge the new states into the visited file
+            next_visited = workspace.path("visited")
+            ranked_runs: List[str] = []
+            previous_key = None
+            with open(next_visited, "wb", buffering=FILE_BUFFER_SIZE) as output:
+                def keep(key: bytes) -> None:
+                    output.write(_RECORD.pack(len(key), -1, -1, 0))
+                    output.write(key)
+                old_states = _read_records(visited)
+                old_key = next(old_states, (None,))[0]
+                for key, parent, index, action in workspace.merge(runs, None):
+                    if key == previous_key: # A later copy of the same state in this layer
+                        if stats is not None: stats.duplicates += 1
+                        continue
+                    previous_key = key
+                    while old_key is not None and old_key < key:
+                        keep(old_key)
+                        old_key = next(old_states, (None,))[0]
+                    if old_key == key: # The state was visited in a previous layer
+                        if stats is not None: stats.duplicates += 1
+                        continue
+                    keep(key)
+                    visited_count += 1
+                    buffer.append((key, parent, index, action))
+                    if len(buffer) >= buffer_size: workspace.spill(buffer, _bfs_order, ranked_runs)
+                while old_key is not None:
+                    keep(old_key)
+                    old_key = next(old_states, (None,))[0]
+            if buffer: workspace.spill(buffer, _bfs_order, ranked_runs)
+            _Workspace.remove(runs + [visited])
+            visited = next_visited
+            if not ranked_runs:
+                return None  # If no solution is found
+
+            # 3. Sort the new layer back into BFS order
+            layers.append(workspace.path("layer"))
+            layer_size = _write_records(layers[-1], workspace.merge(ranked_runs, _bfs_order))
+            _Workspace.remove(ranked_runs)
+
+# Rebuild the path to the goal generated by the given action from the state at "rank" in the last layer
+def _rebuild_path(layers: List[str], rank: int, action: A) -> List[A]:
+    path = [action]
+    for layer in reversed(layers[1:]): # The first layer only holds the initial state
+        for position, (_, parent, _, action_bytes) in enumerate(_read_records(layer)):
+            if position == rank: break
+        path.append(pickle.loads(action_bytes))
+        rank = parent
+    path.reverse()
+    return path
@@ -0,0 +1,237 @@
+from typing import Any, Deque, Dict, Generic, Hashable, List, Tuple, TypeVar, Union
+from collections import deque
+import heapq
+
+from problem import Problem, S
+
+# K is used for the keys of the indexed heap
+K = TypeVar("K", bound=Hashable)
+
+# IndexedHeap is an addressable binary min-heap.
+# Every key appears at most once in the heap and its position is stored in a dictionary,
+# so the priority of a key can be looked up, decreased (or increased) and the key can be removed in O(log n).
+# Priorities can be anything that supports "<" (for example, a tuple (f, counter) to break ties in FIFO order).
+class IndexedHeap(Generic[K]):
+    __slots__ = ("entries", "positions")
+
+    def __init__(self) -> None:
+        self.entries: List[List[Any]] = []  # List of [priority, key]
+        self.positions: Dict[K, int] = {}   # The index of each key in the entries list
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, key: K) -> bool:
+        return key in self.positions
+
+    # Return the priority of the given key (the key must be in the heap)
+    def priority(self, key: K) -> Any:
+        return self.entries[self.positions[key]][0]
+
+    # Return the key with the lowest priority and its priority without removing it
+    def peek(self) -> Tuple[K, Any]:
+        priority, key = self.entries[0]
+        return key, priority
+
+    # Insert the key if it is not in the heap, otherwise change its priority
+    def push(self, key: K, priority: Any) -> None:
+        index = self.positions.get(key)
+        if index is None:
+            self.entries.append([priority, key])
+            self.positions[key] = len(self.entries) - 1
+            self._sift_up(len(self.entries) - 1)
+            return
+        entry = self.entries[index]
+        old_priority, entry[0] = entry[0], priority
+        if priority < old_priority:
+            self._sift_up(index)
+        else:
+            self._sift_down(index)
+
+    # Lower the priority of the key (or insert it) and return True.
+    # If the key is already in the heap with a priority that is not higher, nothing changes and False is returned.
+    def decrease(self, key: K, priority: Any) -> bool:
+        index = self.positions.get(key)
+        if index is not None and not priority < self.entries[index][0]:
+            return False
+        self.push(key, priority)
+        return True
+
+    # Remove and return the key with the lowest priority and its priority
+    def pop(self) -> Tuple[K, Any]:
+        priority, key = self.entries[0]
+        self._remove_at(0)
+        return key, priority
+
+    # Remove the given key from the heap (the key must be in the heap)
+    def remove(self, key: K) -> None:
+        self._remove_at(self.positions[key])
+
+    def _remove_at(self, index: int) -> None:
+        entries, positions = self.entries, self.positions
+        del positions[entries[index][1]]
+        last = entries.pop()
+        if index < len(entries):
+            entries[index] = last
+            positions[last[1]] = index
+            self._sift_down(index)
+            self._sift_up(index)
+
+    def _sift_up(self, index: int) -> None:
+        entries, positions = self.entries, self.positions
+        entry = entries[index]
+        while index > 0:
+            parent = (index - 1) >> 1
+            parent_entry = entries[parent]
+            if not entry[0] < parent_entry[0]: break
+            entries[index] = parent_entry
+            positions[parent_entry[1]] = index
+            index = parent
+        entries[index] = entry
+        positions[entry[1]] = index
+
+    def _sift_down(self, index: int) -> None:
+        entries, positions = self.entries, self.positions
+        size = len(entries)
+        entry = entries[index]
+        while True:
+            child = 2 * index + 1
+            if child >= size: break
+            if child + 1 < size and entries[child + 1][0] < entries[child][0]:
+                child += 1
+            child_entry = entries[child]
+            if not child_entry[0] < entry[0]: break
+            entries[index] = child_entry
+            positions[child_entry[1]] = index
+            index = child
+        entries[index] = entry
+        positions[entry[1]] = index
+
+# The frontiers below are the priority queues used by UniformCostSearch and AStarSearch.
+# They all have the same interface:
+#   push(priority, state, node) adds a state with its node index (from the NodeStore)
+#   pop() removes and returns the (priority, state, node) with the lowest priority
+#   peek() returns the lowest priority without removing its entry
+# Ties are broken in FIFO order (the state that was pushed first is popped first).
+# Each frontier also tracks the peak number of entries it held during the search.
+
+# HeapFrontier is the classic heapq frontier. A state may be pushed multiple times
+# (e.g. when a better path to it is found), so stale duplicates have to be skipped (or re-expanded) by the search.
+class HeapFrontier(Generic[S]):
+    __slots__ = ("heap", "counter", "peak")
+
+    def __init__(self) -> None:
+        self.heap: List[Tuple[float, int, S, int]] = [] # List of (priority, counter, state, node)
+        self.counter = 0 # Global counter for tie-breaking
+        self.peak = 0
+
+    def __len__(self) -> int:
+        return len(self.heap)
+
+    def push(self, priority: float, state: S, node: int) -> None:
+        heapq.heappush(self.heap, (priority, self.counter, state, node))
+        self.counter += 1
+        if len(self.heap) > self.peak: self.peak = len(self.heap)
+
+    def pop(self) -> Tuple[float, S, int]:
+        priority, _, state, node = heapq.heappop(self.heap)
+        return priority, state, node
+
+    def peek(self) -> float:
+        return self.heap[0][0]
+
+# IndexedHeapFrontier keeps at most one entry per state by using an IndexedHeap keyed by state.
+# Pushing a state that is already in the frontier performs a decrease-key if the new priority is lower,
+# otherwise the push is ignored. The counter is refreshed on a decrease-key so the order is the same
+# as if the better entry was pushed as a new entry into a heapq frontier.
+class IndexedHeapFrontier(Generic[S]):
+    __slots__ = ("heap", "nodes", "counter", "peak")
+
+    def __init__(self) -> None:
+        self.heap: IndexedHeap[S] = IndexedHeap() # Priorities are (priority, counter)
+        self.nodes: Dict[S, int] = {} # The node index of each state in the frontier
+        self.counter = 0
+        self.peak = 0
+
+    def __len__(self) -> int:
+        return len(self.heap)
+
+    def __contains__(self, state: S) -> bool:
+        return state in self.heap
+
+    def push(self, priority: float, state: S, node: int) -> None:
+        if self.heap.decrease(state, (priority, self.counter)):
+            self.nodes[state] = node
+            self.counter += 1
+            if len(self.heap) > self.peak: self.peak = len(self.heap)
+
+    def pop(self) -> Tuple[float, S, int]:
+        state, (priority, _) = self.heap.pop()
+        return priority, state, self.nodes.pop(state)
+
+    def peek(self) -> float:
+        _, (priority, _) = self.heap.peek()
+        return priority
+
+# BucketFrontier is a bucket (Dial) queue for problems with integer action costs.
+# States with the same priority share a FIFO bucket, so pushing and popping within a bucket is O(1)
+# and the order is exactly the (priority, counter) order of the heapq frontier.
+# When the costs are integers, only a handful of distinct priorities are alive at any time
+# (e.g. f and f+1 for unit costs), so the non-empty buckets are kept in a small heap of priorities
+# instead of scanning an array of empty buckets. This also keeps the queue correct for any priority
+# (e.g. an infinite heuristic value or a float heuristic added to an integer g).
+class BucketFrontier(Generic[S]):
+    __slots__ = ("buckets", "priorities", "size", "peak")
+
+    def __init__(self) -> None:
+        self.buckets: Dict[float, Deque[Tuple[S, int]]] = {} # The (state, node) entries for each priority
+        self.priorities: List[float] = [] # A heap of the priorities which have a non-empty bucket
+        self.size = 0
+        self.peak = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def push(self, priority: float, state: S, node: int) -> None:
+        bucket = self.buckets.get(priority)
+        if bucket is None:
+            bucket = self.buckets[priority] = deque()
+            heapq.heappush(self.priorities, priority)
+        bucket.append((state, node))
+        self.size += 1
+        if self.size > self.peak: self.peak = self.size
+
+    def pop(self) -> Tuple[float, S, int]:
+        priority = self.priorities[0]
+        bucket = self.buckets[priority]
+        state, node = bucket.popleft()
+        if not bucket:
+            del self.buckets[priority]
+            heapq.heappop(self.priorities)
+        self.size -= 1
+        return priority, state, node
+
+    def peek(self) -> float:
+        return self.priorities[0]
+
+# The frontiers that can be selected by name in UniformCostSearch and AStarSearch
+Frontiers = {
+    "heapq": HeapFrontier,
+    "indexed": IndexedHeapFrontier,
+    "bucket": BucketFrontier,
+}
+
+Frontier = Union[HeapFrontier, IndexedHeapFrontier, BucketFrontier]
+
+# Create a frontier from its name. If a frontier object is given instead, it is returned as is
+# (this can be used to inspect the frontier after the search, e.g. to read its peak size).
+# The name "auto" picks the bucket frontier if the problem declares that its action costs are integers
+# and the heapq frontier otherwise.
+def create_frontier(kind: Union[str, Frontier], problem: Problem = None) -> Frontier:
+    if not isinstance(kind, str):
+        return kind
+    if kind == "auto":
+        kind = "bucket" if getattr(problem, "integer_costs", False) else "heapq"
+    if kind not in Frontiers:
+        raise ValueError(f"Unknown priority queue '{kind}', expected one of {['auto', *Frontiers]}")
+    return Frontiers[kind]()
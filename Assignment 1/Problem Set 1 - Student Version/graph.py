@@ -1,10 +1,10 @@
-from typing import Dict, Iterable, List
+from typing import Any, Dict, Iterable, List, Tuple
 from dataclasses import dataclass
-import json
+import json, os
 
 from problem import Problem
 from mathutils import Point, euclidean_distance
-from helpers.utils import record_calls
+from helpers.utils import BoundedCache, record_calls, tracked_as
 
 # In the graph routing problem, the state is a graph node
 # We use dataclass with frozen=True to automatically implement:
@@ -19,13 +19,27 @@ class GraphNode:
     def __str__(self) -> str:
         return self.name
 
+# The maximum number of graph files whose caches are kept (the least recently used ones are dropped first)
+GRAPH_CACHE_SIZE = 16
+# The caches shared by all the problems read from the same graph file (see GraphRoutingProblem.graph_cache).
+# They are stored by absolute path with the modification time of the file when the cache was created.
+_graph_caches = BoundedCache(GRAPH_CACHE_SIZE)
+
 # This is the implementation of the graph routing problem
 class GraphRoutingProblem(Problem[GraphNode, GraphNode]):
-    def __init__(self, start: GraphNode, goal: GraphNode, adjacency: Dict[GraphNode, List[GraphNode]]) -> None:
+    # The file from which the problem was read (None if the problem was created in code)
+    path: str = None
+
+    def __init__(self, start: GraphNode, goal: GraphNode, adjacency: Dict[GraphNode, List[GraphNode]],
+                 reverse_adjacency: Dict[GraphNode, List[GraphNode]] = None) -> None:
         super().__init__()
         self.start = start
         self.goal = goal
         self.adjacency = adjacency
+        # The reverse adjacency stores the nodes from which each node can be reached (used by the backward searches)
+        if reverse_adjacency is None:
+            reverse_adjacency = GraphRoutingProblem.reverse(adjacency)
+        self.reverse_adjacency = reverse_adjacency
     
     def get_initial_state(self) -> GraphNode:
         return self.start
@@ -33,6 +47,9 @@ class GraphRoutingProblem(Problem[GraphNode, GraphNode]):
     def is_goal(self, state: GraphNode) -> bool:
         return state == self.goal
     
+    def get_goal_state(self) -> GraphNode:
+        return self.goal
+    
     # The actions for this problem are the neighboring nodes we can reach from the current node
     # We use @record_calls to track the arguments with which this function is called to retrieve the traversal order
     @record_calls
@@ -47,6 +64,60 @@ class GraphRoutingProblem(Problem[GraphNode, GraphNode]):
     def get_cost(self, state: GraphNode, action: GraphNode) -> float:
         return euclidean_distance(state.position, action.position)
     
+    # Return (next node, next node, cost) for every neighboring node.
+    # It is recorded as a call to get_actions so the traversal order can still be retrieved
+    @tracked_as("get_actions")
+    def get_successors(self, state: GraphNode) -> Iterable[Tuple[GraphNode, GraphNode, float]]:
+        return [(next_node, next_node, euclidean_distance(state.position, next_node.position)) for next_node in self.adjacency.get(state, [])]
+    
+    # The predecessors of a node are the nodes that have an edge to it. The action to go from a predecessor to the node
+    # is the node itself. We also use @record_calls here to retrieve the backward traversal order
+    @record_calls
+    def get_predecessors(self, state: GraphNode) -> Iterable[Tuple[GraphNode, GraphNode, float]]:
+        return [(state, previous, euclidean_distance(previous.position, state.position)) for previous in self.reverse_adjacency.get(state, [])]
+    
+    # Return a dictionary to store the data that only depends on the graph (not on the start or the goal),
+    # such as the results of a preprocessing step. If the problem was read from a file, the dictionary is shared
+    # by every problem read from the same file (until the file is modified, then the old data is dropped),
+    # so the preprocessing is only done once. Otherwise, the problem's own cache is returned.
+    def graph_cache(self) -> Dict[Any, Any]:
+        if self.path is None:
+            return self.cache()
+        path = os.path.abspath(self.path)
+        mtime = os.path.getmtime(path)
+        entry = _graph_caches.get(path)
+        if entry is None or entry[0] != mtime:
+            entry = _graph_caches[path] = (mtime, {})
+        return entry[1]
+    
+    # Add or remove an edge of the graph (e.g. to simulate a road that opens or closes while an agent is moving).
+    # The problem then stops sharing the graph cache of its file (see graph_cache), and its own cache is cleared,
+    # since the data computed from the previous graph (e.g. the contraction hierarchy) is no longer valid.
+    def add_edge(self, source: GraphNode, target: GraphNode) -> None:
+        if target in self.adjacency.setdefault(source, []): return
+        self.adjacency[source].append(target)
+        self.reverse_adjacency.setdefault(target, []).append(source)
+        self._graph_changed()
+
+    def remove_edge(self, source: GraphNode, target: GraphNode) -> None:
+        if target not in self.adjacency.get(source, []): return
+        self.adjacency[source].remove(target)
+        self.reverse_adjacency[target].remove(source)
+        self._graph_changed()
+
+    def _graph_changed(self) -> None:
+        self.path = None
+        self.cache().clear()
+
+    # Build the reverse adjacency of the given adjacency
+    @staticmethod
+    def reverse(adjacency: Dict[GraphNode, List[GraphNode]]) -> Dict[GraphNode, List[GraphNode]]:
+        reverse_adjacency: Dict[GraphNode, List[GraphNode]] = {node: [] for node in adjacency}
+        for node, adjacent in adjacency.items():
+            for next_node in adjacent:
+                reverse_adjacency.setdefault(next_node, []).append(node)
+        return reverse_adjacency
+    
     # Read a graph routing problem from file
     @staticmethod
     def from_file(path: str) -> 'GraphRoutingProblem':
@@ -54,13 +125,22 @@ class GraphRoutingProblem(Problem[GraphNode, GraphNode]):
         graph_def: Dict[str, Dict] = problem_def.get("graph", {})
         node_dict = {name: GraphNode(name, Point(*item.get("position", [0,0]))) for name, item in graph_def.items()}
         adjacency: Dict[GraphNode, List[GraphNode]] = {}
+        reverse_adjacency: Dict[GraphNode, List[GraphNode]] = {node: [] for node in node_dict.values()}
         for name, item in graph_def.items():
             node = node_dict[name]
             adjacent = [node_dict[adjacent] for adjacent in sorted(item.get("adjacent", [])) if adjacent in node_dict]
             adjacency[node] = adjacent
+            for next_node in adjacent:
+                reverse_adjacency[next_node].append(node)
         start = node_dict[problem_def.get("start", "")]
         goal = node_dict[problem_def.get("goal", "")]
-        return GraphRoutingProblem(start, goal, adjacency)
+        problem = GraphRoutingProblem(start, goal, adjacency, reverse_adjacency)
+        problem.path = path
+        return problem
 
 def graphrouting_heuristic(problem: GraphRoutingProblem, state: GraphNode) -> float:
-    return euclidean_distance(state.position, problem.goal.position)
\ No newline at end of file
+    return euclidean_distance(state.position, problem.goal.position)
+
+# The heuristic of the backward search estimates the path cost from the initial state to the given state
+def graphrouting_reverse_heuristic(problem: GraphRoutingProblem, initial_state: GraphNode, state: GraphNode) -> float:
+    return euclidean_distance(initial_state.position, state.position)
@@ -0,0 +1,192 @@
+from typing import Iterable, List, Sequence, Tuple
+from array import array
+from bisect import bisect_left
+import argparse, math, mmap, struct, sys
+
+from problem import Problem
+from graph import GraphRoutingProblem
+from helpers.utils import record_calls, tracked_as
+
+# This file implements a compact version of the graph routing problem.
+# The nodes are numbered from 0 to n-1 (in the order of their names) and the graph is stored in the CSR
+# (Compressed Sparse Row) format: the edges that leave the node u are at the indices offsets[u] to offsets[u+1]-1
+# of the 'targets' array (sorted by node index) and their costs are at the same indices of the 'weights' array.
+# The reverse graph is stored in the same way (used by the backward searches).
+# Every array is a flat typed array, so an edge costs 16 bytes (24 bytes with the reverse graph) instead of a list entry
+# pointing to a GraphNode object, and the edge costs are only computed once.
+
+# The layout of the binary file (all the numbers are little-endian):
+#   header: magic (4 bytes), version (uint32), node count n (int64), edge count m (int64), start (int64), goal (int64),
+#           size of the names block in bytes (int64)
+#   offsets (n+1 x int64), targets (m x int64), weights (m x float64),
+#   reverse offsets (n+1 x int64), sources (m x int64), reverse weights (m x float64),
+#   x positions (n x float64), y positions (n x float64), name offsets (n+1 x int64), names (utf-8)
+# Every array starts at a multiple of 8 bytes, so they can be used directly from a memory-mapped file.
+MAGIC = b"CSRG"
+VERSION = 1
+_HEADER = struct.Struct("<4sIqqqqq")
+
+# The euclidean distance for the given differences (computed exactly like mathutils.euclidean_distance)
+def _distance(dx: float, dy: float) -> float:
+    return math.sqrt(dx * dx + dy * dy)
+
+# CSRGraph holds the arrays of a graph in the CSR format.
+# The arrays can be "array" objects or memoryviews on a memory-mapped file (both support indexing, slicing and len).
+class CSRGraph:
+    def __init__(self, names: List[str], xs: Sequence[float], ys: Sequence[float],
+                 offsets: Sequence[int], targets: Sequence[int], weights: Sequence[float],
+                 reverse_offsets: Sequence[int], sources: Sequence[int], reverse_weights: Sequence[float],
+                 start: int, goal: int) -> None:
+        self.names = names
+        self.xs, self.ys = xs, ys
+        self.offsets, self.targets, self.weights = offsets, targets, weights
+        self.reverse_offsets, self.sources, self.reverse_weights = reverse_offsets, sources, reverse_weights
+        self.start, self.goal = start, goal
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    # Build the CSR graph of a graph routing problem
+    @staticmethod
+    def from_problem(problem: GraphRoutingProblem) -> 'CSRGraph':
+        nodes = sorted(set(problem.adjacency) | set(problem.reverse_adjacency), key=lambda node: node.name)
+        index = {node: i for i, node in enumerate(nodes)}
+        xs, ys = array('d', (node.position.x for node in nodes)), array('d', (node.position.y for node in nodes))
+
+        def build(adjacency) -> Tuple[array, array, array]:
+            offsets, neighbors, weights = array('q', [0]), array('q'), array('d')
+            for node in nodes:
+                for neighbor in sorted(index[neighbor] for neighbor in adjacency.get(node, [])):
+                    neighbors.append(neighbor)
+                    weights.append(_distance(node.position.x - xs[neighbor], node.position.y - ys[neighbor]))
+                offsets.append(len(neighbors))
+            return offsets, neighbors, weights
+
+        offsets, targets, weights = build(problem.adjacency)
+        reverse_offsets, sources, reverse_weights = build(problem.reverse_adjacency)
+        return CSRGraph([node.name for node in nodes], xs, ys, offsets, targets, weights,
+                        reverse_offsets, sources, reverse_weights, index[problem.start], index[problem.goal])
+
+    # Write the graph to a binary file
+    def save(self, path: str) -> None:
+        encoded = [name.encode("utf-8") for name in self.names]
+        name_offsets = array('q', [0])
+        for name in encoded:
+            name_offsets.append(name_offsets[-1] + len(name))
+        arrays = [
+            array('q', self.offsets), array('q', self.targets), array('d', self.weights),
+            array('q', self.reverse_offsets), array('q', self.sources), array('d', self.reverse_weights),
+            array('d', self.xs), array('d', self.ys), name_offsets,
+        ]
+        with open(path, "wb") as file:
+            file.write(_HEADER.pack(MAGIC, VERSION, len(self.names), len(self.targets), self.start, self.goal, name_offsets[-1]))
+            for values in arrays:
+                if sys.byteorder != "little": values.byteswap()
+                file.write(values.tobytes())
+            file.write(b"".join(encoded))
+
+    # Read a graph from a binary file.
+    # If use_mmap is True, the file is memory-mapped and the arrays are views on it, so loading is almost instant
+    # and the pages of the file are only read when they are used. Otherwise, the arrays are copied into memory.
+    @staticmethod
+    def load(path: str, use_mmap: bool = True) -> 'CSRGraph':
+        with open(path, "rb") as file:
+            if use_mmap:
+                buffer = memoryview(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))
+            else:
+                buffer = memoryview(file.read())
+        magic, version, n, m, start, goal, names_size = _HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a binary graph file (version {VERSION})")
+        position = _HEADER.size
+
+        def take(typecode: str, count: int) -> Sequence:
+            nonlocal position
+            view = buffer[position:position + 8 * count]
+            position += 8 * count
+            if sys.byteorder != "little":
+                values = array(typecode, view.tobytes())
+                values.byteswap()
+                return values
+            return view.cast(typecode)
+
+        offsets, targets, weights = take('q', n + 1), take('q', m), take('d', m)
+        reverse_offsets, sources, reverse_weights = take('q', n + 1), take('q', m), take('d', m)
+        xs, ys, name_offsets = take('d', n), take('d', n), take('q', n + 1)
+        names_bytes = bytes(buffer[position:position + names_size])
+        names = [names_bytes[name_offsets[i]:name_offsets[i + 1]].decode("utf-8") for i in range(n)]
+        return CSRGraph(names, xs, ys, offsets, targets, weights, reverse_offsets, sources, reverse_weights, start, goal)
+
+# Convert a graph routing problem from a json file to a binary file
+def convert(json_path: str, binary_path: str) -> CSRGraph:
+    graph = CSRGraph.from_problem(GraphRoutingProblem.from_file(json_path))
+    graph.save(binary_path)
+    return graph
+
+# This is the graph routing problem on a CSR graph.
+# The states and the actions are node indices and they have the same semantics as GraphRoutingProblem:
+# the actions are the neighboring nodes (sorted by name) and the cost is the euclidean distance.
+class CSRGraphRoutingProblem(Problem[int, int]):
+    def __init__(self, graph: CSRGraph, start: int = None, goal: int = None) -> None:
+        super().__init__()
+        self.graph = graph
+        self.start = graph.start if start is None else start
+        self.goal = graph.goal if goal is None else goal
+
+    def get_initial_state(self) -> int:
+        return self.start
+
+    def is_goal(self, state: int) -> bool:
+        return state == self.goal
+
+    def get_goal_state(self) -> int:
+        return self.goal
+
+    # We use @record_calls to track the arguments with which this function is called to retrieve the traversal order
+    @record_calls
+    def get_actions(self, state: int) -> Iterable[int]:
+        offsets = self.graph.offsets
+        return self.graph.targets[offsets[state]:offsets[state + 1]]
+
+    def get_successor(self, state: int, action: int) -> int:
+        return action
+
+    # The edge costs are precomputed, so the cost of an edge is found by a binary search in the sorted targets of the state
+    def get_cost(self, state: int, action: int) -> float:
+        graph = self.graph
+        return graph.weights[bisect_left(graph.targets, action, graph.offsets[state], graph.offsets[state + 1])]
+
+    # The edges of a node are contiguous in the arrays, so the successors are read without any search
+    @tracked_as("get_actions")
+    def get_successors(self, state: int) -> Iterable[Tuple[int, int, float]]:
+        graph = self.graph
+        begin, end = graph.offsets[state], graph.offsets[state + 1]
+        targets, weights = graph.targets, graph.weights
+        return [(targets[edge], targets[edge], weights[edge]) for edge in range(begin, end)]
+
+    @record_calls
+    def get_predecessors(self, state: int) -> Iterable[Tuple[int, int, float]]:
+        graph = self.graph
+        begin, end = graph.reverse_offsets[state], graph.reverse_offsets[state + 1]
+        return [(state, graph.sources[edge], graph.reverse_weights[edge]) for edge in range(begin, end)]
+
+    # Return the name of a node (for printing the solutions)
+    def name(self, state: int) -> str:
+        return self.graph.names[state]
+
+    # Read the problem from a binary file (see CSRGraph.load)
+    @staticmethod
+    def from_file(path: str, use_mmap: bool = True) -> 'CSRGraphRoutingProblem':
+        return CSRGraphRoutingProblem(CSRGraph.load(path, use_mmap))
+
+def csr_graphrouting_heuristic(problem: CSRGraphRoutingProblem, state: int) -> float:
+    graph = problem.graph
+    return _distance(graph.xs[state] - graph.xs[problem.goal], graph.ys[state] - graph.ys[problem.goal])
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert a graph routing problem from json to the binary CSR format")
+    parser.add_argument("json", help="path to the json graph")
+    parser.add_argument("binary", help="path to the binary file to write")
+    args = parser.parse_args()
+    graph = convert(args.json, args.binary)
+    print(f"Wrote {len(graph)} nodes and {len(graph.targets)} edges to {args.binary}")
@@ -4,16 +4,25 @@ from .utils import add_call_listener
 class InconsistentHeuristicException(Exception):
     pass
 
+def check_transition(heuristic, problem: Problem[S, A], state: S, action: A, next_state: S, c: float):
+    h = heuristic(problem, state)
+    next_h = heuristic(problem, next_state)
+    if h - next_h > c:
+        message = f"State (heuristic = {h}):" + "\n" + str(state) + "\n"
+        message += f"Action: {str(action)} (cost = {c})" + "\n"
+        message += f"Next State (heuristic = {next_h}):" + "\n" + str(next_state) + "\n"
+        message += "Decrease in heuristic exceeds the actions cost\n"
+        message += f"h(state) - h(next state) = {h} - {next_h} = {h - next_h} > {c} (action cost)"
+        raise InconsistentHeuristicException(message)
+
 def test_heuristic_consistency(heuristic):
     def listener(next_state: S, problem: Problem[S, A], state: S, action: A):
-        h = heuristic(problem, state)
-        next_h = heuristic(problem, next_state)
-        c = problem.get_cost(state, action)
-        if h - next_h > c:
-            message = f"State (heuristic = {h}):" + "\n" + str(state) + "\n"
-            message += f"Action: {str(action)} (cost = {c})" + "\n"
-            message += f"Next State (heuristic = {next_h}):" + "\n" + str(next_state) + "\n"
-            message += "Decrease in heuristic exceeds the actions cost\n"
-            message += f"h(state) - h(next state) = {h} - {next_h} = {h - next_h} > {c} (action cost)"
-            raise InconsistentHeuristicException(message)
+        check_transition(heuristic, problem, state, action, next_state, problem.get_cost(state, action))
+    return add_call_listener(listener)
+
+# The same check for the problems that expand the states using get_successors
+def test_heuristic_consistency_of_successors(heuristic):
+    def listener(successors, problem: Problem[S, A], state: S):
+        for action, next_state, c in successors:
+            check_transition(heuristic, problem, state, action, next_state, c)
     return add_call_listener(listener)
\ No newline at end of file
@@ -0,0 +1,136 @@
+from typing import Dict, Generic, Iterable, Optional, Tuple
+
+from problem import Problem, S, A, Solution
+from frontier import IndexedHeap
+from bidirectional import ReverseHeuristicFunction, zero_reverse_heuristic
+from search_stats import SearchStats, timed_phase
+from helpers.utils import untracked_successors
+
+# This file implements D* Lite, an incremental search which keeps its results between searches and only repairs
+# the part that changed when the start state moves (e.g. the agent took a step) or when some edges change.
+# It searches backward from the goal state: g(s) is the cost of the best path found from s to the goal, and rhs(s) is
+# the one-step lookahead min over the successors s' of (cost(s, s') + g(s')), so a state is consistent if g(s) == rhs(s).
+# The inconsistent states are kept in a priority queue sorted by the key (min(g, rhs) + h(start, s) + km, min(g, rhs)),
+# where h is a reverse heuristic (see bidirectional.py) that estimates the cost from the start to s. When the start moves,
+# km grows by h(old start, new start) instead of changing the keys of all the queued states (which stay lower bounds).
+# The search stops when the start is consistent and no queued key is lower than its key. When some edges change,
+# only the rhs of their source states is recomputed and the changes are propagated from there by the next search.
+# The optimal action from the start is then the one that minimizes cost(start, s') + g(s').
+# The problem must implement "get_goal_state" and "get_predecessors", and the reverse heuristic must be consistent.
+# The rhs are recomputed from the successors of a state many times (and not only when it is expanded), so the successors
+# are read without being counted as calls to get_actions (see helpers.utils.untracked_successors).
+
+INFINITY = float('inf')
+
+Key = Tuple[float, float]
+
+class DStarLite(Generic[S, A]):
+    def __init__(self, problem: Problem[S, A], start: S, reverse_heuristic: ReverseHeuristicFunction = zero_reverse_heuristic,
+                 stats: SearchStats = None) -> None:
+        self.problem = problem
+        self.successors = untracked_successors(problem)
+        self.start = start
+        self.goal = problem.get_goal_state()
+        self.reverse_heuristic = reverse_heuristic if stats is None else stats.count_heuristic(reverse_heuristic)
+        self.stats = stats
+        self.g: Dict[S, float] = {}
+        self.rhs: Dict[S, float] = {}
+        self.km = 0.0
+        self.queue: IndexedHeap[S] = IndexedHeap()
+        if self.goal is not None:
+            self.rhs[self.goal] = 0
+            self.queue.push(self.goal, self.key(self.goal))
+
+    def key(self, state: S) -> Key:
+        value = min(self.g.get(state, INFINITY), self.rhs.get(state, INFINITY))
+        return (value + self.reverse_heuristic(self.problem, self.start, state) + self.km, value)
+
+    # Recompute the rhs of a state from its successors and queue it if it is inconsistent
+    def update_state(self, state: S) -> None:
+        if state != self.goal:
+            g = self.g
+            self.rhs[state] = min((cost + g.get(next_state, INFINITY) for _, next_state, cost in self.successors(state)
+                                   if next_state is not None), default=INFINITY)
+        self._queue_state(state)
+
+    # Queue the state if it is inconsistent (with its current key), otherwise remove it from the queue
+    def _queue_state(self, state: S) -> None:
+        if self.g.get(state, INFINITY) != self.rhs.get(state, INFINITY):
+            self.queue.push(state, self.key(state))
+        elif state in self.queue:
+            self.queue.remove(state)
+
+    # Process the queued states until the costs of the start and of the states that its best path goes through are final.
+    # When the cost of a state changes, the rhs of its predecessors is only recomputed from all their successors if
+    # it may have increased (their best successor was this state), otherwise the new cost is enough to update it.
+    def compute_shortest_path(self) -> None:
+        stats, queue, g, rhs, start, goal = self.stats, self.queue, self.g, self.rhs, self.start, self.goal
+        if stats is not None: stats.searches += 1
+        with timed_phase(stats, "search"):
+            while queue and (queue.peek()[1] < self.key(start) or rhs.get(start, INFINITY) != g.get(start, INFINITY)):
+                state, old_key = queue.peek()
+                new_key = self.key(state)
+                if old_key < new_key:
+                    # The key was computed before the start moved (or the costs changed), so it is queued again
+                    queue.push(state, new_key)
+                    continue
+                queue.pop()
+                predecessors = self.problem.get_predecessors(state)
+                if stats is not None: stats.expand(len(predecessors), len(queue), len(g))
+                old_cost = g.get(state, INFINITY)
+                if old_cost > rhs[state]:
+                    # The state was overconsistent: its cost decreased, which can only lower the rhs of its predecessors
+                    cost = g[state] = rhs[state]
+                    for _, previous, action_cost in predecessors:
+                        if previous != goal and action_cost + cost < rhs.get(previous, INFINITY):
+                            rhs[previous] = action_cost + cost
+                            self._queue_state(previous)
+                else:
+                    # The state was underconsistent: its cost increased, so it is computed again
+                    # as well as the rhs of the predecessors whose best successor was this state
+                    g[state] = INFINITY
+                    self.update_state(state)
+                    for _, previous, action_cost in predecessors:
+                        if previous != goal and rhs.get(previous, INFINITY) == action_cost + old_cost:
+                            self.update_state(previous)
+
+    # Move the start to the given state (e.g. after the agent took a step)
+    def move_to(self, state: S) -> None:
+        if state == self.start: return
+        self.km += self.reverse_heuristic(self.problem, self.start, state)
+        self.start = state
+
+    # Repair the search after the outgoing edges of the given states changed (they were added, removed or their costs
+    # changed). The problem must already return the new edges from get_successors and get_predecessors.
+    def update_edges(self, states: Iterable[S]) -> None:
+        for state in states:
+            self.update_state(state)
+
+    # Return the successor of the state (and the action that leads to it) which minimizes cost(state, s') + g(s')
+    def best_successor(self, state: S) -> Tuple[Optional[A], Optional[S]]:
+        best_action, best_state, best_cost = None, None, INFINITY
+        for action, next_state, cost in self.successors(state):
+            if next_state is None: continue
+            total = cost + self.g.get(next_state, INFINITY)
+            if total < best_cost:
+                best_action, best_state, best_cost = action, next_state, total
+        return best_action, best_state
+
+    # Return the best action from the start (None if the goal cannot be reached or the start is the goal)
+    # The search must be up to date (see compute_shortest_path).
+    def next_action(self) -> Optional[A]:
+        if self.start == self.goal or self.g.get(self.start, INFINITY) == INFINITY:
+            return None
+        return self.best_successor(self.start)[0]
+
+    # Return the best path from the start to the goal (None if the goal cannot be reached)
+    # The search must be up to date (see compute_shortest_path).
+    def path(self) -> Solution:
+        if self.start != self.goal and self.g.get(self.start, INFINITY) == INFINITY:
+            return None
+        path, state = [], self.start
+        while state != self.goal:
+            action, state = self.best_successor(state)
+            if state is None: return None
+            path.append(action)
+        return path
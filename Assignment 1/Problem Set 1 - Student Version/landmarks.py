@@ -0,0 +1,110 @@
+from typing import Dict, List, Tuple
+import heapq
+
+from graph import GraphRoutingProblem, GraphNode, graphrouting_heuristic
+from mathutils import euclidean_distance
+
+# This file implements the ALT (A*, Landmarks and Triangle inequality) heuristic for the graph routing problem.
+# A few nodes are picked as landmarks and the shortest path distances from and to every landmark are precomputed.
+# Then, for any landmark L, the triangle inequality gives two lower bounds on the distance d(n, goal):
+#   d(n, goal) >= d(L, goal) - d(L, n)    (since d(L, goal) <= d(L, n) + d(n, goal))
+#   d(n, goal) >= d(n, L) - d(goal, L)    (since d(n, L) <= d(n, goal) + d(goal, L))
+# These bounds follow the actual edges of the graph, so they are much tighter than the straight line distance
+# on graphs whose edges do not follow straight lines.
+
+# The number of landmarks used by "landmark_heuristic"
+DEFAULT_LANDMARK_COUNT = 8
+
+# Compute the shortest path distance from the source to every node that it can reach using Dijkstra's algorithm.
+# If backward is True, the edges are followed in reverse so the distance from every node to the source is computed instead.
+# NOTE: This reads the adjacency directly instead of calling "problem.get_actions", so it does not affect the recorded calls.
+def shortest_distances(problem: GraphRoutingProblem, source: GraphNode, backward: bool = False) -> Dict[GraphNode, float]:
+    adjacency = problem.reverse_adjacency if backward else problem.adjacency
+    distances = {source: 0}
+    queue = [(0, source.name, source)]
+    while queue:
+        distance, _, node = heapq.heappop(queue)
+        if distance > distances[node]: continue
+        for next_node in adjacency.get(node, []):
+            next_distance = distance + euclidean_distance(node.position, next_node.position)
+            if next_distance < distances.get(next_node, float('inf')):
+                distances[next_node] = next_distance
+                heapq.heappush(queue, (next_distance, next_node.name, next_node))
+    return distances
+
+# LandmarkTable stores the shortest path distances from and to each landmark for every node of a graph
+class LandmarkTable:
+    def __init__(self, landmarks: List[GraphNode], from_landmarks: Dict[GraphNode, Tuple[float, ...]], to_landmarks: Dict[GraphNode, Tuple[float, ...]]) -> None:
+        self.landmarks = landmarks
+        self.from_landmarks = from_landmarks # from_landmarks[n][i] is the distance from the i-th landmark to n
+        self.to_landmarks = to_landmarks     # to_landmarks[n][i] is the distance from n to the i-th landmark
+
+    # Compute the table for the given number of landmarks.
+    # The landmarks are picked greedily (farthest landmark selection): each new landmark is the node that is the farthest
+    # from the landmarks picked so far (in terms of the round trip distance). A node that cannot reach or be reached
+    # from the landmarks counts as infinitely far, so every part of the graph gets a landmark if possible.
+    # The first landmark is the node that is the farthest from the first node (by name) in the same way.
+    @staticmethod
+    def compute(problem: GraphRoutingProblem, count: int) -> 'LandmarkTable':
+        infinity = float('inf')
+        nodes = sorted(problem.adjacency, key=lambda node: node.name)
+        count = min(count, len(nodes))
+        landmarks: List[GraphNode] = []
+        forward: List[Dict[GraphNode, float]] = []
+        backward: List[Dict[GraphNode, float]] = []
+        # The round trip distance from each node to the closest landmark
+        closest = {node: infinity for node in nodes}
+        if nodes:
+            seed_forward, seed_backward = shortest_distances(problem, nodes[0]), shortest_distances(problem, nodes[0], True)
+            closest = {node: seed_forward.get(node, infinity) + seed_backward.get(node, infinity) for node in nodes}
+        while len(landmarks) < count:
+            # max keeps the first node (by name) on ties, so the selection is deterministic
+            landmark = max(nodes, key=lambda node: closest[node])
+            if landmark in landmarks: break # Every node is already a landmark
+            landmarks.append(landmark)
+            forward.append(shortest_distances(problem, landmark))
+            backward.append(shortest_distances(problem, landmark, True))
+            round_trip = {node: forward[-1].get(node, infinity) + backward[-1].get(node, infinity) for node in nodes}
+            # The first node is not a landmark, so its distances are replaced by the ones of the first landmark
+            closest = round_trip if len(landmarks) == 1 else {node: min(closest[node], round_trip[node]) for node in nodes}
+            for picked in landmarks:
+                closest[picked] = -1 # Never pick the same landmark twice
+        from_landmarks = {node: tuple(distances.get(node, infinity) for distances in forward) for node in nodes}
+        to_landmarks = {node: tuple(distances.get(node, infinity) for distances in backward) for node in nodes}
+        return LandmarkTable(landmarks, from_landmarks, to_landmarks)
+
+    # Return a lower bound on the shortest path distance from the node to the goal
+    def lower_bound(self, node: GraphNode, goal: GraphNode) -> float:
+        infinity = float('inf')
+        bound = 0
+        from_node, to_node = self.from_landmarks.get(node), self.to_landmarks.get(node)
+        from_goal, to_goal = self.from_landmarks.get(goal), self.to_landmarks.get(goal)
+        if from_node is None or from_goal is None: return 0
+        for landmark_to_node, landmark_to_goal, node_to_landmark, goal_to_landmark in zip(from_node, from_goal, to_node, to_goal):
+            # d(L, goal) - d(L, n): if L cannot reach n, this landmark tells nothing.
+            # Otherwise, if L cannot reach the goal, then n cannot reach the goal either.
+            if landmark_to_node != infinity:
+                bound = max(bound, landmark_to_goal - landmark_to_node)
+            # d(n, L) - d(goal, L): if the goal cannot reach L, this landmark tells nothing.
+            # Otherwise, if n cannot reach L, then n cannot reach the goal either.
+            if goal_to_landmark != infinity:
+                bound = max(bound, node_to_landmark - goal_to_landmark)
+        return bound
+
+# Return the landmark table of the problem's graph (and compute it if it was not computed before).
+# The table is stored in the graph cache, so running many queries on the same graph file only pays the preprocessing cost once.
+def landmark_table(problem: GraphRoutingProblem, count: int = DEFAULT_LANDMARK_COUNT) -> LandmarkTable:
+    cache = problem.graph_cache()
+    table = cache.get(("landmarks", count))
+    if table is None:
+        table = cache[("landmarks", count)] = LandmarkTable.compute(problem, count)
+    return table
+
+# The ALT heuristic. It can be used anywhere a graph routing heuristic is expected (e.g. with AStarSearch).
+# It returns the best triangle inequality bound over all the landmarks, and it is never lower than the euclidean heuristic.
+def landmark_heuristic(problem: GraphRoutingProblem, state: GraphNode) -> float:
+    cache = problem.cache()
+    table = cache.get("landmark_table")
+    if table is None:
+        table = cache["landmark_table"] = landmark_table(problem)
+    return max(table.lower_bound(state, problem.goal), graphrouting_heuristic(problem, state))
@@ -32,6 +32,11 @@ class Point:
     def __iter__(self) -> Iterator[int]:
         return iter((self.x, self.y))
 
+    # A frozen dataclass with __slots__ cannot be unpickled field by field, so it is rebuilt from its coordinates
+    # (e.g. when the graph nodes are sent to the workers of a parallel search)
+    def __reduce__(self):
+        return (Point, (self.x, self.y))
+
 # This is a helper function to compute the manhattan distance between 2 points
 def manhattan_distance(p1: Point, p2: Point) -> int:
     return abs(p1.x - p2.x) + abs(p1.y - p2.y)
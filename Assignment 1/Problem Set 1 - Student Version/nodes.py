@@ -0,0 +1,48 @@
+from array import array
+from typing import Generic, List
+
+from problem import A
+
+# The index of the parent of the root node
+NO_PARENT = -1
+
+# NodeStore is an arena which holds every node generated during a search.
+# Instead of storing the whole path with each frontier entry, a node only stores the index of its parent,
+# the action that led to it and its path cost (g). Nodes are referred to by their integer index,
+# so pushing a node into the frontier costs O(1) and the path is only rebuilt once when the goal is reached.
+# The parents and the costs are stored in typed arrays, so each node costs a few bytes plus a reference to its action.
+class NodeStore(Generic[A]):
+    __slots__ = ("parents", "actions", "costs")
+
+    def __init__(self) -> None:
+        self.parents = array('q')
+        self.actions: List[A] = []
+        self.costs = array('d')
+
+    def __len__(self) -> int:
+        return len(self.actions)
+
+    # Add the root node (which has no parent and no action) and return its index
+    def add_root(self, cost: float = 0) -> int:
+        return self.add(NO_PARENT, None, cost)
+
+    # Add a node which was reached from the node 'parent' via 'action' and return its index
+    def add(self, parent: int, action: A, cost: float = 0) -> int:
+        self.parents.append(parent)
+        self.actions.append(action)
+        self.costs.append(cost)
+        return len(self.actions) - 1
+
+    # Return the path cost (g) of the given node
+    def cost(self, node: int) -> float:
+        return self.costs[node]
+
+    # Follow the parent indices from the given node back to the root and return the actions in order
+    def path(self, node: int) -> List[A]:
+        parents, actions = self.parents, self.actions
+        path = []
+        while parents[node] != NO_PARENT:
+            path.append(actions[node])
+            node = parents[node]
+        path.reverse()
+        return path
@@ -0,0 +1,237 @@
+from typing import Dict, List, Optional, Tuple
+import heapq, multiprocessing, pickle, queue, time, zlib
+
+from problem import HeuristicFunction, Problem, S, A, Solution
+from search_stats import SearchStats, instrumented
+
+# This file implements a hash-distributed parallel A* (HDA*).
+# Each worker process owns the states whose hash falls in its partition (see _owner): it is the only one that
+# stores their g(n), keeps them in its open list and expands them. When a worker generates a state that belongs to
+# another worker, the state is buffered and sent with others in a batch to the inbox (a multiprocessing queue) of its owner.
+# The states are sent in the compact form given by problem.pack_state (see problem.py).
+# The workers are started with the "spawn" method on every platform, so the problem and the heuristic are pickled and
+# sent to them when they start. The owner of a state is computed from the bytes of its packed form rather than with
+# hash(), which is seeded differently in every spawned process, so all the processes agree on the owner of every state.
+#
+# Optimality: a goal state is never expanded; its cost is sent to the coordinator (the calling process) which broadcasts
+# the best cost so far (the incumbent). The workers only expand the states whose f(n) is lower than the incumbent, and a
+# state that is reached again with a lower g(n) is opened again, so with an admissible heuristic the search can only
+# stop once no path cheaper than the incumbent is left, and the incumbent is then optimal.
+# Termination: the coordinator repeatedly asks every worker whether it is idle (no open state with f(n) lower than the
+# incumbent and no buffered states) and how many states it sent and received. The search is over when two consecutive
+# rounds find every worker idle with the same counters and as many states received as sent (so none is in transit).
+# The path is then rebuilt by asking the owner of each state on it for its parent, from the goal back to the initial state.
+
+# The number of states buffered for a worker before they are sent as a batch
+BATCH_SIZE = 64
+# The number of states that a worker expands between two reads of its inbox
+EXPANSIONS_PER_ROUND = 32
+# The time that the coordinator waits between two termination checks when some workers are still busy (in seconds)
+PROBE_INTERVAL = 0.002
+# The time that the coordinator waits for a message before checking that the workers are still alive (in seconds)
+WORKER_TIMEOUT = 1.0
+
+# The loop of a worker process (see the top of the file). The messages received in the inbox are:
+#   ("states", [(packed state, g(n), packed parent, action), ...]): a batch of generated states owned by this worker
+#   ("incumbent", cost): the cost of the best solution found so far
+#   ("probe", epoch): a termination check, answered by ("status", epoch, worker, idle, sent, received)
+#   ("parent", packed state): answered by ("parent", packed parent, action) for a state owned by this worker
+#   ("stop",): answered by ("done", worker, stats) then the worker exits
+# The worker sends ("solution", cost, packed goal state) to the coordinator when it finds a cheaper goal state.
+# Return the index of the worker that owns the state given in its packed form (see problem.pack_state).
+# The packed states are pickled so that equal states have equal bytes in every process.
+def _owner(packed: object, workers: int) -> int:
+    return zlib.crc32(pickle.dumps(packed, pickle.HIGHEST_PROTOCOL)) % workers
+
+def _worker(index: int, problem: Problem[S, A], heuristic: HeuristicFunction, inboxes: List, results, track: bool) -> None:
+    workers = len(inboxes)
+    inbox = inboxes[index]
+    stats = SearchStats()
+    if track: heuristic = stats.count_heuristic(heuristic)
+    frontier: List[Tuple[float, int, float, S]] = [] # (f(n), counter, g(n), state)
+    records: Dict[S, Tuple[float, object, A]] = {} # The (g(n), packed parent, action) of every state owned by this worker
+    outgoing: List[List] = [[] for _ in range(workers)] # The states buffered for each worker
+    incumbent = float('inf')
+    counter = sent = received = 0
+
+    def send(owner: int) -> None:
+        nonlocal sent
+        inboxes[owner].put(("states", outgoing[owner]))
+        sent += len(outgoing[owner])
+        outgoing[owner] = []
+
+    # Add a generated state owned by this worker (unless it was already reached with a path that is not more expensive)
+    def insert(state: S, g_cost: float, parent: object, action: A) -> None:
+        nonlocal incumbent, counter
+        record = records.get(state)
+        if record is not None and record[0] <= g_cost:
+            stats.duplicates += 1
+            return
+        records[state] = (g_cost, parent, action)
+        if problem.is_goal(state):
+            if g_cost < incumbent:
+                incumbent = g_cost
+                results.put(("solution", g_cost, problem.pack_state(state)))
+            return
+        f_cost = g_cost + heuristic(problem, state)
+        if f_cost < incumbent:
+            counter += 1
+            heapq.heappush(frontier, (f_cost, counter, g_cost, state))
+
+    while True:
+        # Read all the pending messages, and wait for one if there is nothing to expand
+        busy = bool(frontier) and frontier[0][0] < incumbent
+        try:
+            message = inbox.get_nowait() if busy else inbox.get()
+        except queue.Empty:
+            message = None
+        while message is not None:
+            kind = message[0]
+            if kind == "states":
+                received += len(message[1])
+                for packed, g_cost, parent, action in message[1]:
+                    insert(problem.unpack_state(packed), g_cost, parent, action)
+            elif kind == "incumbent":
+                incumbent = min(incumbent, message[1])
+            elif kind == "probe":
+                idle = not (frontier and frontier[0][0] < incumbent) and not any(outgoing)
+                results.put(("status", message[1], index, idle, sent, received))
+            elif kind == "parent":
+                _, parent, action = records[problem.unpack_state(message[1])]
+                results.put(("parent", parent, action))
+            else:
+                stats.peak_closed = len(records)
+                results.put(("done", index, stats))
+                return
+            try:
+                message = inbox.get_nowait()
+            except queue.Empty:
+                message = None
+
+        # Expand a few states then send the batches, so the other workers are never kept waiting for long
+        for _ in range(EXPANSIONS_PER_ROUND):
+            if not frontier or frontier[0][0] >= incumbent: break
+            _, _, g_cost, state = heapq.heappop(frontier)
+            if records[state][0] < g_cost:
+                stats.duplicates += 1
+                continue # A cheaper path to this state was found after it was pushed
+            successors = problem.get_successors(state)
+            if track: stats.expand(len(successors), len(frontier), len(records))
+            packed = problem.pack_state(state)
+            for action, next_state, action_cost in successors:
+                next_g_cost = g_cost + action_cost
+                if next_g_cost >= incumbent: continue # It cannot lead to a cheaper solution
+                next_packed = problem.pack_state(next_state)
+                owner = _owner(next_packed, workers)
+                if owner == index:
+                    insert(next_state, next_g_cost, packed, action)
+                else:
+                    outgoing[owner].append((next_packed, next_g_cost, packed, action))
+                    if len(outgoing[owner]) >= BATCH_SIZE: send(owner)
+        for owner in range(workers):
+            if outgoing[owner]: send(owner)
+
+@instrumented
+def HDAStarSearch(problem: Problem[S, A], initial_state: S, heuristic: HeuristicFunction, workers: int = 4,
+                  stats: SearchStats = None) -> Solution:
+    """
+    Perform a hash-distributed parallel A* search (HDA*) to find the optimal path from the initial state to a goal state.
+
+    Args:
+        problem (Problem[S, A]): The problem to be solved, containing state transitions, goal tests, and costs.
+                                 Its states are sent to other processes using "pack_state" and "unpack_state".
+        initial_state (S): The initial state from which to start the search.
+        heuristic (HeuristicFunction): An admissible heuristic function that estimates the cost from a state to the goal.
+                                       It is pickled and sent to the workers with the problem.
+        workers (int): The number of worker processes.
+        stats (SearchStats): If given, it is filled with the statistics of all the workers (see search_stats.py).
+
+    Returns:
+        Solution: A list of actions that define the optimal path from the initial state to a goal state.
+                  Returns None if no solution is found.
+
+    The state space is split between the workers by the hash of the states, and each worker runs A* on its own part:
+    it expands its open state with the lowest f(n) and sends every generated state to the worker that owns it.
+    The calling process coordinates the search: it keeps the cost of the best solution found so far, detects when all
+    the workers are idle and no state is in transit (see the top of the file), then rebuilds the path.
+    The workers are spawned processes, so the problem and the heuristic must be picklable (e.g. a module-level function).
+    With a single worker, the search is the same as AStarSearch (with some overhead), and the expansion order of
+    several workers is not deterministic, so the expanded nodes are not tracked like the other search functions.
+    """
+    if problem.is_goal(initial_state):
+        return []
+    # The heuristic calls are counted by each worker (see _worker), so the counting wrapper of @instrumented
+    # (which cannot be pickled) is removed and the original heuristic is sent to the workers
+    if stats is not None: heuristic = heuristic.__wrapped__
+    context = multiprocessing.get_context("spawn")
+    inboxes = [context.Queue() for _ in range(workers)]
+    results = context.Queue()
+    processes = [context.Process(target=_worker, args=(index, problem, heuristic, inboxes, results, stats is not None), daemon=True)
+                 for index in range(workers)]
+    for process in processes:
+        process.start()
+
+    # Wait for the next message from the workers (and fail if a worker died instead of waiting forever)
+    def receive() -> Tuple:
+        while True:
+            try:
+                return results.get(timeout=WORKER_TIMEOUT)
+            except queue.Empty:
+                if not all(process.is_alive() for process in processes):
+                    raise RuntimeError("A worker of the parallel search exited unexpectedly")
+
+    try:
+        packed = problem.pack_state(initial_state)
+        inboxes[_owner(packed, workers)].put(("states", [(packed, 0, None, None)]))
+        sent = 1 # The initial state is sent by the coordinator
+        incumbent, goal = float('inf'), None
+        previous: Optional[Tuple[int, int]] = None # The counters of the last round where every worker was idle
+        epoch = 0
+        while True:
+            epoch += 1
+            for inbox in inboxes:
+                inbox.put(("probe", epoch))
+            replies, idle, total_sent, total_received = 0, True, sent, 0
+            while replies < workers:
+                message = receive()
+                if message[0] == "solution":
+                    if message[1] < incumbent:
+                        incumbent, goal = message[1], message[2]
+                        for inbox in inboxes:
+                            inbox.put(("incumbent", incumbent))
+                elif message[0] == "status" and message[1] == epoch:
+                    replies += 1
+                    idle = idle and message[3]
+                    total_sent += message[4]
+                    total_received += message[5]
+            counters = (total_sent, total_received)
+            if idle and total_sent == total_received:
+                if counters == previous: break
+                previous = counters
+            else:
+                previous = None
+                time.sleep(PROBE_INTERVAL)
+
+        # Rebuild the path from the goal back to the initial state
+        path = None
+        if goal is not None:
+            path, packed = [], goal
+            while True:
+                inboxes[_owner(packed, workers)].put(("parent", packed))
+                _, parent, action = receive()
+                if parent is None: break
+                path.append(action)
+                packed = parent
+            path.reverse()
+
+        # Stop the workers and collect their statistics
+        for inbox in inboxes:
+            inbox.put(("stop",))
+        for _ in range(workers):
+            _, _, worker_stats = receive()
+            if stats is not None: stats.merge(worker_stats)
+    finally:
+        for process in processes:
+            process.join(timeout=WORKER_TIMEOUT)
+            if process.is_alive(): process.terminate()
+    return path
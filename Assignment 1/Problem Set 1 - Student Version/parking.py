@@ -1,22 +1,84 @@
-from typing import Any, Dict, Set, Tuple, List
+from typing import Dict, Set, Tuple, List
+from collections import deque
+from array import array
+from dataclasses import dataclass
 from problem import Problem
 from mathutils import Direction, Point
 from helpers.utils import NotImplemented
 
-#TODO: (Optional) Instead of Any, you can define a type for the parking state
-ParkingState = Any
+# The parking lot is encoded as cell indices. The grid is padded with a border of walls,
+# so the index of the point (x, y) is (y + 1) * stride + (x + 1) where stride = width + 2,
+# and moving in any direction from a passage never wraps around to another row.
+# A set of cells is stored as a Python int bitmask where bit i is set if the cell i is in the set.
+
+# The parking state contains the cell of every car (cars[i] is the cell of car 'i')
+# and the bitmask of the occupied cells, so checking if a cell is free is O(1) instead of searching the tuple.
+# The occupancy only depends on the cars, so the == operator and the hash function only use the cars.
+@dataclass(eq=False, frozen=True)
+class ParkingState:
+    __slots__ = ("cars", "occupied")
+    cars: Tuple[int, ...]
+    occupied: int
+
+    # Create a state from the car cells
+    @staticmethod
+    def from_cells(cars: Tuple[int, ...]) -> 'ParkingState':
+        occupied = 0
+        for cell in cars:
+            occupied |= 1 << cell
+        return ParkingState(tuple(cars), occupied)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, ParkingState): return NotImplemented
+        return self.cars == other.cars
+
+    def __hash__(self) -> int:
+        return hash(self.cars)
+
+    # The state can be used like the tuple of the car cells
+    def __getitem__(self, index: int) -> int:
+        return self.cars[index]
+
+    def __len__(self) -> int:
+        return len(self.cars)
+
+    def __iter__(self):
+        return iter(self.cars)
 
 # An action of the parking problem is a tuple containing an index 'i' and a direction 'd' where car 'i' should move in the direction 'd'.
 ParkingAction = Tuple[int, Direction]
 
+# The characters of the cars ('A' is car 0, 'B' is car 1, ...). The rank of car 'i' is 26 - i, so there are at most 26 cars.
+CAR_TILES = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+# The characters of the parking slots. The slot of car 'i' is either the digit 'i' (for the first 10 cars)
+# or the lower case letter of the car (e.g. 'a' is the slot of 'A' and 'k' is the slot of 'K').
+SLOT_TILES = {**{str(index): index for index in range(10)}, **{tile.lower(): index for index, tile in enumerate(CAR_TILES)}}
+
 # This is the implementation of the parking problem
 class ParkingProblem(Problem[ParkingState, ParkingAction]):
     passages: Set[Point]    # A set of points which indicate where a car can be (in other words, every position except walls).
-    cars: Tuple[Point]      # A tuple of points where state[i] is the position of car 'i'. 
+    cars: Tuple[Point]      # A tuple of points where cars[i] is the initial position of car 'i'.
     slots: Dict[Point, int] # A dictionary which indicate the index of the parking slot (if it is 'i' then it is the lot of car 'i') for every position.
                             # if a position does not contain a parking slot, it will not be in this dictionary.
     width: int              # The width of the parking lot.
     height: int             # The height of the parking lot.
+    stride: int             # The number of cells in a row of the padded grid.
+    offsets: Tuple[int, ...] # The cell index offset of every direction (in the order of Direction).
+    neighbors: List[Tuple[Tuple[Direction, int], ...]] # neighbors[c] is the (direction, next cell) of every passage next to the cell c (in the order of Direction).
+    slot_owners: List[int]  # slot_owners[c] is the index of the car that owns the slot on the cell c (or -1 if it is not a slot).
+    goal: Tuple[int, ...]   # The cell of the slot of every car (or -1 if the car has no slot).
+    moves: List[Tuple[ParkingAction, ...]] # moves[i][d] is the action (i, d), so the actions are never allocated during the search.
+    slot_distances: List[List[int]] # slot_distances[i][c] is the number of moves from the cell c to the slot of car 'i' (ignoring the other cars)
+                                    # or -1 if the slot cannot be reached. It is computed once when the problem is read (see compute_slot_distances).
+    integer_costs = True    # Every action costs the rank of the car (plus 100 if it enters another car's slot).
+
+    # Convert a point to a cell index and vice versa
+    def cell(self, point: Point) -> int:
+        return (point.y + 1) * self.stride + point.x + 1
+
+    def point(self, cell: int) -> Point:
+        y, x = divmod(cell, self.stride)
+        return Point(x - 1, y - 1)
 
     # This function should return the initial state
     def get_initial_state(self) -> ParkingState:
@@ -26,9 +88,9 @@ class ParkingProblem(Problem[ParkingState, ParkingAction]):
 
         Returns:
             ParkingState: The initial state where each car is in its initial position.
-        """        
-        return self.cars # the initial state of the parking problem
-    
+        """
+        return ParkingState.from_cells(tuple(self.cell(car) for car in self.cars)) # the initial state of the parking problem
+
     # This function should return True if the given state is a goal. Otherwise, it should return False.
     def is_goal(self, state: ParkingState) -> bool:
         #TODO: ADD YOUR CODE HERE
@@ -41,15 +103,9 @@ class ParkingProblem(Problem[ParkingState, ParkingAction]):
         Returns:
             bool: True if the state is a goal, False otherwise.
         """
-        # Loop for car's position in the given state.
-        for car_index, car_position in enumerate(state):
-            # get the parking slot indicated in the slots dictionary.
-            parking_slot = self.slots.get(car_position)
-            # checks if the position of the car in the state matches the parking slot
-            if parking_slot != car_index:
-                return False # return false if it's not the goal
-        return True # return true if it's the goal
-    
+        # Every car must be on the cell of its own slot
+        return state.cars == self.goal
+
     # This function returns a list of all the possible actions that can be applied to the given state
     def get_actions(self, state: ParkingState) -> List[ParkingAction]:
         #TODO: ADD YOUR CODE HERE
@@ -63,18 +119,16 @@ class ParkingProblem(Problem[ParkingState, ParkingAction]):
             List[ParkingAction]: A list of valid parking actions.
         """
         actions = []
-        # Loop for car's position in the given state.
-        for car_index, car_position in enumerate(state):
-            # Loop for each direction
-            for direction in Direction:
-                # Calculate the new position with the direction
-                new_position = car_position + Direction._Vectors[direction]
-
-                # Check if new position is a place that car can be, and new_position != state[car_index], and new_position not in state
-                if new_position in self.passages and new_position != state[car_index] and new_position not in state:
-                    actions.append((car_index, direction)) # Add action to the actions
+        occupied, neighbors, moves = state.occupied, self.neighbors, self.moves
+        # Loop for car's cell in the given state.
+        for car_index, car_cell in enumerate(state.cars):
+            car_moves = moves[car_index]
+            # Loop for each passage next to the car, and check that no car is there
+            for direction, new_cell in neighbors[car_cell]:
+                if not occupied >> new_cell & 1:
+                    actions.append(car_moves[direction]) # Add action to the actions
         return actions # Return all actions
-    
+
     # This function returns a new state which is the result of applying the given action to the given state
     def get_successor(self, state: ParkingState, action: ParkingAction) -> ParkingState:
         #TODO: ADD YOUR CODE HERE
@@ -91,20 +145,94 @@ class ParkingProblem(Problem[ParkingState, ParkingAction]):
 
         # Get car index and direction from the action
         car_index, direction = action
-        # Get car position from the state
-        car_position = state[car_index]
-
-        # Calcuate the new state after the moving
-        new_position = car_position + Direction._Vectors[direction]
-
-        # Create a copy of the current state
-        new_state = list(state)
-        # update the new state's position for the car with the new_position.
-        new_state[car_index] = new_position
-        # The reason for converting it to a tuple is to maintain immutability, 
-        # which is important for ensuring that states are not accidentally modified after creation.
-        return tuple(new_state)
-    
+        # Get car cell from the state
+        cars = state.cars
+        car_cell = cars[car_index]
+
+        # Calcuate the new cell after the moving
+        new_cell = car_cell + self.offsets[direction]
+
+        # The state is immutable, so a new tuple is created with the new cell of the car and the occupancy is updated
+        return ParkingState(cars[:car_index] + (new_cell,) + cars[car_index + 1:], state.occupied ^ (1 << car_cell) ^ (1 << new_cell))
+
+    # This function returns (action, next state, cost) for every possible action from the given state
+    def get_successors(self, state: ParkingState) -> List[Tuple[ParkingAction, ParkingState, float]]:
+        """
+        Get all the possible actions from the given state with their next states and costs, in one pass.
+
+        Args:
+            state (ParkingState): The current state.
+
+        Returns:
+            List[Tuple[ParkingAction, ParkingState, float]]: The (action, next state, cost) of every valid action,
+                in the same order as get_actions.
+        """
+        successors = []
+        cars, occupied = state.cars, state.occupied
+        neighbors, moves, slot_owners = self.neighbors, self.moves, self.slot_owners
+        # Loop for car's cell in the given state.
+        for car_index, car_cell in enumerate(cars):
+            car_rank = 26 - car_index
+            in_slot = slot_owners[car_cell] != -1
+            car_moves = moves[car_index]
+            before, after = cars[:car_index], cars[car_index + 1:]
+            # Loop for each passage next to the car that is not occupied by another car
+            for direction, new_cell in neighbors[car_cell]:
+                if occupied >> new_cell & 1:
+                    continue
+                # Same cost as get_cost: the penalty applies if the car leaves a non-slot position to enter another car's slot
+                cost = car_rank
+                if not in_slot:
+                    owner_index = slot_owners[new_cell]
+                    if owner_index != -1 and owner_index != car_index:
+                        cost += 100
+                new_state = ParkingState(before + (new_cell,) + after, occupied ^ (1 << car_cell) ^ (1 << new_cell))
+                successors.append((car_moves[direction], new_state, cost))
+        return successors
+
+    # A parking lot has a single goal state where every car is in its own slot (or none if a car has no slot),
+    # so it can also be searched backward from the goal (e.g. by BidirectionalUniformCostSearch)
+    def get_goal_state(self) -> ParkingState:
+        if -1 in self.goal:
+            return None
+        return ParkingState.from_cells(self.goal)
+
+    # This function returns (action, previous state, cost) for every state from which the given state is reached by one action.
+    # A car on the cell c came from a free neighboring cell p by moving in the opposite direction, so the action is
+    # (car, direction from p to c) and the cost is the forward cost of that move (the same as get_cost on the previous state):
+    # it depends on whether p is a slot and who owns c, so it is not the cost of moving back from c to p.
+    def get_predecessors(self, state: ParkingState) -> List[Tuple[ParkingAction, ParkingState, float]]:
+        predecessors = []
+        cars, occupied = state.cars, state.occupied
+        neighbors, moves, slot_owners = self.neighbors, self.moves, self.slot_owners
+        for car_index, car_cell in enumerate(cars):
+            car_rank = 26 - car_index
+            owner_index = slot_owners[car_cell]
+            # The penalty applies if the car left a non-slot cell to enter another car's slot
+            enters_other_slot = owner_index != -1 and owner_index != car_index
+            car_moves = moves[car_index]
+            before, after = cars[:car_index], cars[car_index + 1:]
+            for direction, previous_cell in neighbors[car_cell]:
+                if occupied >> previous_cell & 1:
+                    continue
+                cost = car_rank
+                if enters_other_slot and slot_owners[previous_cell] == -1:
+                    cost += 100
+                previous_state = ParkingState(before + (previous_cell,) + after, occupied ^ (1 << car_cell) ^ (1 << previous_cell))
+                predecessors.append((car_moves[direction.rotate(2)], previous_state, cost))
+        return predecessors
+
+    # Only the car cells are sent to other processes (the occupancy bitmask is rebuilt from them)
+    def pack_state(self, state: ParkingState) -> Tuple[int, ...]:
+        return state.cars
+
+    def unpack_state(self, packed: Tuple[int, ...]) -> ParkingState:
+        return ParkingState.from_cells(packed)
+
+    # The car cells as 16 bit integers
+    def state_bytes(self, state: ParkingState) -> bytes:
+        return array('H', state.cars).tobytes()
+
     # This function returns the cost of applying the given action to the given state
     def get_cost(self, state: ParkingState, action: ParkingAction) -> float:
         #TODO: ADD YOUR CODE HERE
@@ -122,26 +250,23 @@ class ParkingProblem(Problem[ParkingState, ParkingAction]):
         # Get car index and direction from the action
         car_index, direction = action
         car_rank = 26 - car_index # Calculate the rank based on the car's index (adding 1 to handle 1-based indexing)
-        
-        # Get car position from the state
-        car_position = state[car_index]
-        
+
+        # Get car cell from the state
+        car_cell = state[car_index]
+
         # Check if car is moving into its own slot
-        if car_position in self.slots:
+        if self.slot_owners[car_cell] != -1:
             return car_rank # Return the car rank.
-        
+
         # Check if the action moves the car into another employee's parking slot
-        else:
-            # Lopp for all slots for another employee's parking slot
-            for slot, owner_index in self.slots.items():
-                # Check if owner of the slot not the car owner, car position after direction equal to the slot
-                if owner_index != car_index and car_position  + Direction._Vectors[direction] == slot:
-                    return car_rank + 100 # Return the car rank with penalty 100.
+        # (slot_owners maps each cell to the index of its owner, so this is a single lookup)
+        owner_index = self.slot_owners[car_cell + self.offsets[direction]]
+        if owner_index != -1 and owner_index != car_index:
+            return car_rank + 100 # Return the car rank with penalty 100.
 
         return car_rank # Car is moving to an empty space
-    
-     # Read a parking problem from text containing a grid of tiles
-    
+
+    # Read a parking problem from text containing a grid of tiles
     @staticmethod
     def from_text(text: str) -> 'ParkingProblem':
         passages =  set()
@@ -154,21 +279,73 @@ class ParkingProblem(Problem[ParkingState, ParkingAction]):
                     passages.add(Point(x, y))
                     if char == '.':
                         pass
-                    elif char in "ABCDEFGHIJ":
+                    elif char in CAR_TILES:
                         cars[ord(char) - ord('A')] = Point(x, y)
-                    elif char in "0123456789":
-                        slots[int(char)] = Point(x, y)
+                    elif char in SLOT_TILES:
+                        slots[SLOT_TILES[char]] = Point(x, y)
         problem = ParkingProblem()
         problem.passages = passages
         problem.cars = tuple(cars[i] for i in range(len(cars)))
         problem.slots = {position:index for index, position in slots.items()}
         problem.width = width
         problem.height = height
+        problem.compute_tables()
         return problem
 
+    # Compute the cell-indexed tables of the parking lot (they do not change across states)
+    def compute_tables(self) -> None:
+        self.stride = self.width + 2
+        cells = self.stride * (self.height + 2)
+        passage_bits = 0
+        for point in self.passages:
+            passage_bits |= 1 << self.cell(point)
+        offsets = self.offsets = tuple(direction.to_vector().y * self.stride + direction.to_vector().x for direction in Direction)
+        self.neighbors = [
+            tuple((direction, cell + offsets[direction]) for direction in Direction if passage_bits >> (cell + offsets[direction]) & 1)
+            if passage_bits >> cell & 1 else ()
+            for cell in range(cells)
+        ]
+        self.slot_owners = [-1] * cells
+        for point, index in self.slots.items():
+            self.slot_owners[self.cell(point)] = index
+        owned_slots = {index: self.cell(point) for point, index in self.slots.items()}
+        self.goal = tuple(owned_slots.get(car_index, -1) for car_index in range(len(self.cars)))
+        self.moves = [tuple((car_index, direction) for direction in Direction) for car_index in range(len(self.cars))]
+        self.slot_distances = self.compute_slot_distances()
+
+    # Compute the distance table of every car: a BFS from the car's slot over the passages (ignoring the other cars)
+    # gives the least number of moves from every cell to the slot. The cells that cannot reach the slot are -1.
+    def compute_slot_distances(self) -> List[List[int]]:
+        tables = []
+        for slot in self.goal:
+            distances = [-1] * len(self.neighbors)
+            queue = deque()
+            if slot != -1:
+                distances[slot] = 0
+                queue.append(slot)
+            while queue:
+                cell = queue.popleft()
+                for _, next_cell in self.neighbors[cell]:
+                    if distances[next_cell] == -1:
+                        distances[next_cell] = distances[cell] + 1
+                        queue.append(next_cell)
+            tables.append(distances)
+        return tables
+
     # Read a parking problem from file containing a grid of tiles
     @staticmethod
     def from_file(path: str) -> 'ParkingProblem':
         with open(path, 'r') as f:
             return ParkingProblem.from_text(f.read())
-    
+
+# This heuristic returns the sum over all the cars of the number of moves from the car to its slot times the car's rank.
+# Every move of car 'i' costs at least its rank (26 - i) and changes its distance by at most 1, so it is admissible and consistent.
+# It returns infinity if a car can never reach its slot.
+def parking_heuristic(problem: ParkingProblem, state: ParkingState) -> float:
+    total = 0
+    for car_index, (car_cell, distances) in enumerate(zip(state.cars, problem.slot_distances)):
+        distance = distances[car_cell]
+        if distance == -1:
+            return float('inf')
+        total += (26 - car_index) * distance
+    return total
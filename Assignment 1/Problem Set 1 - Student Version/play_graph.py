@@ -1,11 +1,17 @@
 import time
-from graph import GraphRoutingProblem, GraphNode, graphrouting_heuristic
-from agents import HumanAgent, UninformedSearchAgent, InformedSearchAgent
+from graph import GraphRoutingProblem, GraphNode, graphrouting_heuristic, graphrouting_reverse_heuristic
+from agents import HumanAgent, UninformedSearchAgent, InformedSearchAgent, IncrementalSearchAgent
 from helpers.utils import fetch_recorded_calls
+from search_stats import SearchStats, timed_phase
+from functools import partial
 import argparse, os, json
 
+# Pass the SearchStats object (if any) to every call of the search function
+def with_stats(search_fn, stats: SearchStats = None):
+    return search_fn if stats is None else partial(search_fn, stats=stats)
+
 # Create an agent based on the user selections
-def create_agent(args: argparse.Namespace):
+def create_agent(args: argparse.Namespace, stats: SearchStats = None):
     agent_type: str = args.agent
     if agent_type == "human":
         # This function reads the action from the user (human)
@@ -28,26 +34,46 @@ def create_agent(args: argparse.Namespace):
         return HumanAgent(graph_user_action)
     if agent_type == "bfs":
         from search import BreadthFirstSearch
-        return UninformedSearchAgent(BreadthFirstSearch)
+        return UninformedSearchAgent(with_stats(BreadthFirstSearch, stats))
     if agent_type == "dfs":
         from search import DepthFirstSearch
-        return UninformedSearchAgent(DepthFirstSearch)
+        return UninformedSearchAgent(with_stats(DepthFirstSearch, stats))
     if agent_type == "ucs":
         from search import UniformCostSearch
-        return UninformedSearchAgent(UniformCostSearch)
+        return UninformedSearchAgent(with_stats(UniformCostSearch, stats))
     if agent_type == "astar":
         from search import AStarSearch
-        return InformedSearchAgent(AStarSearch, graphrouting_heuristic)
+        return InformedSearchAgent(with_stats(AStarSearch, stats), graphrouting_heuristic)
     if agent_type == "gbfs":
         from search import BestFirstSearch
-        return InformedSearchAgent(BestFirstSearch, graphrouting_heuristic)
+        return InformedSearchAgent(with_stats(BestFirstSearch, stats), graphrouting_heuristic)
+    if agent_type == "alt":
+        from search import AStarSearch
+        from landmarks import landmark_heuristic
+        return InformedSearchAgent(with_stats(AStarSearch, stats), landmark_heuristic)
+    if agent_type == "ch":
+        from contraction import ContractionHierarchySearch
+        return UninformedSearchAgent(with_stats(ContractionHierarchySearch, stats))
+    if agent_type == "bucs":
+        from bidirectional import BidirectionalUniformCostSearch
+        return UninformedSearchAgent(with_stats(BidirectionalUniformCostSearch, stats))
+    if agent_type == "bastar":
+        from bidirectional import BidirectionalAStarSearch
+        search_fn = lambda problem, state, heuristic: BidirectionalAStarSearch(problem, state, heuristic, graphrouting_reverse_heuristic, stats=stats)
+        return InformedSearchAgent(search_fn, graphrouting_heuristic)
+    if agent_type == "dstar":
+        # The incremental agent keeps its search between the steps (see incremental.py)
+        return IncrementalSearchAgent(graphrouting_reverse_heuristic, stats)
     print(f"Requested Agent '{agent_type}' is invalid")
     exit(-1)
 
 def main(args: argparse.Namespace):
     start = time.time() # Track run time
+    # If requested, the searches fill a SearchStats object with their statistics
+    stats = SearchStats() if args.stats or args.stats_json else None
     graph_path = args.graph
-    problem = GraphRoutingProblem.from_file(graph_path) # create the problem
+    with timed_phase(stats, "load"):
+        problem = GraphRoutingProblem.from_file(graph_path) # create the problem
     # Check if there is a figure for the graph that we can display on the console
     figure_path = json.load(open(graph_path, 'r')).get("figure")
     figure = None
@@ -60,7 +86,7 @@ def main(args: argparse.Namespace):
     if figure:
         print(figure)
     print("Current Node:", state)
-    agent = create_agent(args)
+    agent = create_agent(args, stats)
     step = 0 # This will store the current step
     path_cost = 0 # This will store the total path cost
     traversed_nodes = [] # This will store all the traversed nodes in order of traversal
@@ -92,6 +118,10 @@ def main(args: argparse.Namespace):
     # This was a search agent, display the traversed nodes
     if not isinstance(agent, HumanAgent):
         print(f"Traversal Order: {'->'.join(traversed_nodes)}")
+        # Display (or save) the statistics of the searches if requested
+        if stats is not None:
+            if args.stats: print("Search statistics:", stats, sep="\n")
+            if args.stats_json: stats.dump(args.stats_json)
     # Finally print the elapsed time for the whole process
     print(f"Elapsed time: {time.time() - start} seconds")
 
@@ -100,8 +130,12 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Play Graph as Human or AI")
     parser.add_argument("graph", help="path to the graph to play")
     parser.add_argument("--agent", "-a", default="human",
-                        choices=['human', 'bfs', 'dfs', 'ucs', 'astar', 'gbfs'],
+                        choices=['human', 'bfs', 'dfs', 'ucs', 'astar', 'gbfs', 'alt', 'ch', 'bucs', 'bastar', 'dstar'],
                         help="the agent that will play the game")
+    parser.add_argument("--stats", "-s", action="store_true", default=False,
+                        help="Print the statistics of the search (expanded nodes, peak frontier size, heuristic time, ...)")
+    parser.add_argument("--stats-json", default=None, metavar="PATH",
+                        help="Save the statistics of the search to a JSON file")
 
     args = parser.parse_args()
     try:
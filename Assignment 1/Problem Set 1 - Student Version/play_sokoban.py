@@ -2,8 +2,9 @@ from typing import List
 from sokoban import SokobanProblem, Direction, SokobanState, SokobanTile
 from agents import HumanAgent, UninformedSearchAgent, InformedSearchAgent
 from helpers.utils import fetch_tracked_call_count
-from helpers.heuristic_checks import test_heuristic_consistency
-from functools import lru_cache
+from helpers.heuristic_checks import test_heuristic_consistency, test_heuristic_consistency_of_successors
+from search_stats import SearchStats, timed_phase
+from functools import partial
 import argparse, time
 
 def colored_sokoban(level: str):
@@ -27,11 +28,30 @@ def get_heuristic(name: str):
     if name == "strong":
         from sokoban_heuristic import strong_heuristic
         return strong_heuristic
+    if name == "matching":
+        from sokoban_matching import matching_heuristic
+        return matching_heuristic
+    if name == "pdb":
+        from sokoban_pdb import pdb_heuristic
+        return pdb_heuristic
     print(f"Requested Heuristic '{name}' is invalid")
     exit(-1)
 
+# Return the search function selected by the user.
+# If requested, the search runs on the push-level problem (see sokoban_push.py) but still returns the steps to play.
+# If a SearchStats object is given, it is passed to every search call, and so is the closed set if it is not the default.
+def select_search(search_fn, args: argparse.Namespace, stats: SearchStats = None):
+    if args.pushes:
+        from sokoban_push import push_level
+        search_fn = push_level(search_fn)
+    if args.closed_set != "set":
+        search_fn = partial(search_fn, closed_set=args.closed_set)
+    if stats is not None:
+        search_fn = partial(search_fn, stats=stats)
+    return search_fn
+
 # Create an agent based on the user selections
-def create_agent(args: argparse.Namespace):
+def create_agent(args: argparse.Namespace, stats: SearchStats = None):
     agent_type: str = args.agent
     if agent_type == "human":
         # This function reads the action from the user (human)
@@ -52,29 +72,37 @@ def create_agent(args: argparse.Namespace):
         return HumanAgent(sokoban_user_action)
     if agent_type == "bfs":
         from search import BreadthFirstSearch
-        return UninformedSearchAgent(BreadthFirstSearch)
+        return UninformedSearchAgent(select_search(BreadthFirstSearch, args, stats))
+    if agent_type == "ebfs":
+        from external_search import ExternalBreadthFirstSearch
+        return UninformedSearchAgent(select_search(ExternalBreadthFirstSearch, args, stats))
     if agent_type == "dfs":
         from search import DepthFirstSearch
-        return UninformedSearchAgent(DepthFirstSearch)
+        return UninformedSearchAgent(select_search(DepthFirstSearch, args, stats))
     if agent_type == "ucs":
         from search import UniformCostSearch
-        return UninformedSearchAgent(UniformCostSearch)
+        return UninformedSearchAgent(select_search(UniformCostSearch, args, stats))
     if agent_type == "astar":
         from search import AStarSearch
-        # We cache the heuristic calls to speed up the search process if the heuristic is not fast
-        heuristic = lru_cache(2**16)(get_heuristic(args.heuristic))
+        if args.closed_set != "set":
+            print("A* stores the cost of every state in a dictionary, so it does not support other closed sets")
+            exit(-1)
+        # The heuristics store their values in the problem caches (see --cache-size and --cache-policy)
+        heuristic = get_heuristic(args.heuristic)
         # If desired by the user, we track every transition and check for the heuristic consistency for each transition
         if args.checks:
             SokobanProblem.get_successor = test_heuristic_consistency(heuristic)(SokobanProblem.get_successor)
-        return InformedSearchAgent(AStarSearch, heuristic)
+            SokobanProblem.get_successors = test_heuristic_consistency_of_successors(heuristic)(SokobanProblem.get_successors)
+        return InformedSearchAgent(select_search(AStarSearch, args, stats), heuristic)
     if agent_type == "gbfs":
         from search import BestFirstSearch
-        # We cache the heuristic calls to speed up the search process if the heuristic is not fast
-        heuristic = lru_cache(2**16)(get_heuristic(args.heuristic))
+        # The heuristics store their values in the problem caches (see --cache-size and --cache-policy)
+        heuristic = get_heuristic(args.heuristic)
         # If desired by the user, we track every transition and check for the heuristic consistency for each transition
         if args.checks:
             SokobanProblem.get_successor = test_heuristic_consistency(heuristic)(SokobanProblem.get_successor)
-        return InformedSearchAgent(BestFirstSearch, heuristic)
+            SokobanProblem.get_successors = test_heuristic_consistency_of_successors(heuristic)(SokobanProblem.get_successors)
+        return InformedSearchAgent(select_search(BestFirstSearch, args, stats), heuristic)
     print(f"Requested Agent '{agent_type}' is invalid")
     exit(-1)
 
@@ -82,11 +110,21 @@ def main(args: argparse.Namespace):
     state_printer = lambda state: print(state)
     if args.ansicolors: state_printer = lambda state: print(colored_sokoban(str(state)))
     start = time.time() # Track run time
-    problem = SokobanProblem.from_file(args.level) # create the problem
+    # If requested, the searches fill a SearchStats object with their statistics
+    stats = SearchStats() if args.stats or args.stats_json else None
+    with timed_phase(stats, "load"):
+        problem = SokobanProblem.from_file(args.level) # create the problem
+    # Bound the cache where the heuristic values of the states are stored
+    from sokoban_heuristic import HEURISTIC_CACHE
+    problem.configure_cache(HEURISTIC_CACHE, args.cache_size or None, args.cache_policy)
+    if args.deadlocks:
+        # Skip the pushes that lead to freeze or corral deadlocks
+        from sokoban_deadlock import DeadlockDetector
+        problem.deadlock_detector = DeadlockDetector(problem.layout)
     state = problem.get_initial_state() # Get the initial state
     print("Initial State:")
     state_printer(state)
-    agent = create_agent(args)
+    agent = create_agent(args, stats)
     step = 0 # This will store the current step
     total_explored_nodes = 0 # This will store the number of traversed nodes during search
     unsolvable = False # This will store whether the problem is unsolvable or not
@@ -117,6 +155,15 @@ def main(args: argparse.Namespace):
     # This was a search agent, display the number of traversed nodes
     if not isinstance(agent, HumanAgent):
         print(f"Search explored {total_explored_nodes} nodes")
+        # Display (or save) the statistics of the searches if requested
+        if stats is not None:
+            stats.caches = problem.cache_stats()
+            if args.stats: print("Search statistics:", stats, sep="\n")
+            if args.stats_json: stats.dump(args.stats_json)
+    # If deadlock detection was enabled, display the number of pruned pushes
+    if problem.deadlock_detector is not None:
+        pruned = problem.deadlock_detector.pruned
+        print(f"Deadlock detection pruned {problem.deadlock_detector.total_pruned} nodes (freeze: {pruned['freeze']}, corral: {pruned['corral']})")
     # Finally print the elapsed time for the whole process
     print(f"Elapsed time: {time.time() - start} seconds")
 
@@ -126,13 +173,27 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Play Sokoban as Human or AI")
     parser.add_argument("level", help="path to the sokoban level to play")
     parser.add_argument("--agent", "-a", default="human",
-                        choices=['human', 'bfs', 'dfs', 'ucs', 'astar', 'gbfs'],
+                        choices=['human', 'bfs', 'ebfs', 'dfs', 'ucs', 'astar', 'gbfs'],
                         help="the agent that will play the game")
     parser.add_argument("--heuristic", '-hf', default="zero",
-                        choices=["zero", "weak", "strong"],
+                        choices=["zero", "weak", "strong", "matching", "pdb"],
                         help="choose the heuristic to use with A* or Greedy Best First Search")
     parser.add_argument("--checks", "-c", action='store_true', default=False,
                         help="Enable consistency checks for the heuristic")
+    parser.add_argument("--pushes", "-p", action="store_true", default=False,
+                        help="Search over crate pushes instead of single steps (the agent still plays one step at a time)")
+    parser.add_argument("--deadlocks", "-dl", action="store_true", default=False,
+                        help="Prune the pushes that lead to freeze or corral deadlocks")
+    parser.add_argument("--cache-size", type=int, default=2**16,
+                        help="The maximum number of heuristic values kept in the cache (0 for no limit)")
+    parser.add_argument("--cache-policy", default="lru", choices=["lru", "lfu", "clock"],
+                        help="The eviction policy of the heuristic cache")
+    parser.add_argument("--closed-set", default="set", choices=["set", "packed", "bitstate"],
+                        help="How the explored states are stored by BFS, DFS, UCS and GBFS (see closed_sets.py)")
+    parser.add_argument("--stats", "-s", action="store_true", default=False,
+                        help="Print the statistics of the search (expanded nodes, peak frontier size, heuristic time, ...)")
+    parser.add_argument("--stats-json", default=None, metavar="PATH",
+                        help="Save the statistics of the search to a JSON file")
     parser.add_argument("--ansicolors", "-ac", action="store_true",
                         help="Print the level on the console with ANSI colors (only works on some terminals)")
 
@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import Callable, Generic, Iterable, List, TypeVar, Union
+from typing import Callable, Generic, Iterable, List, Tuple, TypeVar, Union
 from helpers.utils import CacheContainer, with_cache
 
 # S and A are used for generic typing where S represents the state type and A represents the action type
@@ -10,6 +10,10 @@ A = TypeVar("A")
 # It also implements 'CacheContainer' which allows you to call the "cache" method
 # which returns a dictionary in which you can store any data you want to cache
 class Problem(ABC, Generic[S, A], CacheContainer):
+    # A problem sets this to True if all of its action costs are integers.
+    # This allows the search functions to use an integer-keyed (bucket) priority queue.
+    integer_costs: bool = False
+
     # This function returns the initial state
     @abstractmethod
     def get_initial_state(self) -> S:
@@ -34,6 +38,42 @@ class Problem(ABC, Generic[S, A], CacheContainer):
     def get_cost(self, state: S, action: A) -> float:
         return 1.0
 
+    # This function returns (action, next state, action cost) for every possible action from the given state.
+    # It is what the search functions use to expand a state. By default, it calls the 3 functions above,
+    # but a problem can override it to compute everything in one pass (e.g. to avoid checking the same tiles twice).
+    # An override must be decorated with @tracked_as("get_actions") (from helpers.utils) if get_actions is tracked,
+    # so that every expansion is still counted as a call to get_actions.
+    def get_successors(self, state: S) -> Iterable[Tuple[A, S, float]]:
+        return [(action, self.get_successor(state, action), self.get_cost(state, action)) for action in self.get_actions(state)]
+
+    # The functions below are only needed by the searches that also run backward from the goal (e.g. bidirectional search).
+    # They are only implemented by the problems that have a single explicit goal state.
+
+    # This function returns the goal state
+    def get_goal_state(self) -> S:
+        raise NotImplementedError(f"{type(self).__name__} does not have a single goal state")
+
+    # This function returns (action, previous state, action cost) for every state from which
+    # the given state can be reached by applying the action (i.e. get_successor(previous state, action) == state)
+    def get_predecessors(self, state: S) -> Iterable[Tuple[A, S, float]]:
+        raise NotImplementedError(f"{type(self).__name__} does not support backward search")
+
+    # The functions below are used by the searches that send states to other processes (e.g. parallel_search.py).
+    # pack_state returns a small picklable value that identifies the state, and unpack_state rebuilds the state from it
+    # in the receiving process. By default, the state itself is sent, which is enough if it can be pickled and compared
+    # by value. A problem overrides them if its states refer to shared data (e.g. the sokoban layout).
+
+    def pack_state(self, state: S) -> object:
+        return state
+
+    def unpack_state(self, packed: object) -> S:
+        return packed
+
+    # This function is used by the compact closed sets (see closed_sets.py). It returns the state as a byte string
+    # which has the same size for every state of the problem, and equal states must have equal bytes (and vice versa).
+    def state_bytes(self, state: S) -> bytes:
+        raise NotImplementedError(f"{type(self).__name__} does not support packed states")
+
 # These are type aliases for:
 # A solution which is a list of actions (or None if no solution is found)
 Solution = Union[List[A], None]
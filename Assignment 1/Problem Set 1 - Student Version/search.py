@@ -1,6 +1,11 @@
 from problem import HeuristicFunction, Problem, S, A, Solution
+from typing import Dict, List, Union
 from collections import deque
 from helpers.utils import NotImplemented
+from nodes import NodeStore
+from frontier import Frontier, IndexedHeap, create_frontier
+from search_stats import SearchStats, instrumented
+from closed_sets import ClosedSet, create_closed_set
 
 #TODO: Import any modules you want to use
 import heapq
@@ -13,7 +18,17 @@ import heapq
 # 1. A list of actions which represent the path from the initial state to the final state
 # 2. None if there is no solution
 
-def BreadthFirstSearch(problem: Problem[S, A], initial_state: S) -> Solution:
+# The frontier entries do not carry their paths. Every generated node is added to a NodeStore
+# which keeps its parent index, action and path cost, and the path is rebuilt once the goal is reached.
+
+# Every search function also accepts an optional SearchStats object (see search_stats.py) which it fills with the
+# number of expanded and generated nodes, the pruned duplicates and the peak sizes of its frontier and closed set.
+
+# The searches that keep a set of explored states accept a "closed_set" argument which selects how it is stored
+# (see closed_sets.py). By default, it is a Python set.
+
+@instrumented
+def BreadthFirstSearch(problem: Problem[S, A], initial_state: S, closed_set: Union[str, ClosedSet] = "set", stats: SearchStats = None) -> Solution:
     #TODO: ADD YOUR CODE HERE
 
     """
@@ -22,6 +37,10 @@ def BreadthFirstSearch(problem: Problem[S, A], initial_state: S) -> Solution:
     Args:
         problem (Problem[S, A]): The problem to be solved, containing state transitions and goal tests.
         initial_state (S): The initial state from which to start the search.
+        closed_set (str | ClosedSet): The set of explored states (see closed_sets.py): "set" (a Python set), "packed"
+                  (an exact table of the states as bytes, which uses less memory) or "bitstate" (an approximate filter
+                  which can miss states), or a closed set object.
+        stats (SearchStats): If given, it is filled with the statistics of the search (see search_stats.py).
 
     Returns:
         Solution: A list of actions that define a path from the initial state to a goal state. 
@@ -32,17 +51,17 @@ def BreadthFirstSearch(problem: Problem[S, A], initial_state: S) -> Solution:
     to keep track of states to explore. It ensures that shallower states are explored before deeper states.
 
     The function initializes a deque as the frontier to implement BFS and keeps track of the states in the frontier for 
-    efficient state checking. It starts by adding the initial state and an empty path to the frontier.
+    efficient state checking. It starts by adding the initial state and the root node of the node store to the frontier.
 
     The search proceeds with a main loop that continues until the frontier is empty. In each iteration, the current 
     state is dequeued from the frontier, and its actions are expanded. For each action, a next state is generated by 
     applying the action to the current state.
 
     The function ensures that the next state is not None, not explored, and not in the frontier. If these conditions are 
-    met, it checks if the next state is a goal state. If a goal state is reached, the function returns the path that 
-    defines the solution.
+    met, it checks if the next state is a goal state. If a goal state is reached, the function rebuilds the path that 
+    defines the solution from the node store.
 
-    Otherwise, the next state is added to the frontier, and the updated path is included. The process continues, and the 
+    Otherwise, a child node is added to the node store, and the next state is added to the frontier with its index. The process continues, and the 
     function explores states in a breadth-first manner.
 
     If no solution is found after exploring all possible states, the function returns None.
@@ -52,45 +71,45 @@ def BreadthFirstSearch(problem: Problem[S, A], initial_state: S) -> Solution:
     # Initialize a deque as the frontier to implement Breadth-First Search.
     # Also, keep track of the states in the frontier for efficient state checking.
     frontier = deque()
+    nodes = NodeStore() # The node store holds the parent and action of every generated node.
 
     # Why a set: A set provides a data structure that allows efficient membership 
     # testing (i.e., checking if an element is already in the set) with an 
     # average-case time complexity of O(1).
     frontier_states = set() # set is used to keep track of the states currently in the frontier.
     
-    frontier.append((initial_state, [])) # Add the initial state and an empty path to the frontier.
+    frontier.append((initial_state, nodes.add_root())) # Add the initial state and the root node to the frontier.
     frontier_states.add(initial_state) # Add the initial state to the frontier states.
 
     # average-case time complexity of O(1).
-    explored = set() # Create a set to keep track of explored states.
+    explored = create_closed_set(closed_set, problem, stats) # Create a set to keep track of explored states.
 
     # Main loop for Breadth-First Search.
     while frontier:
-        current_state, current_path = frontier.popleft() # Pop the first state in the queue of frontier to explore it.
+        current_state, current_node = frontier.popleft() # Pop the first state in the queue of frontier to explore it.
         frontier_states.remove(current_state)  # Remove the state from the frontier.
 
         explored.add(current_state) # Mark the current state as explored.
         
-        actions = problem.get_actions(current_state) # Get possible actions from the problem.
-
-        # For loop to all possible actions.
-        for action in actions:
-            # Generate the next state by applying an action.
-            next_state = problem.get_successor(current_state, action)
-
+        successors = problem.get_successors(current_state)
+        if stats is not None: stats.expand(len(successors), len(frontier), len(explored))
+        # For loop to all possible actions and the next states they generate.
+        for action, next_state, _ in successors:
             # Check if the next state is not None, not explored, and not in the frontier.
             if next_state is not None and next_state not in explored and next_state not in frontier_states:
                 # Check if the next state is the goal state.
                 if problem.is_goal(next_state):
-                    return current_path + [action]  # Return the path if the goal state is reached.
+                    return nodes.path(nodes.add(current_node, action))  # Return the path if the goal state is reached.
  
-                next_path = current_path + [action] # Define the next path.
-                frontier.append((next_state, next_path)) # Append the next state and the updated path to the queue.
+                next_node = nodes.add(current_node, action) # Define the next node.
+                frontier.append((next_state, next_node)) # Append the next state and its node to the queue.
                 frontier_states.add(next_state)  # Add the state to the frontier.
+            elif stats is not None: stats.duplicates += 1
 
     return None  # If no solution is found.
 
-def DepthFirstSearch(problem: Problem[S, A], initial_state: S) -> Solution:
+@instrumented
+def DepthFirstSearch(problem: Problem[S, A], initial_state: S, closed_set: Union[str, ClosedSet] = "set", stats: SearchStats = None) -> Solution:
     #TODO: ADD YOUR CODE HERE
 
     """
@@ -99,6 +118,10 @@ def DepthFirstSearch(problem: Problem[S, A], initial_state: S) -> Solution:
     Args:
         problem (Problem[S, A]): The problem to be solved, containing state transitions and goal tests.
         initial_state (S): The initial state from which to start the search.
+        closed_set (str | ClosedSet): The set of explored states (see closed_sets.py): "set" (a Python set), "packed"
+                  (an exact table of the states as bytes, which uses less memory) or "bitstate" (an approximate filter
+                  which can miss states), or a closed set object.
+        stats (SearchStats): If given, it is filled with the statistics of the search (see search_stats.py).
 
     Returns:
         Solution: A list of actions that define a path from the initial state to a goal state. 
@@ -118,37 +141,37 @@ def DepthFirstSearch(problem: Problem[S, A], initial_state: S) -> Solution:
     """
 
     frontier = deque() # Initialize a stack for DFS
-    frontier.append((initial_state, []))  # Initial state and empty path
+    nodes = NodeStore() # The node store holds the parent and action of every generated node
+    frontier.append((initial_state, nodes.add_root()))  # Initial state and the root node
 
     # average-case time complexity of O(1).
-    explored = set() # Create a set to keep track of explored states
+    explored = create_closed_set(closed_set, problem, stats) # Create a set to keep track of explored states
 
     # Main loop for Depth First Search
     while frontier:
-        current_state, current_path = frontier.pop() # Pop the last state in the stack of frontier to explore it.
+        current_state, current_node = frontier.pop() # Pop the last state in the stack of frontier to explore it.
 
         # Check if the current state is the goal state
         if problem.is_goal(current_state):
-            return current_path  # Return the path if the goal state is reached
+            return nodes.path(current_node)  # Return the path if the goal state is reached
 
         explored.add(current_state) # Mark the current state as explored
 
-        actions = problem.get_actions(current_state) # Get possible actions from the problem
-
-        # For loop to all possible actions.
-        for action in actions:
-            # Generate the next state by applying an action.
-            next_state = problem.get_successor(current_state, action)
-
+        successors = problem.get_successors(current_state)
+        if stats is not None: stats.expand(len(successors), len(frontier), len(explored))
+        # For loop to all possible actions and the next states they generate.
+        for action, next_state, _ in successors:
             # Check if next state not explored
             if next_state not in explored:
-                next_path = current_path + [action] # Extend the current path with the chosen action
-                frontier.append((next_state, next_path)) # Append the next state and the updated path to the stack
+                next_node = nodes.add(current_node, action) # Create a child node for the chosen action
+                frontier.append((next_state, next_node)) # Append the next state and its node to the stack
                 explored.add(next_state) # Mark the current state as explored
+            elif stats is not None: stats.duplicates += 1
 
     return None  # If no solution is found
 
-def UniformCostSearch(problem: Problem[S, A], initial_state: S) -> Solution:
+@instrumented
+def UniformCostSearch(problem: Problem[S, A], initial_state: S, priority_queue: Union[str, Frontier] = "auto", closed_set: Union[str, ClosedSet] = "set", stats: SearchStats = None) -> Solution:
     #TODO: ADD YOUR CODE HERE
 
     """
@@ -157,6 +180,14 @@ def UniformCostSearch(problem: Problem[S, A], initial_state: S) -> Solution:
     Args:
         problem (Problem[S, A]): The problem to be solved, containing state transitions, goal tests, and costs.
         initial_state (S): The initial state from which to start the search.
+        priority_queue (str | Frontier): The frontier implementation (see frontier.py). "heapq" pushes duplicate entries
+                  and skips the stale ones, "indexed" keeps one entry per state and performs a decrease-key instead,
+                  and "bucket" keeps a FIFO bucket per cost. "auto" uses "bucket" if the problem declares integer costs
+                  and "heapq" otherwise.
+        closed_set (str | ClosedSet): The set of explored states (see closed_sets.py): "set" (a Python set), "packed"
+                  (an exact table of the states as bytes, which uses less memory) or "bitstate" (an approximate filter
+                  which can miss states), or a closed set object.
+        stats (SearchStats): If given, it is filled with the statistics of the search (see search_stats.py).
 
     Returns:
         Solution: A list of actions that define the optimal path from the initial state to a goal state. 
@@ -176,50 +207,48 @@ def UniformCostSearch(problem: Problem[S, A], initial_state: S) -> Solution:
     The function returns a list of actions constituting the optimal path to the goal state or None if no solution is found.
     """
 
-    # Initialize an empty priority queue for frontier
-    frontier = []  # List of (priority, count, state, path)
-    explored = set()  # Set to keep track of explored states
-    counter = 0  # Global counter for priorities
+    # Initialize an empty priority queue for frontier (it breaks ties using a global counter)
+    frontier = create_frontier(priority_queue, problem)
+    nodes = NodeStore()  # Node store which holds the parent, action and cost of every generated node
+    explored = create_closed_set(closed_set, problem, stats)  # Set to keep track of explored states
 
-    # Add the initial state to the frontier with a cost of 0 and an empty path
-    heapq.heappush(frontier, (0, counter, initial_state, []))
+    # Add the initial state to the frontier with a cost of 0 and the root node
+    frontier.push(0, initial_state, nodes.add_root())
 
     # Main loop for Uniform Cost Search
     while frontier:
         # Pop the node with the lowest cost (priority)
-        cost, _, current_state, current_path = heapq.heappop(frontier)
+        cost, current_state, current_node = frontier.pop()
 
         # Check if the current state is the goal state
         if problem.is_goal(current_state):
-            return current_path  # Return the path if the goal state is reached
+            return nodes.path(current_node)  # Return the path if the goal state is reached
 
         # Check if the current state is explored
         if current_state in explored:
+            if stats is not None: stats.duplicates += 1
             continue  # Skip if already explored
 
         explored.add(current_state) # Mark the current state as explored
 
-        actions = problem.get_actions(current_state) # Get possible actions from the problem
-
-        # For loop to all possible actions
-        for action in actions:
-            # Generate the next state by applying an action.
-            next_state = problem.get_successor(current_state, action)
-
+        successors = problem.get_successors(current_state)
+        if stats is not None: stats.expand(len(successors), len(frontier), len(explored))
+        # For loop to all possible actions, the next states they generate and their costs
+        for action, next_state, action_cost in successors:
             # Check if the next state is not None and not in the explored set
             if next_state is not None and next_state not in explored:
                 # Calculate the cost of reaching the next state
-                next_cost = cost + problem.get_cost(current_state, action)
-                # Extend the current path with the chosen action
-                next_path = current_path + [action]
-                # Increment the counter to ensure unique priorities
-                counter += 1  
+                next_cost = cost + action_cost
+                # Create a child node for the chosen action
+                next_node = nodes.add(current_node, action, next_cost)
                 # Sort by cost without considering the nodes themselves
-                heapq.heappush(frontier, (next_cost, counter, next_state, next_path))
+                frontier.push(next_cost, next_state, next_node)
+            elif stats is not None: stats.duplicates += 1
 
     return None  # If no solution is found
 
-def AStarSearch(problem: Problem[S, A], initial_state: S, heuristic: HeuristicFunction) -> Solution:
+@instrumented
+def AStarSearch(problem: Problem[S, A], initial_state: S, heuristic: HeuristicFunction, priority_queue: Union[str, Frontier] = "auto", stats: SearchStats = None) -> Solution:
     #TODO: ADD YOUR CODE HERE
 
     """
@@ -229,6 +258,12 @@ def AStarSearch(problem: Problem[S, A], initial_state: S, heuristic: HeuristicFu
         problem (Problem[S, A]): The problem to be solved, containing state transitions, goal tests, and costs.
         initial_state (S): The initial state from which to start the search.
         heuristic (HeuristicFunction): A heuristic function that estimates the cost from a state to the goal.
+        priority_queue (str | Frontier): The frontier implementation (see frontier.py). With "heapq", a state whose g(n)
+                  improves is pushed again and the stale entry is expanded again when popped. With "indexed", the entry
+                  is updated in place (decrease-key) so every frontier entry is unique. "bucket" behaves like "heapq"
+                  but keeps a FIFO bucket per f(n). "auto" uses "bucket" if the problem declares integer costs
+                  and "heapq" otherwise.
+        stats (SearchStats): If given, it is filled with the statistics of the search (see search_stats.py).
 
     Returns:
         Solution: A list of actions that define the optimal path from the initial state to a goal state. 
@@ -248,33 +283,30 @@ def AStarSearch(problem: Problem[S, A], initial_state: S, heuristic: HeuristicFu
     The function returns a list of actions constituting the optimal path to the goal state or None if no solution is found.
     """
 
-    frontier = []  # List of (f(n), counter, state, path)
+    frontier = create_frontier(priority_queue, problem)  # Priority queue of states sorted by f(n) then by a global counter
+    nodes = NodeStore()  # Node store which holds the parent, action and g(n) of every generated node
     g_costs = {initial_state: 0}
-    counter = 0  # Global counter for priorities
 
     # Push the initial state into the frontier with a priority based on the heuristic value.
-    heapq.heappush(frontier, (heuristic(problem, initial_state), counter, initial_state, []))
+    frontier.push(heuristic(problem, initial_state), initial_state, nodes.add_root())
     
     # Main loop for AStarSearch
     while frontier:
         # Pop the node with the lowest cost (priority)
-        _, _, current_state, current_path = heapq.heappop(frontier)
+        _, current_state, current_node = frontier.pop()
         
         # Check if the current state is the goal state
         if problem.is_goal(current_state):
-            return current_path  # Return the path if the goal state is reached
+            return nodes.path(current_node)  # Return the path if the goal state is reached
         
-        actions = problem.get_actions(current_state) # Get possible actions from the problem
-
-        # For loop to all possible actions
-        for action in actions:
-            # Generate the next state by applying an action.
-            next_state = problem.get_successor(current_state, action)
-            
+        successors = problem.get_successors(current_state)
+        if stats is not None: stats.expand(len(successors), len(frontier), len(g_costs))
+        # For loop to all possible actions, the next states they generate and their costs
+        for action, next_state, action_cost in successors:
             # Check if the next state is not None.
             if next_state is not None:
                 # Calculate the cost of reaching the next state from the current state.
-                next_g_cost = g_costs[current_state] + problem.get_cost(current_state, action)
+                next_g_cost = g_costs[current_state] + action_cost
                 
                 # Check if the next state has not been encountered before or if it has a lower cost.
                 if next_state not in g_costs or next_g_cost < g_costs[next_state]:
@@ -282,16 +314,17 @@ def AStarSearch(problem: Problem[S, A], initial_state: S, heuristic: HeuristicFu
                     # Calculate the estimated total cost from the initial state to the goal state.
                     next_f_cost = next_g_cost + heuristic(problem, next_state)
                     
-                    # Extend the current path with the chosen action
-                    next_path = current_path + [action]
-                    counter += 1  # Increment the counter to ensure unique priorities
+                    # Create a child node for the chosen action
+                    next_node = nodes.add(current_node, action, next_g_cost)
                     # Push the next state into the frontier with the new priority.
                     # Sort by f(n) and use counter as tie-breaker to maintain FIFO order
-                    heapq.heappush(frontier, (next_f_cost, counter, next_state, next_path))
+                    frontier.push(next_f_cost, next_state, next_node)
+                elif stats is not None: stats.duplicates += 1
     
     return None  # If no solution is found
 
-def BestFirstSearch(problem: Problem[S, A], initial_state: S, heuristic: HeuristicFunction) -> Solution:
+@instrumented
+def BestFirstSearch(problem: Problem[S, A], initial_state: S, heuristic: HeuristicFunction, closed_set: Union[str, ClosedSet] = "set", stats: SearchStats = None) -> Solution:
     #TODO: ADD YOUR CODE HERE
 
     """
@@ -301,6 +334,10 @@ def BestFirstSearch(problem: Problem[S, A], initial_state: S, heuristic: Heurist
         problem (Problem): The problem to be solved.
         initial_state (S): The initial state of the problem.
         heuristic (HeuristicFunction): A heuristic function that estimates the cost to reach the goal from a state.
+        closed_set (str | ClosedSet): The set of explored states (see closed_sets.py): "set" (a Python set), "packed"
+                  (an exact table of the states as bytes, which uses less memory) or "bitstate" (an approximate filter
+                  which can miss states), or a closed set object.
+        stats (SearchStats): If given, it is filled with the statistics of the search (see search_stats.py).
 
     Returns:
         Solution: A list of actions defining the path from the initial state to the goal state, or None if no solution is found.
@@ -317,40 +354,277 @@ def BestFirstSearch(problem: Problem[S, A], initial_state: S, heuristic: Heurist
     """
 
     # Initialize an empty priority queue for the frontier
-    frontier = []  # List of (priority, counter, state, path)
-    explored = set()  # Set to keep track of explored states
+    frontier = []  # List of (priority, counter, state, node)
+    nodes = NodeStore()  # Node store which holds the parent and action of every generated node
+    explored = create_closed_set(closed_set, problem, stats)  # Set to keep track of explored states
     counter = 0  # Global counter for priorities
 
     # Add the initial state to the frontier with a priority determined by the heuristic and a counter
-    heapq.heappush(frontier, (heuristic(problem, initial_state), counter, initial_state, []))
+    heapq.heappush(frontier, (heuristic(problem, initial_state), counter, initial_state, nodes.add_root()))
     
     # Main loop for Best First Search
     while frontier:
         # Pop the node with the lowest priority (heuristic value)
-        _, _, current_state, current_path = heapq.heappop(frontier)
+        _, _, current_state, current_node = heapq.heappop(frontier)
 
         # Check if the current state is the goal state
         if problem.is_goal(current_state):
-            return current_path  # Return the path if the goal state is reached
+            return nodes.path(current_node)  # Return the path if the goal state is reached
 
         # Check if current state is explored
         if current_state in explored:
+            if stats is not None: stats.duplicates += 1
             continue  # Skip if already explored
 
         explored.add(current_state) # Mark the current state as explored
 
-        actions = problem.get_actions(current_state) # Get possible actions from the problem for the current state
-       
-        # Loop through all possible actions
-        for action in actions:
-            # Generate the next state by applying an action
-            next_state = problem.get_successor(current_state, action)
-
+        successors = problem.get_successors(current_state)
+        if stats is not None: stats.expand(len(successors), len(frontier), len(explored))
+        # Loop through all possible actions and the next states they generate
+        for action, next_state, _ in successors:
             # Check if the next state is not None and has not been explored
             if next_state is not None and next_state not in explored:
                 counter += 1  # Increment the counter to ensure unique priorities
-                next_path = current_path + [action] # Extend the current path with the chosen action
+                next_node = nodes.add(current_node, action) # Create a child node for the chosen action
                 # Add the next state to the frontier with a priority determined by the heuristic and a counter
-                heapq.heappush(frontier, (heuristic(problem, next_state), counter, next_state, next_path))
+                heapq.heappush(frontier, (heuristic(problem, next_state), counter, next_state, next_node))
+            elif stats is not None: stats.duplicates += 1
+
+    return None  # If no solution is found
+
+@instrumented
+def IDAStarSearch(problem: Problem[S, A], initial_state: S, heuristic: HeuristicFunction, transposition_limit: int = 2**16, stats: SearchStats = None) -> Solution:
+    """
+    Perform Iterative Deepening A* (IDA*) to find the optimal path from the initial state to a goal state.
+
+    Args:
+        problem (Problem[S, A]): The problem to be solved, containing state transitions, goal tests, and costs.
+        initial_state (S): The initial state from which to start the search.
+        heuristic (HeuristicFunction): An admissible heuristic function that estimates the cost from a state to the goal.
+        transposition_limit (int): The maximum number of states stored in the transposition cache.
+        stats (SearchStats): If given, it is filled with the statistics of the search (see search_stats.py).
+
+    Returns:
+        Solution: A list of actions that define the optimal path from the initial state to a goal state. 
+                  Returns None if no solution is found.
+
+    IDA* runs a series of depth-first searches. Each iteration only follows the nodes whose f(n) = g(n) + h(n) does not 
+    exceed a threshold, and the next threshold is the smallest f(n) that exceeded the current one. Since only the current 
+    path is stored, the memory use is linear in the solution depth instead of the number of generated states.
+
+    States on the current path are skipped to avoid cycles. A transposition cache stores the g(n) with which each state 
+    was reached during the current iteration, so a state that is reached again with a g(n) that is not lower is not 
+    expanded again. The cache never holds more than 'transposition_limit' states; when it is full, the oldest entry is 
+    evicted (which only costs some repeated work).
+    """
+
+    if problem.is_goal(initial_state):
+        return []
+
+    threshold = heuristic(problem, initial_state)
+    
+    # Each iteration is a depth-first search bounded by the threshold
+    while threshold != float('inf'):
+        next_threshold = float('inf') # The smallest f(n) which exceeded the threshold
+        transpositions = {initial_state: 0} # The lowest g(n) of every state seen in this iteration
+        on_path = {initial_state} # The states on the current path
+        path = [] # The actions on the current path
+        successors = problem.get_successors(initial_state)
+        if stats is not None: stats.expand(len(successors), 1, len(transpositions))
+        # The stack contains (state, g(n), iterator over the successors) for every state on the current path
+        stack = [(initial_state, 0, iter(successors))]
+
+        while stack:
+            current_state, g_cost, successors = stack[-1]
+            successor = next(successors, None)
+            # If all the actions are tried, backtrack
+            if successor is None:
+                stack.pop()
+                on_path.discard(current_state)
+                if path: path.pop()
+                continue
+
+            action, next_state, action_cost = successor
+            # Skip the states that would form a cycle on the current path
+            if next_state is None or next_state in on_path:
+                if stats is not None: stats.duplicates += 1
+                continue
+            next_g_cost = g_cost + action_cost
+            # Skip the states that were already reached in this iteration with a cost that is not higher
+            if transpositions.get(next_state, float('inf')) <= next_g_cost:
+                if stats is not None: stats.duplicates += 1
+                continue
+            next_f_cost = next_g_cost + heuristic(problem, next_state)
+            # The states above the threshold are left for the next iteration
+            if next_f_cost > threshold:
+                next_threshold = min(next_threshold, next_f_cost)
+                continue
+            if problem.is_goal(next_state):
+                return path + [action]  # Return the path if the goal state is reached
+
+            # Store the state in the transposition cache (and evict the oldest entry if the cache is full)
+            if next_state not in transpositions and len(transpositions) >= transposition_limit:
+                del transpositions[next(iter(transpositions))]
+            transpositions[next_state] = next_g_cost
+
+            # Go deeper
+            path.append(action)
+            on_path.add(next_state)
+            successors = problem.get_successors(next_state)
+            if stats is not None: stats.expand(len(successors), len(stack) + 1, len(transpositions))
+            stack.append((next_state, next_g_cost, iter(successors)))
+
+        threshold = next_threshold
+    
+    return None  # If no solution is found
+
+# A node of the memory-bounded A* search tree.
+# Unlike the NodeStore entries, these nodes can be removed from memory so each node is a separate object.
+class _MemoryNode:
+    __slots__ = ("state", "parent", "action", "g", "f", "depth", "children", "forgotten")
+
+    def __init__(self, state, parent: "_MemoryNode", action, g: float, f: float) -> None:
+        self.state = state
+        self.parent = parent
+        self.action = action
+        self.g = g
+        self.f = f
+        self.depth = 0 if parent is None else parent.depth + 1
+        self.children: List["_MemoryNode"] = [] # The children that are currently in memory
+        self.forgotten: Dict = {} # The f(n) of each child state that was removed from memory
+
+    def path(self) -> List:
+        node, path = self, []
+        while node.parent is not None:
+            path.append(node.action)
+            node = node.parent
+        path.reverse()
+        return path
+
+@instrumented
+def SMAStarSearch(problem: Problem[S, A], initial_state: S, heuristic: HeuristicFunction, memory_limit: int = 2**16, stats: SearchStats = None) -> Solution:
+    """
+    Perform a simplified memory-bounded A* (SMA*) search which never keeps more than 'memory_limit' nodes in memory.
+
+    Args:
+        problem (Problem[S, A]): The problem to be solved, containing state transitions, goal tests, and costs.
+        initial_state (S): The initial state from which to start the search.
+        heuristic (HeuristicFunction): An admissible heuristic function that estimates the cost from a state to the goal.
+        memory_limit (int): The maximum number of search nodes stored at the same time (must be at least 2).
+        stats (SearchStats): If given, it is filled with the statistics of the search (see search_stats.py).
+
+    Returns:
+        Solution: A list of actions that define a path from the initial state to a goal state. The path is optimal if 
+                  the optimal solution depth is less than 'memory_limit' - 1. Returns None if no solution is found.
+
+    The search behaves like A* (the node with the lowest f(n) is expanded first, and the deepest one is picked on ties) 
+    until the memory is full. Then, the leaf with the highest f(n) (the shallowest one on ties) is removed from memory 
+    and its f(n) is stored in its parent. A parent with forgotten children goes back into the queue with the lowest 
+    forgotten value, so the forgotten subtrees are only regenerated when they become the most promising ones.
+
+    For simplicity, all the missing successors of a node are generated at once. The f(n) of the children is at least 
+    the f(n) of their parent (pathmax) and at least the value they had when they were forgotten, and the f(n) of the 
+    ancestors is backed up to the lowest f(n) of their children. Remembering the value of each forgotten child means 
+    that regenerating a subtree never loses what was learned about it, so the search cannot cycle between the same 
+    subtrees forever. A successor is skipped if its state is on its own path, so the search never follows cycles, or if 
+    the same state is already in memory with a path that is neither more expensive nor deeper.
+    """
+
+    infinity = float('inf')
+    root = _MemoryNode(initial_state, None, None, 0, heuristic(problem, initial_state))
+    # The queue contains the leaves (sorted by f(n)) and the nodes that have forgotten children (sorted by the lowest
+    # forgotten f(n)). Ties are broken by picking the deepest node first, then in FIFO order.
+    queue = IndexedHeap()
+    # The leaves that can be removed from memory sorted by (-f(n), shallowest first, newest first)
+    leaves = IndexedHeap()
+    counter = 0 # Global counter for tie-breaking
+    used = 1 # The number of nodes in memory
+    in_memory = {initial_state: root} # The best node in memory for each state
+
+    def enqueue(node: _MemoryNode):
+        nonlocal counter
+        counter += 1
+        if node.children:
+            queue.push(node, (min(node.forgotten.values()), -node.depth, counter))
+        else:
+            queue.push(node, (node.f, -node.depth, counter))
+            leaves.push(node, (-node.f, node.depth, -counter))
+
+    # Update the f(n) of the ancestors to the lowest f(n) of their children
+    def backup(node: _MemoryNode):
+        while node is not None and node.children:
+            f = min(min(child.f for child in node.children), min(node.forgotten.values(), default=infinity))
+            if f == node.f: break
+            node.f = f
+            node = node.parent
+
+    # Remove a leaf from memory and store its f(n) in its parent which goes back into the queue
+    def forget(node: _MemoryNode):
+        nonlocal used
+        parent = node.parent
+        parent.children.remove(node)
+        if in_memory.get(node.state) is node:
+            del in_memory[node.state]
+        parent.forgotten[node.state] = min(parent.forgotten.get(node.state, infinity), node.f)
+        used -= 1
+        if not parent.children:
+            parent.f = min(parent.forgotten.values())
+        enqueue(parent)
+        backup(parent)
+
+    enqueue(root)
+    while queue:
+        node, (bound, _, _) = queue.pop()
+        if node in leaves: leaves.remove(node)
+        if bound == infinity:
+            return None # The remaining nodes are dead ends or cannot fit in memory
+        if not node.children and problem.is_goal(node.state):
+            return node.path() # Return the path if the goal state is reached
+
+        # Skip the states on the path (to avoid cycles) and the children that are still in memory
+        excluded = {child.state for child in node.children}
+        ancestor = node
+        while ancestor is not None:
+            excluded.add(ancestor.state)
+            ancestor = ancestor.parent
+
+        # Generate the successors that are not in memory
+        forgotten, node.forgotten = node.forgotten, {}
+        successors = problem.get_successors(node.state)
+        if stats is not None: stats.expand(len(successors), len(queue), used)
+        for action, next_state, action_cost in successors:
+            if next_state is None or next_state in excluded:
+                if stats is not None: stats.duplicates += 1
+                continue
+            next_g_cost = node.g + action_cost
+            duplicate = in_memory.get(next_state)
+            if duplicate is not None and duplicate.g <= next_g_cost and duplicate.depth <= node.depth + 1:
+                if stats is not None: stats.duplicates += 1
+                continue
+            if node.depth + 2 >= memory_limit and not problem.is_goal(next_state):
+                # The path to this child fills the whole memory, so it cannot be expanded
+                next_f_cost = infinity
+            else:
+                next_f_cost = max(bound, next_g_cost + heuristic(problem, next_state), forgotten.get(next_state, bound))
+            child = _MemoryNode(next_state, node, action, next_g_cost, next_f_cost)
+            node.children.append(child)
+            in_memory[next_state] = child
+            enqueue(child)
+            used += 1
+
+        if node.children:
+            backup(node)
+        elif node.parent is not None:
+            # A node without successors is a dead end
+            node.f = infinity
+            forget(node)
+        else:
+            return None # The initial state has no successors
+        
+        # Free the memory by removing the worst leaves
+        while used > memory_limit and leaves:
+            leaf, _ = leaves.pop()
+            queue.remove(leaf)
+            forget(leaf)
 
     return None  # If no solution is found
@@ -0,0 +1,164 @@
+from contextlib import contextmanager, nullcontext
+from typing import Any, Callable, Dict, Iterator, List, Optional
+import functools, inspect, json, time
+
+from problem import HeuristicFunction
+
+# This file contains the instrumentation shared by all the search functions.
+# Every search function accepts an optional "stats" argument. If a SearchStats object is given, the search fills it with
+# the number of expanded and generated nodes, the number of pruned duplicates, the peak sizes of its frontier and of its
+# closed set, the number of heuristic calls and the time they took, and the wall time of each phase of the search.
+# If "stats" is None (the default), nothing is measured and the search runs exactly as before.
+# The counters are added up over all the searches that receive the same object (e.g. when an agent searches again).
+
+# The names of the search function arguments that are heuristics (they are wrapped to count their calls)
+HEURISTIC_ARGUMENTS = ("heuristic", "reverse_heuristic")
+
+# SearchStats holds the counters of one or more searches:
+#   expanded: the number of nodes whose successors were generated
+#   generated: the number of successors that were generated
+#   duplicates: the number of generated successors and frontier entries that were dropped because their state was
+#               already explored (or reached with a path that is not cheaper)
+#   peak_frontier / peak_closed: the largest frontier and closed set seen when a node was expanded
+#   closed_memory: the largest memory in bytes used by the closed sets of a search (see closed_sets.py),
+#                  if the search created its closed set with create_closed_set
+#   heuristic_calls / heuristic_time: the number of heuristic calls and their total time in seconds
+#   phases: the wall time in seconds of each phase (e.g. "search", "preprocessing")
+#   caches: the counters of the problem caches (see CacheContainer.cache_stats), if they were recorded by the caller
+class SearchStats:
+    def __init__(self) -> None:
+        self.searches = 0
+        self.expanded = 0
+        self.generated = 0
+        self.duplicates = 0
+        self.peak_frontier = 0
+        self.peak_closed = 0
+        self.closed_memory = 0
+        self.heuristic_calls = 0
+        self.heuristic_time = 0.0
+        self.phases: Dict[str, float] = {}
+        self.caches: Dict[str, Dict[str, Any]] = {}
+        self.closed_sets: List[Callable[[], int]] = [] # The memory functions of the closed sets of the running search
+
+    # Record the expansion of a node which generated the given number of successors,
+    # with the current sizes of the frontier and the closed set
+    def expand(self, generated: int, frontier: int, closed: int) -> None:
+        self.expanded += 1
+        self.generated += generated
+        if frontier > self.peak_frontier: self.peak_frontier = frontier
+        if closed > self.peak_closed: self.peak_closed = closed
+
+    # Add the counters of a search that ran at the same time as this one (e.g. a worker of a parallel search),
+    # so the peak sizes are added too (their sum is an upper bound on the combined peak)
+    def merge(self, other: 'SearchStats') -> None:
+        self.expanded += other.expanded
+        self.generated += other.generated
+        self.duplicates += other.duplicates
+        self.peak_frontier += other.peak_frontier
+        self.peak_closed += other.peak_closed
+        self.closed_memory += other.closed_memory
+        self.heuristic_calls += other.heuristic_calls
+        self.heuristic_time += other.heuristic_time
+        for name, seconds in other.phases.items():
+            self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    # Register a function that returns the memory of a closed set of the running search.
+    # The memory is read once the search ends (the closed sets only grow, so it is their peak) by measure_closed_sets.
+    def track_closed_set(self, memory: Callable[[], int]) -> None:
+        self.closed_sets.append(memory)
+
+    # Record the total memory of the registered closed sets and forget them (so they can be freed)
+    def measure_closed_sets(self) -> None:
+        if self.closed_sets:
+            self.closed_memory = max(self.closed_memory, sum(memory() for memory in self.closed_sets))
+            self.closed_sets.clear()
+
+    # Add the wall time of the code inside the "with" block to the given phase
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+
+    # Return a heuristic function that calls the given one and counts the calls and their time
+    # (the original heuristic is kept in its "__wrapped__" attribute)
+    def count_heuristic(self, heuristic: Callable[..., float]) -> Callable[..., float]:
+        @functools.wraps(heuristic)
+        def counted(*args) -> float:
+            start = time.perf_counter()
+            try:
+                return heuristic(*args)
+            finally:
+                self.heuristic_calls += 1
+                self.heuristic_time += time.perf_counter() - start
+        return counted
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "searches": self.searches,
+            "expanded": self.expanded,
+            "generated": self.generated,
+            "duplicates": self.duplicates,
+            "peak_frontier": self.peak_frontier,
+            "peak_closed": self.peak_closed,
+            "closed_memory": self.closed_memory,
+            "heuristic_calls": self.heuristic_calls,
+            "heuristic_time": self.heuristic_time,
+            "phases": dict(self.phases),
+            "caches": {_cache_name(name): dict(counters) for name, counters in self.caches.items()},
+        }
+
+    # Write the counters to a JSON file
+    def dump(self, path: str) -> None:
+        with open(path, 'w') as file:
+            json.dump(self.to_dict(), file, indent=2)
+
+    def __str__(self) -> str:
+        lines = [
+            f"Nodes expanded: {self.expanded}",
+            f"Nodes generated: {self.generated}",
+            f"Duplicates pruned: {self.duplicates}",
+            f"Peak frontier size: {self.peak_frontier}",
+            f"Peak closed set size: {self.peak_closed}",
+            f"Closed set memory: {self.closed_memory} bytes",
+            f"Heuristic calls: {self.heuristic_calls} ({self.heuristic_time:.3f} seconds)",
+        ]
+        lines += [f"Phase '{name}': {seconds:.3f} seconds" for name, seconds in self.phases.items()]
+        lines += [f"Cache '{_cache_name(name)}': {counters['hits']} hits, {counters['misses']} misses, {counters['evictions']} evictions"
+                  f" ({counters['size']} entries)" for name, counters in self.caches.items()]
+        return '\n'.join(lines)
+
+# Return the printable name of a problem cache (the default cache has the name None)
+def _cache_name(name: Any) -> str:
+    return "default" if name is None else str(name)
+
+# Return a context manager that adds the wall time of its block to a phase of the stats (or does nothing if stats is None)
+def timed_phase(stats: Optional[SearchStats], name: str):
+    return nullcontext() if stats is None else stats.phase(name)
+
+# Decorate a search function so that, when it receives a SearchStats object as "stats", its heuristic arguments are
+# counted and timed, its whole run is timed as the "search" phase and the memory of its closed sets is measured.
+# Without stats, the search function is called as is.
+# The search function itself counts its expansions (see SearchStats.expand) since only it can see its frontier.
+def instrumented(search_fn: Callable[..., Any]) -> Callable[..., Any]:
+    signature = inspect.signature(search_fn)
+
+    @functools.wraps(search_fn)
+    def search(*args, **kwargs):
+        stats: Optional[SearchStats] = kwargs.get("stats")
+        if stats is None:
+            return search_fn(*args, **kwargs)
+        bound = signature.bind(*args, **kwargs)
+        for name in HEURISTIC_ARGUMENTS:
+            heuristic: HeuristicFunction = bound.arguments.get(name)
+            if heuristic is not None:
+                bound.arguments[name] = stats.count_heuristic(heuristic)
+        stats.searches += 1
+        try:
+            with stats.phase("search"):
+                return search_fn(*bound.args, **bound.kwargs)
+        finally:
+            stats.measure_closed_sets()
+    return search
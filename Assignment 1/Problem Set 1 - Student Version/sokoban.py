@@ -1,10 +1,11 @@
 from dataclasses import dataclass
-from typing import FrozenSet, Iterable
+from typing import FrozenSet, Iterable, List, Tuple
 from enum import Enum
+import random
 
 from mathutils import Direction, Point
 from problem import Problem
-from helpers.utils import track_call_count
+from helpers.utils import track_call_count, tracked_as
 
 # This file contains the definition for the Sokoban problem
 # In this problem, the agent can move Up, Down, Left or Right
@@ -20,45 +21,163 @@ class SokobanTile(str, Enum):
     CRATE_ON_GOAL  = "*"
     PLAYER_ON_GOAL = "+"
 
-# For the sokoban state, we use dataclass to automatically implement:
-#   the constructor and to make the class immutable
-# We disable the automatic equality implementation since we don't need it;
-# we only need the default equality which compares objects by pointers.
 # The layout contains the problem details that are unchangeable across states such as:
 #   The walkable area (locations without walls) and the locations of the goals
+# The states use a cell-indexed layout where every tile has an integer index.
+# The grid is padded with a border of walls, so the index of the point (x, y) is (y + 1) * stride + (x + 1)
+# where stride = width + 2, and moving in any direction from a walkable cell never wraps around to another row.
+# A set of cells is stored as a Python int bitmask where bit i is set if the cell i is in the set,
+# so checking, adding and removing a cell are all O(1) bit operations.
+# We use dataclass to automatically implement the constructor and to make the class immutable.
+# We disable the automatic equality implementation since we don't need it;
+# we only need the default equality which compares objects by pointers.
 @dataclass(eq=False, frozen=True)
 class SokobanLayout:
-    __slots__ = ("width", "height", "walkable", "goals")
+    __slots__ = ("width", "height", "walkable", "goals", "stride", "walkable_bits", "goal_bits", "dead_bits", "moves", "crate_keys", "player_keys")
     width: int
     height: int
     walkable: FrozenSet[Point]
     goals: FrozenSet[Point]
+    stride: int                            # The number of cells in a row of the padded grid
+    walkable_bits: int                     # The bitmask of the walkable cells
+    goal_bits: int                         # The bitmask of the goal cells
+    dead_bits: int                         # The bitmask of the simple dead squares (see below)
+    moves: Tuple[Tuple[Direction, int]]    # The (direction, cell index offset) of every action in the order of Direction
+    crate_keys: Tuple[int]                 # The zobrist key of a crate on each cell
+    player_keys: Tuple[int]                # The zobrist key of the player on each cell
+
+    # A frozen class with slots cannot be unpickled field by field, so it is rebuilt with its constructor
+    # (the layouts are sent to the spawned workers of the parallel searches, see parallel_search.py)
+    def __reduce__(self):
+        return (SokobanLayout, tuple(getattr(self, name) for name in SokobanLayout.__slots__))
+
+    @staticmethod
+    def create(width: int, height: int, walkable: FrozenSet[Point], goals: FrozenSet[Point]) -> 'SokobanLayout':
+        stride = width + 2
+        cells = stride * (height + 2)
+        walkable_bits = sum(1 << ((point.y + 1) * stride + point.x + 1) for point in walkable)
+        goal_bits = sum(1 << ((point.y + 1) * stride + point.x + 1) for point in goals)
+        moves = tuple((direction, direction.to_vector().y * stride + direction.to_vector().x) for direction in Direction)
+        dead_bits = walkable_bits & ~SokobanLayout.live_cells(walkable_bits, goal_bits, moves)
+        # The keys are drawn with a fixed seed, so the hash of a state is the same in every run (and every process)
+        rng = random.Random(cells)
+        crate_keys = tuple(rng.getrandbits(64) for _ in range(cells))
+        player_keys = tuple(rng.getrandbits(64) for _ in range(cells))
+        return SokobanLayout(width, height, walkable, goals, stride, walkable_bits, goal_bits, dead_bits, moves, crate_keys, player_keys)
+
+    # Return the bitmask of the cells from which a crate can be pushed to a goal (if there were no other crates).
+    # They are found by pulling a crate backward from every goal: a crate on the cell c can be pulled to c + offset
+    # if the player can stand on c + offset and step back to c + 2 * offset.
+    # Every other walkable cell is a "simple dead square": a crate that is pushed there can never reach a goal.
+    @staticmethod
+    def live_cells(walkable_bits: int, goal_bits: int, moves: Tuple[Tuple[Direction, int]]) -> int:
+        live_bits = goal_bits
+        frontier = list(iterate_bits(goal_bits))
+        while frontier:
+            cell = frontier.pop()
+            for _, offset in moves:
+                previous = cell + offset
+                if walkable_bits >> previous & 1 and walkable_bits >> (previous + offset) & 1 and not live_bits >> previous & 1:
+                    live_bits |= 1 << previous
+                    frontier.append(previous)
+        return live_bits
+
+    # The simple dead squares as points
+    @property
+    def dead_squares(self) -> FrozenSet[Point]:
+        return frozenset(self.point(cell) for cell in iterate_bits(self.dead_bits))
+
+    # Convert a point to a cell index and vice versa
+    def cell(self, point: Point) -> int:
+        return (point.y + 1) * self.stride + point.x + 1
+
+    def point(self, cell: int) -> Point:
+        y, x = divmod(cell, self.stride)
+        return Point(x - 1, y - 1)
 
-# For the sokoban state, we use dataclass with frozen=True to automatically implement:
-#   the constructor, the == operator, the hash function and to make the class immutable
-# Now it can be added to sets and used as keys in dictionaries
-# This will contain a reference to the sokoban layout and it will contain environment details that change across states such as:
-#   The player location and the locations of the crates 
-@dataclass(frozen=True)
+    # Return the bitmask of a set of points
+    def bits(self, points: Iterable[Point]) -> int:
+        return sum(1 << self.cell(point) for point in set(points))
+
+    # Return the zobrist hash of a set of crates given as a bitmask
+    def crate_hash(self, crate_bits: int) -> int:
+        value = 0
+        for cell in iterate_bits(crate_bits):
+            value ^= self.crate_keys[cell]
+        return value
+
+# Return the indices of the set bits in the given bitmask (from the lowest)
+def iterate_bits(bits: int) -> Iterable[int]:
+    while bits:
+        lowest = bits & -bits
+        yield lowest.bit_length() - 1
+        bits ^= lowest
+
+# The sokoban state contains a reference to the sokoban layout and the environment details that change across states:
+#   The player cell index and the bitmask of the crate cells
+# It also stores the zobrist hash of the crates (the XOR of the keys of the crate cells) which is updated in O(1)
+# when a crate is pushed, so hashing a state is O(1) instead of O(#crates).
+# We use dataclass with frozen=True to automatically implement the constructor and to make the class immutable.
+# The == operator and the hash function are implemented below, so it can be added to sets and used as keys in dictionaries.
+# For compatibility with the code that works with points (e.g. the heuristics), the "player" and "crates" properties
+# return the player as a Point and the crates as a frozenset of Points (which is only built once per state when needed).
+@dataclass(eq=False, frozen=True)
 class SokobanState:
-    __slots__ = ("layout", "player", "crates")
+    __slots__ = ("layout", "player_cell", "crate_bits", "crate_hash", "_crates")
     layout: SokobanLayout
-    player: Point
-    crates: FrozenSet[Point]
+    player_cell: int
+    crate_bits: int
+    crate_hash: int
+
+    # Create a state from the player position and the crate positions as points
+    @staticmethod
+    def from_points(layout: SokobanLayout, player: Point, crates: Iterable[Point]) -> 'SokobanState':
+        crate_bits = layout.bits(crates)
+        return SokobanState(layout, layout.cell(player), crate_bits, layout.crate_hash(crate_bits))
+
+    @property
+    def player(self) -> Point:
+        return self.layout.point(self.player_cell)
+
+    @property
+    def crates(self) -> FrozenSet[Point]:
+        try:
+            return self._crates
+        except AttributeError:
+            crates = frozenset(self.layout.point(cell) for cell in iterate_bits(self.crate_bits))
+            object.__setattr__(self, "_crates", crates)
+            return crates
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, SokobanState): return NotImplemented
+        return self.player_cell == other.player_cell and self.crate_bits == other.crate_bits and self.layout is other.layout
+
+    def __hash__(self) -> int:
+        return self.crate_hash ^ self.layout.player_keys[self.player_cell]
+
+    # The state can be pickled even though the crates are only cached on demand
+    def __getstate__(self):
+        return (self.layout, self.player_cell, self.crate_bits, self.crate_hash)
+
+    def __setstate__(self, values) -> None:
+        for name, value in zip(("layout", "player_cell", "crate_bits", "crate_hash"), values):
+            object.__setattr__(self, name, value)
 
     # This operator will convert the state to a string containing the grid representation of the level at the current state
     def __str__(self) -> str:
-        def position_to_str(position):
-            if position not in self.layout.walkable:
+        layout = self.layout
+        def cell_to_str(cell):
+            bit = 1 << cell
+            if not layout.walkable_bits & bit:
                 return SokobanTile.WALL
-            if position == self.player:
-                return SokobanTile.PLAYER_ON_GOAL if position in self.layout.goals else SokobanTile.PLAYER
-            if position in self.crates:
-                return SokobanTile.CRATE_ON_GOAL if position in self.layout.goals else SokobanTile.CRATE
-            if position in self.layout.goals:
+            if cell == self.player_cell:
+                return SokobanTile.PLAYER_ON_GOAL if layout.goal_bits & bit else SokobanTile.PLAYER
+            if self.crate_bits & bit:
+                return SokobanTile.CRATE_ON_GOAL if layout.goal_bits & bit else SokobanTile.CRATE
+            if layout.goal_bits & bit:
                 return SokobanTile.GOAL
             return SokobanTile.EMPTY
-        return '\n'.join(''.join(position_to_str(Point(x, y)) for x in range(self.layout.width)) for y in range(self.layout.height))
+        return '\n'.join(''.join(cell_to_str((y + 1) * layout.stride + x + 1) for x in range(layout.width)) for y in range(layout.height))
 
 # This is a list of all the possible actions for the sokoban agent
 AllSokobanActions = [
@@ -73,49 +192,108 @@ class SokobanProblem(Problem[SokobanState, Direction]):
     # The problem will contain the sokoban layout and the inital state
     layout: SokobanLayout
     initial_state: SokobanState
+    # Every action costs 1
+    integer_costs = True
+    # If True, the pushes that move a crate onto a dead square are not generated at all.
+    # This is disabled by default since it changes the number of explored nodes (which is checked by the autograder).
+    prune_dead_squares: bool = False
+    # If set to a DeadlockDetector (see sokoban_deadlock.py), the pushes that lead to a freeze or a corral deadlock
+    # are not generated either. It is not set by default for the same reason.
+    deadlock_detector = None
 
     def get_initial_state(self) -> SokobanState:
         return self.initial_state
 
     def is_goal(self, state: SokobanState) -> bool:
-        return self.layout.goals == state.crates
+        return self.layout.goal_bits == state.crate_bits
+
+    # A state refers to the layout, so only its cells are sent to other processes and the state is rebuilt
+    # on the layout of the receiving process (the states of different layout objects are never equal)
+    def pack_state(self, state: SokobanState) -> Tuple[int, int, int]:
+        return (state.player_cell, state.crate_bits, state.crate_hash)
+
+    def unpack_state(self, packed: Tuple[int, int, int]) -> SokobanState:
+        return SokobanState(self.layout, *packed)
+
+    # The crate bitmask followed by the player cell (in 16 bits), with enough bytes for a crate on every cell
+    def state_bytes(self, state: SokobanState) -> bytes:
+        size = (self.layout.stride * (self.layout.height + 2) + 16 + 7) // 8
+        return (state.crate_bits << 16 | state.player_cell).to_bytes(size, "little")
 
     # We use @track_call_count to track the number of times this function was called to count the number of explored nodes
     @track_call_count
     def get_actions(self, state: SokobanState) -> Iterable[Direction]:
         actions = []
-        for direction in Direction:
-            position = state.player + direction.to_vector()
+        walkable, crates = self.layout.walkable_bits, state.crate_bits
+        dead = self.layout.dead_bits if self.prune_dead_squares else 0
+        for direction, offset in self.layout.moves:
+            position = state.player_cell + offset
             # Disallow walking into walls
-            if position not in self.layout.walkable: continue
+            if not walkable >> position & 1: continue
             # Check if walking into a crate
-            if position in state.crates:
-                # make sure that the crate is not pushed into a wall or another crate
-                crate_position = position + direction.to_vector()
-                if crate_position not in self.layout.walkable or crate_position in state.crates:
+            if crates >> position & 1:
+                # make sure that the crate is not pushed into a wall or another crate (or a dead square if pruning)
+                crate_position = position + offset
+                if not walkable >> crate_position & 1 or crates >> crate_position & 1 or dead >> crate_position & 1:
                     continue
+                if self.deadlock_detector is not None:
+                    crate_keys = self.layout.crate_keys
+                    next_state = SokobanState(self.layout, position, crates ^ (1 << position) ^ (1 << crate_position),
+                                              state.crate_hash ^ crate_keys[position] ^ crate_keys[crate_position])
+                    if self.deadlock_detector.is_deadlock(next_state, crate_position): continue
             actions.append(direction)
         return actions
 
     def get_successor(self, state: SokobanState, action: Direction) -> SokobanState:
-        player = state.player + action.to_vector()
-        crates = state.crates
-        if player not in self.layout.walkable:
+        layout = self.layout
+        offset = layout.moves[action][1]
+        player = state.player_cell + offset
+        crates, crate_hash = state.crate_bits, state.crate_hash
+        if not layout.walkable_bits >> player & 1:
             # If we try to walk into a wall, then this action is wrong
             raise Exception(f"Invalid action {action} in state:" + "\n" + str(state))
-        if player in crates:
-            crate_position = player + action.to_vector()
-            if crate_position not in self.layout.walkable or crate_position in crates:
+        if crates >> player & 1:
+            crate_position = player + offset
+            if not layout.walkable_bits >> crate_position & 1 or crates >> crate_position & 1:
                 # If we try to push a crate into a wall or another crate, then this action is wrong
                 raise Exception(f"Invalid action {action} in state:" + "\n" + str(state))
             # If we walk to a crate, we push it
-            crates = crates.symmetric_difference({player,crate_position})
-        return SokobanState(state.layout, player, crates)
+            crates ^= (1 << player) | (1 << crate_position)
+            crate_hash ^= layout.crate_keys[player] ^ layout.crate_keys[crate_position]
+        return SokobanState(layout, player, crates, crate_hash)
 
     def get_cost(self, state: SokobanState, action: Direction) -> float:
         # All actions have the same cost
         return 1
 
+    # Return (action, next state, cost) for every possible action.
+    # This does the same checks as get_actions and get_successor but only once per direction.
+    # It is counted as a call to get_actions, so the number of explored nodes is still tracked.
+    @tracked_as("get_actions")
+    def get_successors(self, state: SokobanState) -> List[Tuple[Direction, SokobanState, float]]:
+        successors = []
+        layout = self.layout
+        walkable, crates, crate_keys = layout.walkable_bits, state.crate_bits, layout.crate_keys
+        dead = layout.dead_bits if self.prune_dead_squares else 0
+        for direction, offset in layout.moves:
+            player = state.player_cell + offset
+            # Disallow walking into walls
+            if not walkable >> player & 1: continue
+            # Check if walking into a crate
+            if crates >> player & 1:
+                # make sure that the crate is not pushed into a wall or another crate (or a dead square if pruning)
+                crate_position = player + offset
+                if not walkable >> crate_position & 1 or crates >> crate_position & 1 or dead >> crate_position & 1:
+                    continue
+                next_state = SokobanState(layout, player, crates ^ (1 << player) ^ (1 << crate_position),
+                                          state.crate_hash ^ crate_keys[player] ^ crate_keys[crate_position])
+                if self.deadlock_detector is not None and self.deadlock_detector.is_deadlock(next_state, crate_position):
+                    continue
+            else:
+                next_state = SokobanState(layout, player, crates, state.crate_hash)
+            successors.append((direction, next_state, 1))
+        return successors
+
     # Read a sokoban problem from text containing a grid of tiles
     @staticmethod
     def from_text(text: str) -> 'SokobanProblem':
@@ -140,8 +318,8 @@ class SokobanProblem(Problem[SokobanState, Direction]):
                         crates.add(Point(x, y))
                         goals.add(Point(x, y))
         problem = SokobanProblem()
-        problem.layout = SokobanLayout(width, height, frozenset(walkable), frozenset(goals))
-        problem.initial_state = SokobanState(problem.layout, player, frozenset(crates))
+        problem.layout = SokobanLayout.create(width, height, frozenset(walkable), frozenset(goals))
+        problem.initial_state = SokobanState.from_points(problem.layout, player, crates)
         return problem
 
     # Read a sokoban problem from file containing a grid of tiles
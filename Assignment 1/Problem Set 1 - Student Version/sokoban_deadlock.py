@@ -0,0 +1,172 @@
+from collections import deque
+from typing import Dict, Set
+
+from sokoban import SokobanLayout, SokobanProblem, SokobanState, iterate_bits
+from sokoban_push import reachable_bits
+from helpers.utils import BoundedCache
+
+# This file implements the detection of two kinds of sokoban deadlocks (states from which the goal can never be reached)
+# that are not found by looking at a single crate:
+#   - Freeze deadlocks: a crate is frozen if it can never move again. A crate cannot move horizontally if there is a wall
+#     on its left or on its right, if both cells are dead squares, or if one of them has a crate that is itself frozen.
+#     The same goes for the vertical axis, and a crate is frozen if it cannot move along both axes.
+#     A frozen crate that is not on a goal is a deadlock.
+#   - Corral deadlocks: a corral is an area that the player cannot reach because it is closed by crates.
+#     Removing crates never makes a level harder, so we keep only the crates around and inside the corral, and run
+#     a small push-level search on them. If every push sequence fails to put them all on goals, the state is a deadlock.
+#     The search is given up after a few nodes (and the state is then assumed to be solvable), so the check is cheap.
+# Both checks only look at the crate that was just pushed (and the crates around it), and their results are memoized
+# by the local crate pattern that they depend on, so the same pattern is never analyzed twice.
+
+# The maximum number of states expanded by the search of a corral
+CORRAL_NODE_LIMIT = 128
+# The maximum number of crates kept in the search of a corral (the corrals with more crates are not checked)
+CORRAL_CRATE_LIMIT = 6
+# The maximum number of results kept in each memo (the least recently used ones are dropped first)
+MEMO_SIZE = 2**16
+# The name of the problem cache where freeze_detector stores the detector of the level
+DEADLOCK_CACHE = "deadlock"
+
+# DeadlockDetector checks the states of a layout for freeze and corral deadlocks.
+# It is used by SokobanProblem and PushSokobanProblem (when it is set as their "deadlock_detector")
+# to skip the pushes that lead to a deadlock. It counts how many pushes were pruned by each check.
+class DeadlockDetector:
+    def __init__(self, layout: SokobanLayout, corrals: bool = True) -> None:
+        self.layout = layout
+        self.corrals = corrals
+        self.freeze_memo = BoundedCache(MEMO_SIZE) # (crate, crate cluster) -> is it a freeze deadlock
+        self.corral_memo = BoundedCache(MEMO_SIZE) # (player cell, crates of the corral) -> is it a corral deadlock
+        self.pruned: Dict[str, int] = {"freeze": 0, "corral": 0}
+
+    # Return True if the state is a deadlock because of the crate that was just pushed to the given cell
+    def is_deadlock(self, state: SokobanState, crate: int) -> bool:
+        if self.is_frozen(state.crate_bits, crate):
+            self.pruned["freeze"] += 1
+            return True
+        if self.corrals and self.is_corral_deadlock(state, crate):
+            self.pruned["corral"] += 1
+            return True
+        return False
+
+    # The total number of pruned pushes
+    @property
+    def total_pruned(self) -> int:
+        return sum(self.pruned.values())
+
+    # Return True if the crate on the given cell is part of a group of frozen crates where at least one is not on a goal.
+    # Whether a crate is frozen only depends on the crates that are connected to it (through neighboring crates),
+    # so the result is memoized by the crate and the bitmask of its cluster.
+    def is_frozen(self, crates: int, crate: int) -> bool:
+        key = (crate, self._cluster(crates, crate))
+        result = self.freeze_memo.get(key)
+        if result is None:
+            frozen: Set[int] = set()
+            result = self._frozen(crates, crate, 0, frozen) and any(not self.layout.goal_bits >> cell & 1 for cell in frozen)
+            self.freeze_memo[key] = result
+        return result
+
+    # Return the bitmask of the crates that are connected to the given crate through neighboring crates
+    def _cluster(self, crates: int, crate: int) -> int:
+        cluster, frontier = 1 << crate, [crate]
+        while frontier:
+            cell = frontier.pop()
+            for _, offset in self.layout.moves:
+                neighbor = cell + offset
+                if crates >> neighbor & 1 and not cluster >> neighbor & 1:
+                    cluster |= 1 << neighbor
+                    frontier.append(neighbor)
+        return cluster
+
+    # Return True if the crate on the cell can never move. The crates in "walls" are treated as walls
+    # (they are the crates whose frozen status is being checked, which avoids infinite recursion).
+    # The crates that are found to be frozen are added to "frozen".
+    def _frozen(self, crates: int, cell: int, walls: int, frozen: Set[int]) -> bool:
+        layout = self.layout
+        walls |= 1 << cell
+        for offset in (1, layout.stride): # The horizontal then the vertical axis
+            before, after = cell - offset, cell + offset
+            blocked = (not layout.walkable_bits >> before & 1 or walls >> before & 1
+                       or not layout.walkable_bits >> after & 1 or walls >> after & 1)
+            if not blocked:
+                blocked = layout.dead_bits >> before & 1 and layout.dead_bits >> after & 1
+            if not blocked:
+                blocked = any(crates >> neighbor & 1 and self._frozen(crates, neighbor, walls, frozen) for neighbor in (before, after))
+            if not blocked:
+                return False
+        frozen.add(cell)
+        return True
+
+    # Return True if the crate that was just pushed to the given cell closed a corral that can never be solved.
+    # The corrals are the areas next to the crate that the player cannot reach. For each one, only the crates that touch
+    # it are kept and a push-level BFS checks if they can be put on goals. Since the other crates were removed,
+    # a failure of the search proves that the state is a deadlock.
+    def is_corral_deadlock(self, state: SokobanState, crate: int) -> bool:
+        layout = self.layout
+        crates = state.crate_bits
+        free = layout.walkable_bits & ~crates
+        reachable = reachable_bits(layout, state.player_cell, crates)
+        checked = reachable
+        for _, offset in layout.moves:
+            start = crate + offset
+            if not free >> start & 1 or checked >> start & 1: continue
+            corral = reachable_bits(layout, start, crates)
+            checked |= corral
+            # The crates of the corral are the ones that touch it
+            corral_crates = 0
+            for cell in iterate_bits(corral):
+                for _, neighbor_offset in layout.moves:
+                    if crates >> (cell + neighbor_offset) & 1:
+                        corral_crates |= 1 << (cell + neighbor_offset)
+            if corral_crates & ~layout.goal_bits == 0 and corral & layout.goal_bits == 0:
+                continue # Every crate is already on a goal and there is no empty goal inside
+            if bin(corral_crates).count("1") > CORRAL_CRATE_LIMIT:
+                continue
+            player = reachable_bits(layout, state.player_cell, corral_crates)
+            key = ((player & -player).bit_length() - 1, corral_crates)
+            result = self.corral_memo.get(key)
+            if result is None:
+                result = not self._solvable(key[0], corral_crates)
+                self.corral_memo[key] = result
+            if result:
+                return True
+        return False
+
+    # Run a push-level BFS on the given crates and return True if they can all be put on goals
+    # or if the search reaches the node limit (so it is never wrong when it returns False).
+    def _solvable(self, player: int, crates: int) -> bool:
+        layout = self.layout
+        goals, dead, walkable = layout.goal_bits, layout.dead_bits, layout.walkable_bits
+        if crates & ~goals == 0:
+            return True
+        visited = {(player, crates)}
+        queue = deque(visited)
+        while queue:
+            if len(visited) > CORRAL_NODE_LIMIT:
+                return True
+            player, crates = queue.popleft()
+            region = reachable_bits(layout, player, crates)
+            for crate in iterate_bits(crates):
+                for _, offset in layout.moves:
+                    target = crate + offset
+                    if not region >> (crate - offset) & 1 or not walkable >> target & 1 or (crates | dead) >> target & 1:
+                        continue
+                    next_crates = crates ^ (1 << crate) ^ (1 << target)
+                    if next_crates & ~goals == 0:
+                        return True
+                    if self.is_frozen(next_crates, target):
+                        continue
+                    next_region = reachable_bits(layout, crate, next_crates)
+                    next_state = ((next_region & -next_region).bit_length() - 1, next_crates)
+                    if next_state not in visited:
+                        visited.add(next_state)
+                        queue.append(next_state)
+        return False
+
+# Return the freeze detector of the problem's level (without the corral checks, since they depend on the player).
+# It is kept in the problem cache so that the heuristics share it and its memo lasts for the whole search.
+def freeze_detector(problem: SokobanProblem) -> DeadlockDetector:
+    cache = problem.cache(DEADLOCK_CACHE)
+    detector = cache.get("freeze")
+    if detector is None:
+        detector = cache["freeze"] = DeadlockDetector(problem.layout, corrals=False)
+    return detector
@@ -1,6 +1,8 @@
 from sokoban import SokobanProblem, SokobanState
 from mathutils import Direction, Point, manhattan_distance
 from helpers.utils import NotImplemented
+from sokoban_deadlock import freeze_detector
+from sokoban_matching import UNREACHABLE, crate_matching
 
 # This heuristic returns the distance between the player and the nearest crate as an estimate for the path cost
 # While it is consistent, it does a bad job at estimating the actual cost thus the search will explore a lot of nodes before finding a goal
@@ -9,6 +11,9 @@ def weak_heuristic(problem: SokobanProblem, state: SokobanState):
 
 #TODO: Import any modules and write any functions you want to use
 
+# The name of the problem cache where strong_heuristic stores its values
+HEURISTIC_CACHE = "heuristic"
+
 def strong_heuristic(problem: SokobanProblem, state: SokobanState) -> float:
     #TODO: ADD YOUR CODE HERE
     #IMPORTANT: DO NOT USE "problem.get_actions" HERE.
@@ -18,37 +23,40 @@ def strong_heuristic(problem: SokobanProblem, state: SokobanState) -> float:
     # This could be useful if you want to store the results heavy computations that can be cached and used across multiple calls of this function
     # NotImplemented()
 
-    # Use the problem.cache() dictionary to store information between calls
-    cache = problem.cache()
+    # Use the "heuristic" cache of the problem to store the values between calls
+    # (it is unbounded unless it is configured, e.g. by play_sokoban.py)
+    cache = problem.cache(HEURISTIC_CACHE)
     
     # Check if the heuristic values are already cached for the current state
-    if state in cache:
-        return cache[state] # returns the cached value to avoid recomputing.
+    cached = cache.get(state)
+    if cached is not None:
+        return cached # returns the cached value to avoid recomputing.
 
     if problem.is_goal(state):
         return 0.0 # if state is goal state
 
-    # Calculate the Manhattan distance from each crate to its nearest goal
-    heuristic_value = 0
-    for crate in state.crates:
-
-        # Check if crate is a goal
-        if crate in state.layout.goals:
-            continue
+    # A crate on a dead square can never reach a goal (the dead squares are precomputed once per level in the layout),
+    # and the goal can never be reached if the number of crates is not the number of goals
+    if (state.crate_bits & problem.layout.dead_bits
+            or bin(state.crate_bits).count("1") != bin(problem.layout.goal_bits).count("1")):
+        cache[state] = float('inf')
+        return float('inf')
 
-        # Check if there is a deadlock
-        if is_deadlock(problem, state, crate):
+    # Check if a crate that is not on a goal is frozen
+    for crate in state.crates:
+        if crate not in state.layout.goals and is_deadlock(problem, state, crate):
             cache[state] = float('inf')
             return float('inf')
-        
-        min_distance = float('inf')
-        for goal in problem.layout.goals:
-            # Calculate the Manhattan distance between the current crate and goal
-            distance = manhattan_distance(goal, crate)
-            # Updates the minimum distance if the current distance is smaller.
-            min_distance = min(min_distance, distance)
-        # Adds the minimum distance for the current crate to the total heuristic value.
-        heuristic_value += min_distance
+
+    # Every crate needs its own goal, so the minimum cost matching between the crates and the goals
+    # (where the cost is the number of pushes, see sokoban_matching.py) is a lower bound on the number of pushes
+    heuristic_value = crate_matching(problem, state).cost
+    if heuristic_value >= UNREACHABLE:
+        cache[state] = float('inf')
+        return float('inf')
+
+    # The player must also walk next to a crate before pushing it
+    heuristic_value += min(manhattan_distance(state.player, crate) for crate in state.crates) - 1
 
     #  Stores the calculated heuristic value for the current state in the cache.
     cache[state] = heuristic_value
@@ -56,9 +64,13 @@ def strong_heuristic(problem: SokobanProblem, state: SokobanState) -> float:
     # Return the calculated heuristic value
     return heuristic_value
 
-def is_deadlock(problem: SokobanProblem, state: SokobanState, crate: Point) -> float:
+def is_deadlock(problem: SokobanProblem, state: SokobanState, crate: Point) -> bool:
     """
     Checks if the given crate position leads to a deadlock in the Sokoban game.
+    The crates on dead squares (which include the corners and the walls without goals) are already detected
+    by the heuristic using the dead squares of the layout, so this only checks the freeze deadlocks: the crate can never
+    move again because it is blocked along both axes by walls, dead squares or other frozen crates (see sokoban_deadlock.py),
+    and one of the frozen crates is not on a goal. This never flags a state that can be solved, so the heuristic stays admissible.
 
     Parameters:
     - problem (SokobanProblem): The Sokoban problem instance.
@@ -68,115 +80,4 @@ def is_deadlock(problem: SokobanProblem, state: SokobanState, crate: Point) -> f
     Returns:
     - bool: True if the crate position leads to a deadlock, False otherwise.
     """
-    
-    # Check corner condition
-    def is_corner():
-        """
-        Checks if the crate is in a corner, where it has no available moves.
-
-        Returns:
-        - bool: True if the crate is in a corner, False otherwise.
-        """
-        
-        if (
-            (Point(crate.x - 1, crate.y) not in state.layout.walkable and Point(crate.x, crate.y - 1) not in state.layout.walkable) or 
-            (Point(crate.x - 1, crate.y) not in state.layout.walkable and Point(crate.x, crate.y + 1) not in state.layout.walkable) or
-            (Point(crate.x + 1, crate.y) not in state.layout.walkable and Point(crate.x, crate.y - 1) not in state.layout.walkable) or
-            (Point(crate.x + 1, crate.y) not in state.layout.walkable and Point(crate.x, crate.y + 1) not in state.layout.walkable)
-            ):
-            return True
-        
-    # Check conditions for unsolvable positions
-    def is_unsolvable_position():
-        """
-        Checks if the crate is in an unsolvable position, based on specific conditions.
-
-        Returns:
-        - bool: True if the crate is in an unsolvable position, False otherwise.
-        """
-        
-        condition1 = (
-            (crate.x == problem.layout.width - 2 and len([goal for goal in problem.layout.goals if goal.x == problem.layout.width - 2]) == 0)
-            or (crate.x == 1 and len([goal for goal in problem.layout.goals if goal.x == 1]) == 0)
-            or (crate.y == problem.layout.height - 2 and len([goal for goal in problem.layout.goals if goal.y == problem.layout.height - 2]) == 0)
-            or (crate.y == 1 and len([goal for goal in problem.layout.goals if goal.y == 1]) == 0)
-        )
-        
-        condition2 = (
-            (Point(crate.x - 1, crate.y) in state.crates and (crate.x - 2 == 0 or crate.x + 2 == state.layout.width))
-            or (Point(crate.x + 1, crate.y) in state.crates and (crate.x - 1 == 0 or crate.x + 3 == state.layout.width))
-            or (Point(crate.x, crate.y - 1) in state.crates and (crate.y - 2 == 0 or crate.y + 2 == state.layout.height))
-            or (Point(crate.x, crate.y + 1) in state.crates and (crate.y - 1 == 0 or crate.y + 3 == state.layout.height) or ())
-        )
-
-        return condition1 or condition2    
-       
-    # Checks if the first wall (to the left) is blocking the crate.
-    def check_left_wall() -> int:
-        """
-        Checks if the first wall (to the left) is blocking the crate.
-
-        Returns:
-        - int: 1 if the wall blocks the crate, 0 otherwise.
-        """
-        if (Point(crate.x - 1, crate.y) not in state.layout.walkable or 
-            Point(crate.x - 1, crate.y) in state.crates or 
-            crate.x - 1 == 0):
-            return 1
-        return 0
-
-    # Checks if the second wall (to the right) is blocking the crate.
-    def check_right_wall() -> int:
-        """
-        Checks if the second wall (to the right) is blocking the crate.
-
-        Returns:
-        - int: 1 if the wall blocks the crate, 0 otherwise.
-        """
-        if (Point(crate.x + 1, crate.y) not in state.layout.walkable or 
-            Point(crate.x + 1, crate.y) in state.crates or 
-            crate.x + 1 == state.layout.width - 1):
-            return 1
-        return 0
-
-    # Checks if the third wall (above) is blocking the crate.
-    def check_above_wall() -> int:
-        """
-        Checks if the third wall (above) is blocking the crate.
-
-        Returns:
-        - int: 1 if the wall blocks the crate, 0 otherwise.
-        """
-        if (Point(crate.x, crate.y + 1) not in state.layout.walkable or 
-            Point(crate.x, crate.y + 1) in state.crates or 
-            crate.y - 1 == 0):
-            return 1
-        return 0
-
-    # Checks if the fourth wall (below) is blocking the crate.
-    def check_below_walls() -> int:
-        """
-        Checks if the fourth wall (below) is blocking the crate.
-
-        Returns:
-        - int: 1 if the wall blocks the crate, 0 otherwise.
-        """
-        if (Point(crate.x, crate.y - 1) not in state.layout.walkable or 
-            Point(crate.x, crate.y - 1) in state.crates or 
-            crate.y + 1 == state.layout.height - 1):
-            return 1
-        return 0
-
-    # Checks if the crate is blocked by three or more walls in any direction.
-    def check_all_walls() -> bool:
-        """
-        Checks if the crate is blocked by three or more walls in any direction.
-
-        Returns:
-        - bool: True if the crate is blocked by three or more walls, False otherwise.
-        """
-        return (check_left_wall() + check_right_wall() + check_above_wall() + check_below_walls()) >= 3
-
-    if is_corner() or is_unsolvable_position() or check_all_walls():
-        return True # The crate position leads to a deadlock
-    return False
+    return freeze_detector(problem).is_frozen(state.crate_bits, problem.layout.cell(crate))
@@ -0,0 +1,165 @@
+from collections import deque
+from typing import List, Optional, Tuple
+
+from sokoban import SokobanLayout, SokobanProblem, SokobanState, iterate_bits
+from sokoban_deadlock import freeze_detector
+
+# This file implements a sokoban heuristic based on a minimum cost matching between the crates and the goals.
+# The cost of matching a crate to a goal is the number of pushes needed to move the crate to the goal if there were no
+# other crates (the push distance, which is precomputed once per level). Every crate needs its own goal, so the cost of
+# the best matching (found by the Hungarian algorithm) is a lower bound on the number of pushes, and thus on the number
+# of steps, needed to solve the level. Unlike the sum of the distances to the nearest goals, two crates cannot share a goal.
+# A push moves a single crate, so the matching of a state is computed from the matching of its parent
+# (which differs by one crate) by removing the row of the moved crate and running a single augmenting path
+# for its new cell, which takes O(n^2) instead of O(n^3) for n crates.
+
+# A push distance that is at least this big means that the crate can never reach the goal
+UNREACHABLE = 10**6
+# The maximum number of matchings kept in the cache of a problem (the least recently used ones are dropped first)
+MATCHING_CACHE_SIZE = 2**16
+
+# Return push_distances[cell][g] which is the number of pushes needed to move a crate from the cell to the g-th goal
+# (in the order of iterate_bits) or UNREACHABLE. They are found by pulling a crate backward from each goal
+# (like SokobanLayout.live_cells) where the player can always walk to the cell it needs (so they are lower bounds).
+def compute_push_distances(layout: SokobanLayout) -> List[Tuple[int, ...]]:
+    walkable = layout.walkable_bits
+    cells = layout.stride * (layout.height + 2)
+    columns = []
+    for goal in iterate_bits(layout.goal_bits):
+        distances = [UNREACHABLE] * cells
+        distances[goal] = 0
+        queue = deque([goal])
+        while queue:
+            cell = queue.popleft()
+            for _, offset in layout.moves:
+                previous = cell + offset
+                if walkable >> previous & 1 and walkable >> (previous + offset) & 1 and distances[previous] == UNREACHABLE:
+                    distances[previous] = distances[cell] + 1
+                    queue.append(previous)
+        columns.append(distances)
+    return [tuple(column[cell] for column in columns) for cell in range(cells)]
+
+# The optimal matching of a set of crates to the goals and the dual variables (potentials) of the Hungarian algorithm.
+# Row i is the crate on cells[i] and column j is the j-th goal. matched[j] is the row matched to the column j
+# (or -1 if the column is free) and the last entry of matched and v belongs to a dummy column used while augmenting.
+# "blocked" caches whether a crate of this set is in a deadlock (it is computed on demand by matching_heuristic).
+class CrateMatching:
+    __slots__ = ("cells", "u", "v", "matched", "cost", "blocked")
+
+    def __init__(self, cells: List[int], u: List[int], v: List[int], matched: List[int]) -> None:
+        self.cells = cells
+        self.u, self.v, self.matched = u, v, matched
+        self.cost = 0
+        self.blocked: Optional[bool] = None
+
+    # Compute the optimal matching from scratch by adding the crates one by one
+    @staticmethod
+    def solve(push_distances: List[Tuple[int, ...]], cells: List[int]) -> 'CrateMatching':
+        size = len(cells)
+        matching = CrateMatching(list(cells), [0] * size, [0] * (size + 1), [-1] * (size + 1))
+        for row in range(size):
+            matching._augment(push_distances, row)
+        matching._update_cost(push_distances)
+        return matching
+
+    # Return the optimal matching after moving the crate on the cell "source" to the cell "target".
+    # The potentials stay feasible for all the other rows, so only the row of the moved crate has to be matched again.
+    def move(self, push_distances: List[Tuple[int, ...]], source: int, target: int) -> 'CrateMatching':
+        row = self.cells.index(source)
+        matching = CrateMatching(list(self.cells), list(self.u), list(self.v), list(self.matched))
+        matching.cells[row] = target
+        matching.matched[matching.matched.index(row)] = -1
+        matching.u[row] = 0
+        matching._augment(push_distances, row)
+        matching._update_cost(push_distances)
+        return matching
+
+    # Match the given row using the shortest augmenting path on the reduced costs (one phase of the Hungarian algorithm)
+    def _augment(self, push_distances: List[Tuple[int, ...]], row: int) -> None:
+        u, v, matched, cells = self.u, self.v, self.matched, self.cells
+        size = len(cells)
+        infinity = float('inf')
+        matched[size] = row
+        column = size # Start from the dummy column which is matched to the new row
+        lowest = [infinity] * (size + 1) # The lowest reduced cost to reach each column
+        previous = [size] * (size + 1) # The column before each column on the augmenting path
+        used = [False] * (size + 1)
+        while True:
+            used[column] = True
+            current_row = matched[column]
+            costs, row_potential = push_distances[cells[current_row]], u[current_row]
+            delta, next_column = infinity, -1
+            for j in range(size):
+                if used[j]: continue
+                reduced = costs[j] - row_potential - v[j]
+                if reduced < lowest[j]:
+                    lowest[j], previous[j] = reduced, column
+                if lowest[j] < delta:
+                    delta, next_column = lowest[j], j
+            for j in range(size + 1):
+                if used[j]:
+                    u[matched[j]] += delta
+                    v[j] -= delta
+                else:
+                    lowest[j] -= delta
+            column = next_column
+            if matched[column] == -1: break
+        # Flip the matched edges along the augmenting path
+        while column != size:
+            previous_column = previous[column]
+            matched[column] = matched[previous_column]
+            column = previous_column
+        v[size] = 0
+
+    def _update_cost(self, push_distances: List[Tuple[int, ...]]) -> None:
+        self.cost = sum(push_distances[self.cells[self.matched[j]]][j] for j in range(len(self.cells)))
+
+# Return the optimal matching of the crates of the given state.
+# The matchings are cached (in the bounded LRU cache "matchings" of the problem) by the crate bitmask since they do not depend on the player.
+# If the matching of a state that differs by a single crate is in the cache, it is updated incrementally.
+def crate_matching(problem: SokobanProblem, state: SokobanState) -> CrateMatching:
+    cache = problem.cache()
+    push_distances = cache.get("push_distances")
+    if push_distances is None:
+        push_distances = cache["push_distances"] = compute_push_distances(problem.layout)
+    matchings = problem.cache("matchings", MATCHING_CACHE_SIZE)
+    crates = state.crate_bits
+    matching = matchings.get(crates)
+    if matching is not None:
+        return matching
+    # Look for a parent: a state where one of the crates was one push behind its current cell
+    layout = problem.layout
+    free = layout.walkable_bits & ~crates
+    for cell in iterate_bits(crates):
+        for _, offset in layout.moves:
+            source = cell - offset
+            if not free >> source & 1: continue
+            parent = matchings.get(crates ^ (1 << cell) ^ (1 << source))
+            if parent is not None:
+                matching = parent.move(push_distances, source, cell)
+                break
+        if matching is not None: break
+    if matching is None:
+        matching = CrateMatching.solve(push_distances, list(iterate_bits(crates)))
+    matchings[crates] = matching
+    return matching
+
+# The matching heuristic. It can be used with the step-level SokobanProblem and the push-level PushSokobanProblem
+# (see sokoban_push.py), since it only needs "layout" and "cache" from the problem.
+# It returns infinity if the crates cannot all reach different goals (which includes a crate on a dead square)
+# or if a crate that is not on a goal is frozen (see DeadlockDetector.is_frozen in sokoban_deadlock.py).
+# These conditions never hold for a state that can be solved, so the heuristic is admissible.
+def matching_heuristic(problem: SokobanProblem, state: SokobanState) -> float:
+    layout = problem.layout
+    if state.crate_bits == layout.goal_bits:
+        return 0
+    if state.crate_bits & layout.dead_bits or bin(state.crate_bits).count("1") != bin(layout.goal_bits).count("1"):
+        return float('inf')
+    matching = crate_matching(problem, state)
+    if matching.cost >= UNREACHABLE:
+        return float('inf')
+    # The deadlocks only depend on the crates, so they are checked once for all the states with the same crates
+    if matching.blocked is None:
+        detector = freeze_detector(problem)
+        matching.blocked = any(detector.is_frozen(state.crate_bits, cell) for cell in iterate_bits(state.crate_bits & ~layout.goal_bits))
+    return float('inf') if matching.blocked else matching.cost
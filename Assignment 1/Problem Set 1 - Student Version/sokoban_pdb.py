@@ -0,0 +1,207 @@
+from collections import deque
+from itertools import combinations
+from math import comb
+from typing import Dict, List, Optional, Sequence, Tuple
+import hashlib, mmap, os, struct, sys
+
+from problem import HeuristicFunction
+from sokoban import SokobanLayout, SokobanProblem, SokobanState, iterate_bits
+
+# This file implements pattern database (PDB) heuristics for sokoban.
+# A pattern is a subset of k crates where the other crates and the player are ignored. The abstract state is the set
+# of cells of the k crates, and a crate can be pushed whenever the cell in front of it and the cell behind it (where the
+# player stands) are walkable and do not contain another crate of the pattern. The abstract goal is any k different goals.
+# Every push of the real problem is also a push of the abstract problem, so the number of pushes needed to solve the
+# abstract problem is a lower bound on the number of pushes (and steps) needed to move the k crates to goals.
+# The database stores this number for every abstract state. It is computed once for a layout by a retrograde BFS
+# which pulls the crates backward from every abstract goal state, then it is saved to disk so later runs just load it.
+# Since the crates are identical, the same database is used for every subset of k crates of a state:
+#   - "additive": a push only moves a single crate, so the values of disjoint groups of crates can be added.
+#                 The crates are split into groups of k (the last group may be smaller) and the best split is used.
+#   - "max": the largest value over all the subsets of k crates.
+
+# The value stored for the abstract states that cannot reach a goal (the values are stored in a byte each)
+UNSOLVABLE = 255
+# The directory where the databases are saved (it can be changed by setting the SOKOBAN_PDB_DIR environment variable)
+DEFAULT_DIRECTORY = os.environ.get("SOKOBAN_PDB_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".pdb_cache"))
+# The maximum number of heuristic values (by crate bitmask) kept in the cache of a problem
+VALUE_CACHE_SIZE = 2**16
+
+# The layout of a database file (all the numbers are little-endian):
+#   header: magic (4 bytes), version (uint32), pattern size k (uint32), number of cells L (uint32), number of entries (int64)
+#   cells (L x int32): the cells that a crate can occupy (the cells that are not dead squares)
+#   values (entries x uint8): the value of each abstract state at the index given by PatternDatabase.rank
+MAGIC = b"SPDB"
+VERSION = 1
+_HEADER = struct.Struct("<4sIIIq")
+
+# Return a hash that identifies a layout (the walls and the goals) so that its databases can be found on disk
+def layout_key(layout: SokobanLayout) -> str:
+    text = f"{layout.width}x{layout.height}:{layout.walkable_bits:x}:{layout.goal_bits:x}"
+    return hashlib.sha1(text.encode("ascii")).hexdigest()
+
+# PatternDatabase holds the values of all the abstract states of k crates on a layout.
+# A set of k cells is stored at the index given by the combinatorial number system: if the indices of the cells
+# in the "cells" list are i_1 < i_2 < ... < i_k, the rank is C(i_1, 1) + C(i_2, 2) + ... + C(i_k, k).
+# This maps the C(L, k) sets to 0 ... C(L, k) - 1 without gaps, so the values are stored in a flat byte array.
+class PatternDatabase:
+    def __init__(self, size: int, cells: Sequence[int], values: Sequence[int]) -> None:
+        self.size = size
+        self.cells = cells
+        self.values = values # A bytearray or a memoryview on a memory-mapped file
+        self.index: Dict[int, int] = {cell: index for index, cell in enumerate(cells)}
+        # binomials[i][j] = C(i, j) for the ranks
+        self.binomials = [[comb(i, j) for j in range(size + 1)] for i in range(len(cells) + 1)]
+
+    # Return the rank of a set of cell indices (which must be sorted)
+    def rank(self, indices: Sequence[int]) -> int:
+        binomials = self.binomials
+        return sum(binomials[index][position + 1] for position, index in enumerate(indices))
+
+    # Return the value (a lower bound on the number of pushes) of the given crate cells (which must not be dead squares)
+    def lookup(self, crates: Sequence[int]) -> int:
+        return self.values[self.rank(sorted(self.index[cell] for cell in crates))]
+
+    # Build the database of the layout for the given number of crates using a retrograde BFS from all the goal states.
+    # In the backward direction, the crate on the cell c is pulled to c + offset by a player that moves from c + offset
+    # to c + 2 * offset, so both cells must be walkable and free of the other crates of the pattern.
+    @staticmethod
+    def build(layout: SokobanLayout, size: int) -> 'PatternDatabase':
+        cells = list(iterate_bits(layout.walkable_bits & ~layout.dead_bits))
+        values = bytearray([UNSOLVABLE]) * comb(len(cells), size)
+        database = PatternDatabase(size, cells, values)
+        index, walkable = database.index, layout.walkable_bits
+        queue = deque()
+        for goals in combinations(iterate_bits(layout.goal_bits), size):
+            values[database.rank([index[goal] for goal in goals])] = 0
+            queue.append(goals)
+        while queue:
+            crates = queue.popleft()
+            value = values[database.rank([index[cell] for cell in crates])] + 1
+            occupied = 0
+            for cell in crates:
+                occupied |= 1 << cell
+            free = walkable & ~occupied
+            for cell in crates:
+                for _, offset in layout.moves:
+                    target = cell + offset
+                    if not free >> target & 1 or not free >> (target + offset) & 1: continue
+                    next_crates = tuple(sorted(target if crate == cell else crate for crate in crates))
+                    rank = database.rank([index[crate] for crate in next_crates])
+                    if values[rank] == UNSOLVABLE:
+                        values[rank] = min(value, UNSOLVABLE - 1)
+                        queue.append(next_crates)
+        return database
+
+    # Write the database to a binary file (to a temporary file first, so an interrupted write never leaves a broken file)
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        cells = struct.pack(f"<{len(self.cells)}i", *self.cells)
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as file:
+            file.write(_HEADER.pack(MAGIC, VERSION, self.size, len(self.cells), len(self.values)))
+            file.write(cells)
+            file.write(bytes(self.values))
+        os.replace(temporary, path)
+
+    # Read a database from a binary file. The values are a memoryview on the memory-mapped file,
+    # so loading is almost instant and only the pages that are used are read from the disk.
+    # Returns None if the file is not a valid database for the given number of crates.
+    @staticmethod
+    def load(path: str, size: int) -> Optional['PatternDatabase']:
+        with open(path, "rb") as file:
+            if os.fstat(file.fileno()).st_size < _HEADER.size:
+                return None
+            buffer = memoryview(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))
+        magic, version, stored_size, cell_count, entries = _HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC or version != VERSION or stored_size != size or len(buffer) != _HEADER.size + 4 * cell_count + entries:
+            return None
+        cells = list(struct.unpack_from(f"<{cell_count}i", buffer, _HEADER.size))
+        return PatternDatabase(size, cells, buffer[_HEADER.size + 4 * cell_count:])
+
+# The databases that were built or loaded in this process (by layout key and pattern size)
+_databases: Dict[Tuple[str, int], PatternDatabase] = {}
+
+# Return the database of the layout for the given number of crates.
+# It is loaded from the directory if it was saved before; otherwise it is built and saved there.
+# If directory is None, the database is only kept in memory.
+def pattern_database(layout: SokobanLayout, size: int, directory: Optional[str] = DEFAULT_DIRECTORY) -> PatternDatabase:
+    key = layout_key(layout)
+    database = _databases.get((key, size))
+    if database is not None:
+        return database
+    path = None if directory is None else os.path.join(directory, f"{key}-{size}.pdb")
+    if path is not None and os.path.exists(path):
+        database = PatternDatabase.load(path, size)
+    if database is None:
+        database = PatternDatabase.build(layout, size)
+        if path is not None:
+            try:
+                database.save(path)
+            except OSError as error:
+                print(f"Could not save the pattern database to {path}: {error}", file=sys.stderr)
+    _databases[(key, size)] = database
+    return database
+
+# Return the best sum of database values over all the ways to split the crates into groups of "size" crates
+# (except one smaller group if the number of crates is not a multiple of "size"), or infinity if a group is unsolvable.
+# The groups are formed recursively around the first remaining crate, so every split is considered once.
+# The best split of the remaining crates does not depend on how the previous groups were formed, so it is memoized
+# by the tuple of the remaining crates: there are at most 2^(n-1) of them instead of (n-1)!! splits for pairs of n crates.
+def _best_split(databases: List[PatternDatabase], crates: Tuple[int, ...], size: int,
+                memo: Optional[Dict[Tuple[int, ...], float]] = None) -> float:
+    if not crates:
+        return 0
+    if len(crates) <= size:
+        value = databases[len(crates)].lookup(crates)
+        return float('inf') if value == UNSOLVABLE else value
+    if memo is None:
+        memo = {}
+    best = memo.get(crates)
+    if best is not None:
+        return best
+    first, rest = crates[0], crates[1:]
+    best = 0
+    for others in combinations(rest, size - 1):
+        value = databases[size].lookup((first,) + others)
+        if value == UNSOLVABLE:
+            best = float('inf')
+            break
+        remaining = tuple(crate for crate in rest if crate not in others)
+        best = max(best, value + _best_split(databases, remaining, size, memo))
+    memo[crates] = best
+    return best
+
+# Create a pattern database heuristic with patterns of the given number of crates ("additive" or "max", see above).
+# The result is an ordinary heuristic function which works with SokobanProblem and PushSokobanProblem.
+# The values only depend on the crates, so they are cached by crate bitmask in a bounded LRU cache of the problem.
+def pattern_database_heuristic(size: int = 2, mode: str = "additive", directory: Optional[str] = DEFAULT_DIRECTORY) -> HeuristicFunction:
+    if mode not in ("additive", "max"):
+        raise ValueError(f"Unknown pattern database mode '{mode}'")
+    cache_key = ("pdb", size, mode)
+
+    def heuristic(problem: SokobanProblem, state: SokobanState) -> float:
+        layout, crates = problem.layout, state.crate_bits
+        if crates == layout.goal_bits:
+            return 0
+        if crates & layout.dead_bits:
+            return float('inf')
+        values = problem.cache(cache_key, VALUE_CACHE_SIZE)
+        value = values.get(crates)
+        if value is not None:
+            return value
+        cells = tuple(iterate_bits(crates))
+        pattern_size = min(size, len(cells))
+        if mode == "additive":
+            databases = [None] + [pattern_database(layout, k, directory) for k in range(1, pattern_size + 1)]
+            value = _best_split(databases, cells, pattern_size)
+        else:
+            database = pattern_database(layout, pattern_size, directory)
+            value = max(database.lookup(group) for group in combinations(cells, pattern_size))
+            if value == UNSOLVABLE: value = float('inf')
+        values[crates] = value
+        return value
+    return heuristic
+
+# The default pattern database heuristic (additive with pairs of crates)
+pdb_heuristic = pattern_database_heuristic()
@@ -0,0 +1,196 @@
+from dataclasses import dataclass
+from collections import deque
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from mathutils import Direction
+from problem import Problem, Solution
+from sokoban import SokobanLayout, SokobanProblem, SokobanState
+from helpers.utils import track_call_count, tracked_as
+from search_stats import timed_phase
+
+# This file contains a push-level (macro-move) formulation of the Sokoban problem.
+# In SokobanProblem, every action is a single player step, so most of the expanded nodes only differ by where the player
+# is standing while the crates did not move. Here, every action is a crate push: the player walks (without moving any crate)
+# to the cell next to a crate then pushes it once.
+# Two states where the crates are on the same cells and the player can walk from one position to the other
+# have exactly the same pushes, so the player position is normalized to the top-left cell of the region that the player
+# can reach (the reachable cell with the lowest index). Then all these states are the same state of the search.
+# The solutions of this problem are lists of pushes. They are converted to lists of steps by "to_steps", so they can be
+# replayed on the original SokobanProblem (see "push_level").
+
+# A push is a macro action: walk along "path" (player steps that never move a crate) then push the crate in "direction".
+# "crate" is the cell of the crate before it is pushed.
+@dataclass(frozen=True)
+class SokobanPush:
+    __slots__ = ("path", "direction", "crate")
+    path: Tuple[Direction, ...]
+    direction: Direction
+    crate: int
+
+    # All the player steps of the push (the walk then the push)
+    @property
+    def steps(self) -> Tuple[Direction, ...]:
+        return self.path + (self.direction,)
+
+    def __str__(self) -> str:
+        return ''.join(str(step) for step in self.path) + str(self.direction).lower()
+
+# Return the bitmask of the cells that the player can reach from the given cell without moving any crate.
+# The region is grown one step in every direction at once using shifts of the bitmask (a bit-parallel flood fill),
+# since the padding walls guarantee that a shift by 1 never wraps from a walkable cell to another row.
+def reachable_bits(layout: SokobanLayout, player_cell: int, crate_bits: int) -> int:
+    free, stride = layout.walkable_bits & ~crate_bits, layout.stride
+    region = 1 << player_cell
+    while True:
+        grown = (region | region << 1 | region >> 1 | region << stride | region >> stride) & free
+        if grown == region:
+            return region
+        region = grown
+
+# This is the push-level sokoban problem. It is built from a SokobanProblem and uses the same layout and states,
+# except that the player cell of every state is normalized (see "normalize").
+# Every push costs 1, so UCS and A* find the solutions with the least number of pushes (not of steps).
+class PushSokobanProblem(Problem[SokobanState, SokobanPush]):
+    # Every push costs 1
+    integer_costs = True
+    # If True, the pushes that move a crate onto a dead square are not generated.
+    # Unlike SokobanProblem, this is enabled by default since no expansion counts are checked for this problem.
+    prune_dead_squares: bool = True
+
+    def __init__(self, problem: SokobanProblem) -> None:
+        super().__init__()
+        self.problem = problem
+        self.layout = problem.layout
+        # The caches are shared with the original problem, so the heuristics reuse its values and its cache configuration
+        problem.cache()
+        self._caches = getattr(problem, "_caches")
+        self.initial_state = self.normalize(problem.get_initial_state())
+
+    # Return the same state with the player moved to the lowest cell index that it can reach
+    def normalize(self, state: SokobanState) -> SokobanState:
+        region = reachable_bits(self.layout, state.player_cell, state.crate_bits)
+        player_cell = (region & -region).bit_length() - 1
+        if player_cell == state.player_cell:
+            return state
+        return SokobanState(self.layout, player_cell, state.crate_bits, state.crate_hash)
+
+    def get_initial_state(self) -> SokobanState:
+        return self.initial_state
+
+    def is_goal(self, state: SokobanState) -> bool:
+        return self.layout.goal_bits == state.crate_bits
+
+    def pack_state(self, state: SokobanState) -> Tuple[int, int, int]:
+        return self.problem.pack_state(state)
+
+    def unpack_state(self, packed: Tuple[int, int, int]) -> SokobanState:
+        return self.problem.unpack_state(packed)
+
+    def state_bytes(self, state: SokobanState) -> bytes:
+        return self.problem.state_bytes(state)
+
+    # Run a BFS for the player from the player cell without moving any crate.
+    # Return the reached cells in the BFS order and the (previous cell, direction) of the step that first reached each cell.
+    def walk(self, player_cell: int, crate_bits: int) -> Tuple[List[int], Dict[int, Tuple[int, Direction]]]:
+        free = self.layout.walkable_bits & ~crate_bits
+        order, parents = [player_cell], {player_cell: None}
+        queue = deque(order)
+        while queue:
+            cell = queue.popleft()
+            for direction, offset in self.layout.moves:
+                next_cell = cell + offset
+                if free >> next_cell & 1 and next_cell not in parents:
+                    parents[next_cell] = (cell, direction)
+                    order.append(next_cell)
+                    queue.append(next_cell)
+        return order, parents
+
+    # Return the list of steps that leads the player to the given cell using the parents found by "walk"
+    @staticmethod
+    def path_to(parents: Dict[int, Tuple[int, Direction]], cell: int) -> Tuple[Direction, ...]:
+        path = []
+        while parents[cell] is not None:
+            cell, direction = parents[cell]
+            path.append(direction)
+        return tuple(reversed(path))
+
+    # Return the (push, next state) for every possible push from the given state.
+    # A crate on the cell c can be pushed in a direction if the player can reach the cell behind it (c - offset)
+    # and the cell in front of it (c + offset) is walkable and has no crate (and is not a dead square if pruning).
+    # The pushes that lead to a deadlock are skipped if the original problem has a deadlock detector.
+    def _pushes(self, state: SokobanState) -> List[Tuple[SokobanPush, SokobanState]]:
+        layout = self.layout
+        walkable, crates, crate_keys = layout.walkable_bits, state.crate_bits, layout.crate_keys
+        blocked = ~walkable | crates | (layout.dead_bits if self.prune_dead_squares else 0)
+        detector = self.problem.deadlock_detector
+        order, parents = self.walk(state.player_cell, crates)
+        pushes = []
+        for cell in order:
+            for direction, offset in layout.moves:
+                crate = cell + offset
+                if not crates >> crate & 1 or blocked >> (crate + offset) & 1: continue
+                next_crates = crates ^ (1 << crate) ^ (1 << (crate + offset))
+                next_hash = state.crate_hash ^ crate_keys[crate] ^ crate_keys[crate + offset]
+                next_state = SokobanState(layout, crate, next_crates, next_hash)
+                if detector is not None and detector.is_deadlock(next_state, crate + offset): continue
+                next_state = self.normalize(next_state)
+                pushes.append((SokobanPush(self.path_to(parents, cell), direction, crate), next_state))
+        return pushes
+
+    # We use @track_call_count to track the number of times this function was called to count the number of explored nodes
+    @track_call_count
+    def get_actions(self, state: SokobanState) -> Iterable[SokobanPush]:
+        return [push for push, _ in self._pushes(state)]
+
+    def get_successor(self, state: SokobanState, action: SokobanPush) -> SokobanState:
+        layout = self.layout
+        offset = layout.moves[action.direction][1]
+        crate, target = action.crate, action.crate + offset
+        region = reachable_bits(layout, state.player_cell, state.crate_bits)
+        if not state.crate_bits >> crate & 1 or not region >> (crate - offset) & 1 \
+                or not layout.walkable_bits >> target & 1 or state.crate_bits >> target & 1:
+            # If the crate cannot be reached or it cannot be pushed, then this action is wrong
+            raise Exception(f"Invalid push {action} in state:" + "\n" + str(state))
+        crates = state.crate_bits ^ (1 << crate) ^ (1 << target)
+        crate_hash = state.crate_hash ^ layout.crate_keys[crate] ^ layout.crate_keys[target]
+        return self.normalize(SokobanState(layout, crate, crates, crate_hash))
+
+    def get_cost(self, state: SokobanState, action: SokobanPush) -> float:
+        # All pushes have the same cost
+        return 1
+
+    # The pushes and their successors are found by a single player BFS, so get_successors does not repeat the work
+    # of get_actions. It is counted as a call to get_actions, so the number of explored nodes is still tracked.
+    @tracked_as("get_actions")
+    def get_successors(self, state: SokobanState) -> List[Tuple[SokobanPush, SokobanState, float]]:
+        return [(push, next_state, 1) for push, next_state in self._pushes(state)]
+
+    # Convert a list of pushes to the list of steps that applies them starting from the given (not normalized) state.
+    # The path stored in each push starts from the normalized player cell, but the real player stands wherever the last
+    # push left it, so the walk to each push is found again from the real player cell (it is never longer).
+    def to_steps(self, state: SokobanState, pushes: Iterable[SokobanPush]) -> List[Direction]:
+        layout = self.layout
+        player, crates = state.player_cell, state.crate_bits
+        steps = []
+        for push in pushes:
+            offset = layout.moves[push.direction][1]
+            _, parents = self.walk(player, crates)
+            steps.extend(self.path_to(parents, push.crate - offset))
+            steps.append(push.direction)
+            player, crates = push.crate, crates ^ (1 << push.crate) ^ (1 << (push.crate + offset))
+        return steps
+
+# Wrap a search function (such as UniformCostSearch or AStarSearch) so that it searches the push-level problem
+# and returns a step-level solution of the original SokobanProblem. The extra arguments (e.g. the heuristic)
+# are passed to the search function. The heuristic receives the PushSokobanProblem which has the same "layout",
+# "is_goal" and "cache" as a SokobanProblem, so the sokoban heuristics can be used as they are.
+# If "stats" is given, the search fills it with the push-level statistics and the conversion to steps is timed as "to_steps".
+def push_level(search_fn: Callable[..., Solution]) -> Callable[..., Solution]:
+    def search(problem: SokobanProblem, initial_state: SokobanState, *args, **kwargs) -> Solution:
+        push_problem = PushSokobanProblem(problem)
+        pushes = search_fn(push_problem, push_problem.normalize(initial_state), *args, **kwargs)
+        if pushes is None:
+            return None  # If no solution is found
+        with timed_phase(kwargs.get("stats"), "to_steps"):
+            return push_problem.to_steps(initial_state, pushes)
+    return search
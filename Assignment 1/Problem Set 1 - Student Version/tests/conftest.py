@@ -0,0 +1,9 @@
+import os, sys
+
+# The modules of the problem set are imported from its directory (like the autograder does)
+DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, DIRECTORY)
+
+# Return the absolute path of a file of the problem set (e.g. "levels/level1.txt")
+def data_path(relative: str) -> str:
+    return os.path.join(DIRECTORY, relative)
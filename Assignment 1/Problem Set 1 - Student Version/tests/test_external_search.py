@@ -0,0 +1,25 @@
+import pytest
+
+from conftest import data_path
+from parking import ParkingProblem
+from sokoban import SokobanProblem
+from search import BreadthFirstSearch
+from external_search import ExternalBreadthFirstSearch
+from helpers.utils import fetch_tracked_call_count
+
+INSTANCES = [(SokobanProblem, "levels/level1.txt"), (SokobanProblem, "levels/level2.txt"), (ParkingProblem, "parks/park1.txt")]
+
+# A small buffer splits every layer into several sorted runs, so the merges are tested too
+@pytest.mark.parametrize("buffer_size", [16, 2**16])
+@pytest.mark.parametrize("problem_type, path", INSTANCES)
+def test_external_bfs_matches_bfs(problem_type, path, buffer_size, tmp_path):
+    problem = problem_type.from_file(data_path(path))
+    initial_state = problem.get_initial_state()
+    fetch_tracked_call_count(problem_type.get_actions)
+    expected = BreadthFirstSearch(problem, initial_state)
+    expected_expanded = fetch_tracked_call_count(problem_type.get_actions)
+    solution = ExternalBreadthFirstSearch(problem, initial_state, directory=str(tmp_path), buffer_size=buffer_size)
+    expanded = fetch_tracked_call_count(problem_type.get_actions)
+    assert solution == expected
+    assert expanded == expected_expanded
+    assert list(tmp_path.iterdir()) == [] # The temporary files are removed
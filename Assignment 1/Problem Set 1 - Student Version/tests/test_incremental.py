@@ -0,0 +1,60 @@
+import pytest
+
+from conftest import data_path
+from graph import GraphRoutingProblem, graphrouting_heuristic, graphrouting_reverse_heuristic
+from search import AStarSearch
+from incremental import DStarLite
+from agents import IncrementalSearchAgent
+from helpers.utils import fetch_recorded_calls
+
+GRAPHS = [f"graphs/graph{index}.json" for index in range(1, 7)]
+
+# Return the cost of a path (None if there is no path)
+def path_cost(problem, state, path):
+    if path is None: return None
+    cost = 0
+    for action in path:
+        cost += problem.get_cost(state, action)
+        state = problem.get_successor(state, action)
+    assert problem.is_goal(state)
+    return cost
+
+@pytest.mark.parametrize("path", GRAPHS)
+def test_dstar_lite_matches_astar_after_edge_changes(path):
+    problem = GraphRoutingProblem.from_file(data_path(path))
+    start = problem.get_initial_state()
+    planner = DStarLite(problem, start, graphrouting_reverse_heuristic)
+    planner.compute_shortest_path()
+    expected = path_cost(problem, start, AStarSearch(problem, start, graphrouting_heuristic))
+    assert path_cost(problem, start, planner.path()) == pytest.approx(expected)
+    # Remove the edges of the best path one by one, and check that the repaired search is still optimal
+    while True:
+        plan = planner.path()
+        if not plan: break
+        first = plan[0]
+        problem.remove_edge(start, first)
+        planner.update_edges([start])
+        planner.compute_shortest_path()
+        expected = path_cost(problem, start, AStarSearch(problem, start, graphrouting_heuristic))
+        actual = path_cost(problem, start, planner.path())
+        if expected is None:
+            assert actual is None
+            break
+        assert actual == pytest.approx(expected)
+
+def test_dstar_lite_does_not_count_rhs_updates_as_expansions():
+    problem = GraphRoutingProblem.from_file(data_path(GRAPHS[0]))
+    start = problem.get_initial_state()
+    planner = DStarLite(problem, start, graphrouting_reverse_heuristic)
+    fetch_recorded_calls(GraphRoutingProblem.get_actions)
+    planner.compute_shortest_path()
+    planner.update_edges(list(problem.adjacency))
+    planner.path()
+    assert len(fetch_recorded_calls(GraphRoutingProblem.get_actions)) == 0
+
+def test_incremental_agent_without_goal_state():
+    problem = GraphRoutingProblem.from_file(data_path(GRAPHS[0]))
+    problem.goal = None
+    agent = IncrementalSearchAgent(graphrouting_reverse_heuristic)
+    assert agent.act(problem, problem.get_initial_state()) is None
+    assert agent.planner is None
@@ -0,0 +1,39 @@
+import pytest
+
+from conftest import data_path
+from graph import GraphRoutingProblem, graphrouting_heuristic
+from sokoban import SokobanProblem
+from sokoban_heuristic import strong_heuristic
+from search import AStarSearch
+from parallel_search import HDAStarSearch
+from search_stats import SearchStats
+
+INSTANCES = [
+    (GraphRoutingProblem, "graphs/graph3.json", graphrouting_heuristic),
+    (GraphRoutingProblem, "graphs/graph6.json", graphrouting_heuristic),
+    (SokobanProblem, "levels/level1.txt", strong_heuristic),
+    (SokobanProblem, "levels/level2.txt", strong_heuristic),
+]
+
+# Return the cost of a path (None if there is no path)
+def path_cost(problem, state, path):
+    if path is None: return None
+    cost = 0
+    for action in path:
+        cost += problem.get_cost(state, action)
+        state = problem.get_successor(state, action)
+    assert problem.is_goal(state)
+    return cost
+
+@pytest.mark.parametrize("workers", [1, 3])
+@pytest.mark.parametrize("problem_type, path, heuristic", INSTANCES)
+def test_hda_star_cost_matches_astar(problem_type, path, heuristic, workers):
+    problem = problem_type.from_file(data_path(path))
+    initial_state = problem.get_initial_state()
+    expected = path_cost(problem, initial_state, AStarSearch(problem, initial_state, heuristic))
+    stats = SearchStats()
+    solution = HDAStarSearch(problem, initial_state, heuristic, workers, stats=stats)
+    assert path_cost(problem, initial_state, solution) == pytest.approx(expected)
+    # The statistics are recorded like the other searches (through @instrumented) and include the workers' counters
+    assert stats.searches == 1 and "search" in stats.phases
+    assert stats.expanded > 0 and stats.heuristic_calls > 0
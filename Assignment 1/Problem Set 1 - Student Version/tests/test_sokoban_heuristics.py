@@ -0,0 +1,38 @@
+import pytest
+
+from sokoban import SokobanProblem
+from search import AStarSearch, BreadthFirstSearch
+from sokoban_heuristic import strong_heuristic, is_deadlock
+from sokoban_matching import matching_heuristic
+
+# The levels where the old border checks of is_deadlock flagged states that can be solved
+# (A* returned no solution on the first one and a solution of 16 steps instead of 12 on the second one)
+REGRESSION_LEVELS = [
+    "#######\n#.    #\n#$$  .#\n# @   #\n#######",
+    "######\n#.   #\n#.$@ #\n##$$ #\n#.   #\n######",
+]
+
+@pytest.mark.parametrize("heuristic", [strong_heuristic, matching_heuristic])
+@pytest.mark.parametrize("text", REGRESSION_LEVELS)
+def test_heuristic_is_optimal(text, heuristic):
+    problem = SokobanProblem.from_text(text)
+    reference = BreadthFirstSearch(problem, problem.get_initial_state())
+    problem = SokobanProblem.from_text(text)
+    solution = AStarSearch(problem, problem.get_initial_state(), heuristic)
+    assert solution is not None and len(solution) == len(reference)
+
+@pytest.mark.parametrize("heuristic", [strong_heuristic, matching_heuristic])
+def test_heuristic_with_more_crates_than_goals(heuristic):
+    # The goal can never be reached (every crate must be on a goal), and the heuristic must not fail
+    problem = SokobanProblem.from_text("#######\n#@$ $.#\n#######")
+    assert heuristic(problem, problem.get_initial_state()) == float('inf')
+
+def test_is_deadlock_only_flags_frozen_crates():
+    # Two crates side by side along the top wall can never move (a freeze deadlock)
+    problem = SokobanProblem.from_text("######\n# $$ #\n#  . #\n#@ . #\n######")
+    state = problem.get_initial_state()
+    assert all(is_deadlock(problem, state, crate) for crate in state.crates)
+    # The crates of the first regression level are next to each other but can still be pushed down
+    problem = SokobanProblem.from_text(REGRESSION_LEVELS[0])
+    state = problem.get_initial_state()
+    assert not any(is_deadlock(problem, state, crate) for crate in state.crates)
@@ -1,7 +1,8 @@
 import os, sys
-from typing import Any, Callable, Dict, List
+from typing import Any, Callable, Dict, Hashable, Iterator, List, Optional
 from dataclasses import dataclass
-from collections import deque
+from collections import OrderedDict, deque
+from collections.abc import MutableMapping
 import importlib
 from importlib import util as ilu
 import traceback
@@ -78,26 +79,200 @@ def add_call_listener(listener):
         return decorated
     return decorator
 
-class CacheContainer:
-    def cache(self) -> Dict[Any, Any]:
-        if hasattr(self, "_cache"):
-            return getattr(self, "_cache")
+# The eviction policies supported by BoundedCache:
+#   "lru": evict the least recently used entry
+#   "lfu": evict the least frequently used entry (the least recently used one among equally used entries)
+#   "clock": evict the first entry that was not used since the clock hand last passed it (an approximation of LRU
+#            which only sets a flag on a hit instead of reordering the entries)
+CACHE_POLICIES = ("lru", "lfu", "clock")
+
+# BoundedCache is a dictionary that holds at most "max_size" entries (or any number if max_size is None).
+# When it is full, inserting a new key evicts an entry chosen by the eviction policy.
+# It counts the hits and misses of the lookups (get, [] and "in") and the number of evicted entries.
+# An unbounded cache does not track the usage of its entries, so it is almost as fast as a plain dictionary.
+class BoundedCache(MutableMapping):
+    def __init__(self, max_size: Optional[int] = None, policy: str = "lru") -> None:
+        if policy not in CACHE_POLICIES:
+            raise ValueError(f"Unknown cache policy '{policy}', expected one of {list(CACHE_POLICIES)}")
+        if max_size is not None and max_size < 1:
+            raise ValueError(f"The cache size must be at least 1, got {max_size}")
+        self.max_size = max_size
+        self.policy = policy
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.data: Dict[Any, Any] = OrderedDict() if max_size is not None and policy == "lru" else {}
+        # LFU: the use count of each key and the keys of each use count (in LRU order)
+        self.counts: Dict[Any, int] = {}
+        self.buckets: Dict[int, OrderedDict] = {}
+        # Clock: the ring of keys (None marks a free slot), the slot of each key, the reference flags and the hand
+        self.ring: List[Any] = []
+        self.slots: Dict[Any, int] = {}
+        self.referenced: List[bool] = []
+        self.free_slots: List[int] = []
+        self.hand = 0
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self.data)
+
+    def __contains__(self, key: Any) -> bool:
+        if key in self.data:
+            self.hits += 1
+            return True
+        self.misses += 1
+        return False
+
+    def __getitem__(self, key: Any) -> Any:
+        try:
+            value = self.data[key]
+        except KeyError:
+            self.misses += 1
+            raise
+        self.hits += 1
+        if self.max_size is not None: self._touch(key)
+        return value
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        if key not in self.data:
+            self.misses += 1
+            return default
+        self.hits += 1
+        if self.max_size is not None: self._touch(key)
+        return self.data[key]
+
+    def __setitem__(self, key: Any, value: Any) -> None:
+        data = self.data
+        if self.max_size is None:
+            data[key] = value
+            return
+        if key in data:
+            data[key] = value
+            self._touch(key)
+            return
+        if len(data) >= self.max_size:
+            self._evict()
+        data[key] = value
+        self._insert(key)
+
+    def __delitem__(self, key: Any) -> None:
+        del self.data[key]
+        if self.max_size is not None: self._forget(key)
+
+    def pop(self, key: Any, *default: Any) -> Any:
+        if key not in self.data:
+            if default: return default[0]
+            raise KeyError(key)
+        value = self.data[key]
+        del self[key]
+        return value
+
+    def clear(self) -> None:
+        self.data.clear()
+        self.counts.clear(); self.buckets.clear()
+        self.ring.clear(); self.slots.clear(); self.referenced.clear(); self.free_slots.clear()
+        self.hand = 0
+
+    # Return the counters of the cache
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": len(self.data), "max_size": self.max_size, "policy": self.policy,
+            "hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+        }
+
+    # Record a use of a key which is in the cache
+    def _touch(self, key: Any) -> None:
+        if self.policy == "lru":
+            self.data.move_to_end(key)
+        elif self.policy == "lfu":
+            count = self.counts[key]
+            self._remove_from_bucket(key, count)
+            self.counts[key] = count + 1
+            self.buckets.setdefault(count + 1, OrderedDict())[key] = None
+        else:
+            self.referenced[self.slots[key]] = True
+
+    # Start tracking a key which was just added to the cache
+    def _insert(self, key: Any) -> None:
+        if self.policy == "lfu":
+            self.counts[key] = 1
+            self.buckets.setdefault(1, OrderedDict())[key] = None
+        elif self.policy == "clock":
+            if self.free_slots:
+                slot = self.free_slots.pop()
+                self.ring[slot], self.referenced[slot] = key, False
+            else:
+                slot = len(self.ring)
+                self.ring.append(key)
+                self.referenced.append(False)
+            self.slots[key] = slot
+
+    # Stop tracking a key which was removed from the cache
+    def _forget(self, key: Any) -> None:
+        if self.policy == "lfu":
+            self._remove_from_bucket(key, self.counts.pop(key))
+        elif self.policy == "clock":
+            slot = self.slots.pop(key)
+            self.ring[slot] = None
+            self.free_slots.append(slot)
+
+    def _remove_from_bucket(self, key: Any, count: int) -> None:
+        bucket = self.buckets[count]
+        del bucket[key]
+        if not bucket: del self.buckets[count]
+
+    # Remove one entry chosen by the policy
+    def _evict(self) -> None:
+        if self.policy == "lru":
+            self.data.popitem(last=False)
+            self.evictions += 1
+            return
+        if self.policy == "lfu":
+            key = next(iter(self.buckets[min(self.buckets)]))
         else:
-            cache = {}
-            setattr(self, "_cache", cache)
-            return cache
-
-# Unused
-def _cache_function(self) -> Dict[Any, Any]:
-    if hasattr(self, "_cache"):
-        return getattr(self, "_cache")
-    else:
-        cache = {}
-        setattr(self, "_cache", cache)
+            # Move the hand around the ring, clearing the reference flags, until it finds an entry that was not used
+            ring, referenced = self.ring, self.referenced
+            while True:
+                if self.hand >= len(ring): self.hand = 0
+                key = ring[self.hand]
+                self.hand += 1
+                if key is not None and not referenced[self.hand - 1]: break
+                referenced[self.hand - 1] = False
+        del self.data[key]
+        self._forget(key)
+        self.evictions += 1
+
+# A CacheContainer has named caches (BoundedCache objects) where it can store any data that it wants to keep
+# between calls (e.g. the values computed by a heuristic). The cache with the name None is the default cache.
+# The caches are unbounded unless they are configured (by configure_cache or by the first call to cache).
+class CacheContainer:
+    # Return the cache with the given name. If it does not exist yet, it is created with the given size and policy.
+    def cache(self, name: Hashable = None, max_size: Optional[int] = None, policy: str = "lru") -> BoundedCache:
+        caches = getattr(self, "_caches", None)
+        if caches is None:
+            caches = {}
+            setattr(self, "_caches", caches)
+        cache = caches.get(name)
+        if cache is None:
+            cache = caches[name] = BoundedCache(max_size, policy)
         return cache
 
+    # Replace the cache with the given name by an empty cache with the given size and policy
+    def configure_cache(self, name: Hashable = None, max_size: Optional[int] = None, policy: str = "lru") -> BoundedCache:
+        self.cache()  # Make sure that the caches exist
+        cache = getattr(self, "_caches")[name] = BoundedCache(max_size, policy)
+        return cache
+
+    # Return the counters (see BoundedCache.stats) of every cache by name
+    def cache_stats(self) -> Dict[Hashable, Dict[str, Any]]:
+        return {name: cache.stats() for name, cache in getattr(self, "_caches", {}).items()}
+
 def with_cache(cls):
-    cls.cache = _cache_function
+    cls.cache = CacheContainer.cache
+    cls.configure_cache = CacheContainer.configure_cache
+    cls.cache_stats = CacheContainer.cache_stats
     return cls
 
 class bcolors: